@@ -1,3 +1,6 @@
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import tkinter as tk
@@ -7,7 +10,8 @@ from tkinter.scrolledtext import ScrolledText
 from tkinter import filedialog
 
 from pdz_tool_extended.pdz_tool import PDZTool
-from paths import create_folders, get_likenamed_filepaths_with_extension, get_filepaths_with_extension_in_directory
+from pdz_tool_extended.parse_cache import ParseCache
+from paths import create_folders, get_filepaths_with_extension_in_directory, DirectoryIndex, sort_paths_by_folder, folder_sort_key
 
 
 VERSION = "1.0"
@@ -46,7 +50,7 @@ class BetterScrolledText(ScrolledText):
 
 
 class PdzToolGui(tk.Frame):
-    def __init__(self, window=None, overwrite: bool=False):
+    def __init__(self, window=None, overwrite: bool=False, cache_dir: str=None):
         super().__init__(master=window)
         rowconfig = 2
         colconfig = 0
@@ -65,8 +69,30 @@ class PdzToolGui(tk.Frame):
         self._image_suffix = '-'
         self._image_record_name = 'Image Details'
         self._extensions = ["csv", "jpeg"]
+        self._directory_index = DirectoryIndex()  # Listings of output directories, invalidated on open and after saving
+
+        # Derived state of the opened files, computed once per change of the files or of the outputs on disk
+        self._view_model = None
+        self._output_text = None
+        self._refresh_delay_ms = 50
+        self._refresh_id = None
 
         self.pdz_tools = []
+        self._parse_cache = None
+        if cache_dir:
+            try:
+                self._parse_cache = ParseCache(cache_dir)
+            except OSError as e:
+                print(f"Not caching parsed files, the cache directory {cache_dir} is not usable: {e}")
+
+        # Files are opened on a worker pool and handed to the Tk loop through a queue polled with `after()`
+        self._open_executor = None
+        self._open_queue = queue.Queue()
+        self._open_futures = []
+        self._open_generation = 0  # Increased on each open and cancel, so results of earlier opens are ignored
+        self._open_failed = []
+        self._open_poll_ms = 100
+        self._open_poll_id = None
 
         self._default_output_text = "No files or folder selected"
 
@@ -98,24 +124,67 @@ class PdzToolGui(tk.Frame):
         self.draw_extract_and_save_button(row=row)
 
     def quit(self):
+        self.cancel_open()
+        if self._open_executor:
+            self._open_executor.shutdown(wait=False)
         self.destroy()
 
+    @property
+    def is_opening(self):
+        return any(not future.done() for future in self._open_futures)
+
     @property
     def pdz_file_paths(self):
         return self._pdz_file_paths
     
     @pdz_file_paths.setter
     def pdz_file_paths(self, value: list=[]):
-        self._pdz_file_paths = sorted(value)
+        self._pdz_file_paths = sort_paths_by_folder(value)  # In the order of the files of `pdz_folders`
+        self.invalidate_view_model()
+
+    @property
+    def pdz_tools(self):
+        return self._pdz_tools
+
+    @pdz_tools.setter
+    def pdz_tools(self, value: list=[]):
+        self._pdz_tools = value
+        self.invalidate_view_model()
+
+    def invalidate_view_model(self):
+        """Forget the derived state, e.g. after opening files or saving outputs."""
+        self._view_model = None
+
+    @property
+    def view_model(self):
+        """Derived state of the opened files, shared by the output pane, exists label and Extract & Save button."""
+        if self._view_model is None:
+            predicted_filenames = self.compute_predicted_output_filenames()
+            exists_filenames, n_exists = self.compute_exists_output_filenames(predicted_filenames)
+            self._view_model = {
+                "folders": create_folders(paths=self.pdz_file_paths),
+                "predicted_filenames": predicted_filenames,
+                "exists_filenames": exists_filenames,
+                "n_exists": n_exists,
+                "n_to_extract": {
+                    extension: sum(len(filenames[extension]) for filenames in predicted_filenames)
+                    for extension in self._extensions},
+                "all_exist": {
+                    extension: all(all(exists[extension]) for exists in exists_filenames)
+                    for extension in self._extensions},
+                "output_texts": {},  # {tuple of extensions to save: output text}
+            }
+        return self._view_model
 
     @property
     def pdz_folders(self):
-        filepaths = self.pdz_file_paths
-        folders = create_folders(paths=filepaths)
-        return folders
+        return self.view_model["folders"]
 
     @property
     def predicted_output_filenames(self):
+        return self.view_model["predicted_filenames"]
+
+    def compute_predicted_output_filenames(self):
         filenames_pdzs = []
         pdzs = self.pdz_tools
         for pdz in pdzs:
@@ -151,7 +220,10 @@ class PdzToolGui(tk.Frame):
 
     @property
     def exists_output_filenames(self):
-        predicted_filenames_by_pdz = self.predicted_output_filenames
+        view_model = self.view_model
+        return view_model["exists_filenames"], view_model["n_exists"]
+
+    def compute_exists_output_filenames(self, predicted_filenames_by_pdz: list):
         exists_filenames_by_pdz = []
         n_exists = {}
         for extension in self._extensions:
@@ -159,11 +231,11 @@ class PdzToolGui(tk.Frame):
         pdz_file_paths = self.pdz_file_paths
         for (pdz_file_path, predicted_filenames_of_pdz) in zip(pdz_file_paths, predicted_filenames_by_pdz):
             exists_filenames = {}
+            directory = os.path.dirname(pdz_file_path)
             for extension, predicted_filenames in predicted_filenames_of_pdz.items():
-                likenamed = get_likenamed_filepaths_with_extension(path=pdz_file_path, extension=extension)
                 exists = []
                 for predicted_filename in predicted_filenames:
-                    does_predicted_filename_exist = any(predicted_filename in name for name in likenamed)
+                    does_predicted_filename_exist = self._directory_index.exists(directory, predicted_filename)
                     exists.append(does_predicted_filename_exist)
                 exists_filenames[extension] = exists
                 n_exists[extension] += sum(exists)
@@ -211,16 +283,31 @@ class PdzToolGui(tk.Frame):
 
     def update_output(self):
         text = self._default_output_text
-        folders = self.pdz_folders
-        predicted_filenames = self.predicted_output_filenames
-        exists_filenames, n_exists = self.exists_output_filenames
+        view_model = self.view_model
+        folders = view_model["folders"]
         save_extensions = self.output_extensions
         if folders:
-            text = self.generate_output_text(folders, append_items=predicted_filenames, exists_items=exists_filenames, save_extensions=save_extensions)
-        scroll = self._scroll
-        scroll.replace(text=text)
+            output_texts = view_model["output_texts"]
+            key = tuple(save_extensions)
+            if key not in output_texts:
+                output_texts[key] = self.generate_output_text(
+                    folders,
+                    append_items=view_model["predicted_filenames"],
+                    exists_items=view_model["exists_filenames"],
+                    save_extensions=save_extensions)
+            text = output_texts[key]
+        if text != self._output_text:  # Skip redrawing an unchanged pane
+            self._scroll.replace(text=text)
+            self._output_text = text
 
     def update(self):
+        """Refresh the window after a short delay, so a burst of changes (e.g. toggling options) refreshes once."""
+        if self._refresh_id is not None:
+            self.after_cancel(self._refresh_id)
+        self._refresh_id = self.after(self._refresh_delay_ms, self.refresh)
+
+    def refresh(self):
+        self._refresh_id = None
         self.update_output()
         self.update_exists_label()
         self.update_extract_and_save_button()
@@ -326,6 +413,26 @@ class PdzToolGui(tk.Frame):
                 text="Select a folder containing PDZ files to detect and extract...""")
         self._open_folder = button
 
+        # Progress of opening files, shown only while opening
+        progress = ttk.Progressbar(frame,
+                                   mode="determinate")
+        progress.grid(sticky="we",
+                      column=0, row=1, columnspan=2,
+                      padx=self._pad, pady=self._pad)
+        progress.grid_remove()
+        self._open_progress = progress
+
+        button = ttk.Button(frame,
+                            text="Cancel",
+                            command=self.cancel_open)
+        button.grid(sticky="we",
+                    column=2, row=1,
+                    padx=self._pad, pady=self._pad)
+        button.grid_remove()
+        Tooltip(button,
+                text="Stop opening the selected PDZ files and keep those already opened""")
+        self._open_cancel = button
+
     def clicked_open_files(self):
         files = self.open_files_dialog()
         self.open_files(file_paths=files)
@@ -349,19 +456,104 @@ class PdzToolGui(tk.Frame):
         return files
 
     def open_files(self, file_paths: str=[]):
-        pdz_files = self.filter_list_by_endswith(file_paths, ending=".pdz")
-        self.pdz_file_paths = pdz_files
-
-        pdz_tools = []
-        for file_path in self.pdz_file_paths:
-            pdz_tool = PDZTool(file_path)
-            pdz_tool.parse()
-            pdz_tools.append(pdz_tool)
+        """Open PDZ files in the background. Files are shown as they are opened, sorted by folder."""
+        pdz_files = sort_paths_by_folder(self.filter_list_by_endswith(file_paths, ending=".pdz"))
+        self.cancel_open()
+        self._directory_index.invalidate()  # Outputs may have changed outside the GUI since the last open
+        self.invalidate_view_model()
+
+        # Only opened files are listed, so the paths and tools stay aligned while files are opening
+        self.pdz_file_paths = []
+        self.pdz_tools = []
+        self._open_failed = []
+
+        if pdz_files:
+            if self._open_executor is None:
+                self._open_executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+            generation = self._open_generation
+            self._open_futures = []
+            for file_path in pdz_files:
+                future = self._open_executor.submit(self.open_file, file_path)
+                future.add_done_callback(lambda future, file_path=file_path: self._open_queue.put((generation, file_path, future)))
+                self._open_futures.append(future)
+
+            self._open_progress.configure(maximum=len(pdz_files), value=0)
+            self._open_progress.grid()
+            self._open_cancel.grid()
+            self._open_poll_id = self.after(self._open_poll_ms, self.poll_opened_files)
 
-        self.pdz_tools = pdz_tools
         self.update()
         return True
 
+    def open_file(self, file_path: str):
+        """Open and parse a PDZ file. Runs on a worker thread, so it must not touch any widgets."""
+        pdz_tool = None
+        if self._parse_cache:
+            # Unchanged files are loaded from the cache instead of parsed again
+            pdz_tool = self._parse_cache.parse(file_path, image_refs=True)
+        if pdz_tool is None:
+            pdz_tool = PDZTool(file_path, image_refs=True)  # Images are copied from the PDZ when saved
+            pdz_tool.parse(lazy=True)  # Records are decoded when first needed, e.g. only 'Image Details' to predict filenames
+        pdz_tool.parsed_data.get(self._image_record_name)  # Decode here rather than on the Tk loop
+        return pdz_tool
+
+    def poll_opened_files(self):
+        """Add the files opened since the last poll to the output, and poll again until all are opened."""
+        opened = []
+        while True:
+            try:
+                generation, file_path, future = self._open_queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._open_generation or future.cancelled():
+                continue
+            error = future.exception()
+            if error is None:
+                opened.append((file_path, future.result()))
+            else:
+                self._open_failed.append(f"{file_path}: {error}")
+
+        if opened:
+            pairs = sorted(zip(self.pdz_file_paths + [file_path for file_path, _ in opened],
+                               self.pdz_tools + [pdz_tool for _, pdz_tool in opened]),
+                           key=lambda pair: folder_sort_key(pair[0]))
+            self._pdz_file_paths = [file_path for file_path, _ in pairs]
+            self.pdz_tools = [pdz_tool for _, pdz_tool in pairs]
+
+        n_done = len(self.pdz_tools) + len(self._open_failed)
+        self._open_progress.configure(value=n_done)
+        if opened:
+            self.update()
+
+        self._open_poll_id = None
+        if self.is_opening or not self._open_queue.empty():
+            self._open_poll_id = self.after(self._open_poll_ms, self.poll_opened_files)
+        elif self._open_futures:
+            self.finish_open()
+
+    def cancel_open(self):
+        """Stop opening files; files already opened stay listed."""
+        self._open_generation += 1
+        for future in self._open_futures:
+            future.cancel()
+        if self._open_poll_id is not None:
+            self.after_cancel(self._open_poll_id)
+            self._open_poll_id = None
+        self.finish_open()
+
+    def finish_open(self):
+        self._open_futures = []
+        self._open_progress.grid_remove()
+        self._open_cancel.grid_remove()
+        self.update()
+        if self._open_failed:
+            failed = self._open_failed
+            self._open_failed = []
+            message = f"{len(failed)} PDZ{'s'[:len(failed)^1]} could not be opened:\n\n"
+            for line in failed:
+                message += f"    {line}\n"
+            showwarning(self._window.title(), message)
+
     def clicked_open_directory(self):
         directory = self.open_directory_dialog()
         self.open_directory(directory=directory)
@@ -484,6 +676,8 @@ class PdzToolGui(tk.Frame):
             exists=exists,
             overwrite=overwrite,
             save_extensions=save_extensions)
+        self._directory_index.invalidate()
+        self.invalidate_view_model()
         title = self._window.title()
 
         for (extension, saved_filenames), not_saved_filenames, unsuccessful_filenames in zip(saved.items(), not_saved.values(), unsuccessful.values()):
@@ -601,24 +795,15 @@ class PdzToolGui(tk.Frame):
 
         overwrite_existing = self.overwrite_value
 
-        csvs_to_extract = 0
-        jpegs_to_extract = 0
-        for filenames in self.predicted_output_filenames:
-            csvs_to_extract += len(filenames["csv"])
-            jpegs_to_extract += len(filenames["jpeg"])
-
-        exists_filenames, _ = self.exists_output_filenames
-        all_csvs_exist = True
-        all_jpegs_exist = True
-        for filenames in exists_filenames:
-            if len(filenames["csv"]) > 0:
-                all_csvs_exist *= all(filenames["csv"])
-            if len(filenames["jpeg"]) > 0:
-                all_jpegs_exist *= all(filenames["jpeg"])
+        view_model = self.view_model
+        csvs_to_extract = view_model["n_to_extract"]["csv"]
+        jpegs_to_extract = view_model["n_to_extract"]["jpeg"]
+        all_csvs_exist = view_model["all_exist"]["csv"]
+        all_jpegs_exist = view_model["all_exist"]["jpeg"]
 
         disable_button = True
 
-        if files and any([save_csv, save_jpeg]):
+        if files and any([save_csv, save_jpeg]) and not self.is_opening:
             disable_button = False
             if not save_csv:
                 if not jpegs_to_extract:
@@ -2,14 +2,23 @@
 """
 
 
+import argparse
 from os import path
 from platform import system
 import tkinter as tk
 
 from interfaces import PdzToolGui
+from pdz_tool_extended.parse_cache import default_cache_dir
 
 
 def main():
+    parser = argparse.ArgumentParser(description="PDZ Extractor: GUI for pdz-tool")
+    parser.add_argument('--cache', action='store_true',
+                        help=f'Cache parsed files in {default_cache_dir()}, so reopening unchanged files is fast. '
+                             'Files not cached yet are parsed in full rather than as needed.')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Cache parsed files in this directory (implies --cache)')
+    args = parser.parse_args()
+
     window = tk.Tk()
     window.title("PDZ Extractor: GUI for pdz-tool")
     window.geometry('780x600')
@@ -28,7 +37,10 @@ def main():
         except:
             pass
 
-    app = PdzToolGui(window=window, overwrite=False)
+    # Cache parsed PDZs only when asked to
+    cache_dir = args.cache_dir or (default_cache_dir() if args.cache else None)
+
+    app = PdzToolGui(window=window, overwrite=False, cache_dir=cache_dir)
     app.mainloop()
 
 
@@ -1,5 +1,5 @@
 import os
-from pathlib import Path
+import stat
 
 
 class Folder:
@@ -9,41 +9,126 @@ class Folder:
         self.filenames = filenames
 
 
+def normalize_directory(directory: str):
+    """Normalize a directory path to compare directories, e.g. with or without a trailing separator."""
+    return os.path.normcase(os.path.normpath(directory))
+
+
+def folder_sort_key(path: str):
+    """Key to sort file paths by folder and then by filename, in the order of `create_folders`."""
+    return normalize_directory(os.path.dirname(path)), os.path.basename(path)
+
+
+def sort_paths_by_folder(paths: list=[]):
+    """Sort file paths by folder and then by filename, in the order of `create_folders`."""
+    return sorted(paths, key=folder_sort_key)
+
+
+SCANDIR_MIN_PATHS = 64  # Paths in a directory from which one `os.scandir` is used instead of a stat per path
+
+
 def create_folders(paths: list=[]):
     """Create a list of Folder objects from a list of filepaths.
 
+    Paths are grouped by their directory in a single pass, with one stat per path (or one `os.scandir`
+    per directory with many paths). Folders are sorted by directory and their filenames by name, so
+    the filenames of all folders in order are the files of `sort_paths_by_folder(paths)`.
+
     Args:
-        paths (list of str): Absolute paths of files.
+        paths (list of str): Absolute paths of files. A path of a directory gives a Folder of that directory.
 
     Returns:
         folders (list of Folder): Folders of files with Folder.directory and Folder.filenames.
     """
-    paths = sorted(paths)  # Sort paths in alphabetical order to group paths by directory 
-    folders = []
-
-    i = 0
-    its = 0
-    while i < len(paths) and its < 10000:  # Loop over all paths and assign their directory and filenames
-        starting_path = paths[i]
-        filenames = []
-        directory = starting_path if os.path.isdir(starting_path) else os.path.dirname(starting_path)
-        ii = i
-        while ii < len(paths):  # Loop over paths starting at current path and get all filenames with the current path's directory
-            path = paths[ii]
-            path_dir = path if os.path.isdir(path) else os.path.dirname(path)
-            if directory.replace('\\', '').replace('/', '') != path_dir.replace('\\', '').replace('/', ''):
-                if ii == i:  # If the directory is not found in the starting path itself, then something has gone wrong and we need to move to the next path
-                    i += 1
-                break
-
-            if os.path.isfile(path): filenames.append(os.path.basename(path))
-            ii += 1
-        
-        i = ii
-        folders.append(Folder(directory, filenames))
-        its += 1
-
-    return folders
+    paths_by_parent = {}
+    for path in paths:
+        parent, name = os.path.split(path)
+        paths_by_parent.setdefault(parent, []).append((path, name))
+
+    folders = {}  # {normalized directory: Folder}
+    named_paths = []  # [(normalized directory, filename), ...] of the files
+    for parent, parent_paths in paths_by_parent.items():
+        entries = None
+        if len(parent_paths) >= SCANDIR_MIN_PATHS:
+            try:
+                with os.scandir(parent or '.') as scanned:
+                    entries = {entry.name: entry for entry in scanned}
+            except OSError:
+                entries = None
+
+        parent_key = normalize_directory(parent)
+        for path, name in parent_paths:
+            is_dir, is_file = _path_type(path, name, entries)
+            if is_dir:
+                directory, key = path, normalize_directory(path)
+            else:
+                directory, key = parent, parent_key
+            if key not in folders:
+                folders[key] = Folder(directory, [])
+            if is_file:
+                named_paths.append((key, name))
+
+    for key, filename in sorted(named_paths):
+        folders[key].filenames.append(filename)
+
+    return [folders[key] for key in sorted(folders)]
+
+
+def _path_type(path: str, name: str, entries: dict=None):
+    """Get whether a path is a directory and whether it is a file, from a scanned entry or one stat."""
+    if entries is not None and name:
+        entry = entries.get(name)
+        if entry is None:
+            return False, False
+        try:
+            return entry.is_dir(), entry.is_file()
+        except OSError:
+            return False, False
+    try:
+        mode = os.stat(path).st_mode
+    except (OSError, ValueError):
+        return False, False
+    return stat.S_ISDIR(mode), stat.S_ISREG(mode)
+
+
+class DirectoryIndex:
+    """Cache the names in directories, listed once each, to check whether files exist without a syscall per file.
+
+    Call `invalidate` after files are written to or removed from a directory.
+    """
+    def __init__(self):
+        self._names = {}
+
+    def names(self, directory: str):
+        """Get the set of names in a directory, listing it on first use.
+
+        Args:
+            directory (str): Absolute path of directory.
+
+        Returns:
+            names (set of str): Names of the entries in the directory; empty if it does not exist.
+        """
+        directory = normalize_directory(directory)
+        names = self._names.get(directory)
+        if names is None:
+            try:
+                with os.scandir(directory) as entries:
+                    names = {entry.name for entry in entries}
+            except OSError:
+                names = set()
+            self._names[directory] = names
+        return names
+
+    def exists(self, directory: str, filename: str):
+        """Check whether a file name exists in a directory."""
+        return filename in self.names(directory)
+
+    def invalidate(self, directory: str=None):
+        """Forget the listing of a directory, or of all directories if None."""
+        if directory is None:
+            self._names.clear()
+        else:
+            self._names.pop(normalize_directory(directory), None)
 
 
 def get_filepaths_with_extension_in_directory(path: str=None,
@@ -74,24 +159,3 @@ def get_filepaths_with_extension_in_directory(path: str=None,
 
     return filepaths
 
-
-def get_likenamed_filepaths_with_extension(path: str=None, extension: str=None):
-    """Find like-named files of an extension in the directory of a file.
-
-    Args:
-        path (str): Absolute path of file.
-        extension (str): Extension of like-named files to find.
-        
-    Returns:
-        filepaths (list of str): Absolute paths of found files.
-    """
-
-    stem = Path(path).stem
-    all_filepaths = get_filepaths_with_extension_in_directory(path=path, extension=extension)
-
-    filepaths = []
-    for filepath in all_filepaths:
-        if stem in filepath:
-            filepaths.append(filepath)
-
-    return filepaths
@@ -4,3 +4,11 @@ __version__ = '0.1.0'
 from .pdz_tool import PDZTool
 from .pdz25_tool import PDZ25Tool
 from .pdz24_tool import PDZ24Tool
+from .lazy_parsed_data import LazyParsedData
+from .stream import PDZStreamReader
+from .columnar import PDZColumnarExporter, export_corpus, results_matrix
+from .parse_cache import ParseCache
+from .manifest import BatchManifest
+from .writer import encode_pdz, write_pdz
+from .synthetic import generate_corpus
+from .stats import ParseStats
@@ -1,87 +1,188 @@
 from abc import ABC, abstractmethod
-import json
+import base64
 import csv
+import io
+import mmap
 import os
+from collections.abc import Mapping
 
-from .utils import read_pdz_file, get_pdz_version, flatten_system_date_time
+from .lazy_parsed_data import LazyParsedData
+from .parse_plan import SpectrumStep, compile_record, decode_blocks, run_plan
+from .config import JSON_BINARY_MODES
+from .utils import print_verbose, read_pdz_file, get_pdz_version, flatten_system_date_time, require_numpy, get_json_dumps, copy_file_range_to
 
-class BasePDZTool(ABC):
-    def __init__(self, file_path: str, verbose: bool = False, debug: bool = False):
-        self.verbose = verbose
-        self.debug = debug
-        self.file_path = file_path
-        self.pdz_file_name: str = os.path.splitext(os.path.basename(self.file_path))[0]
-        self.pdz_bytes: bytes = read_pdz_file(file_path)
-        self.record_types: list = self.get_record_types()
-        self.record_names: list = [record['record_name'] for record in self.record_types]
-        self.pdz_version: str = get_pdz_version(self.pdz_bytes)
+class _ImageRefsView:
+    """Stand-in tool for parse plans that keeps the offsets of images in the PDZ instead of their bytes."""
+    image_refs = True
+    spectrum_array = False
 
+    def __init__(self, block_offset: int):
+        self._block_offset = block_offset
 
-        if self.debug:
-            self.verbose = True
-            self._print_verbose("Debug mode enabled.")
-            self._print_verbose(f"PDZ Version: {self.pdz_version}")
+    def _print_verbose(self, message, *args):
+        pass
 
-        self.parsed_data: dict = {}
 
-    def _print_verbose(self, message):
-        """Helper method to print messages when verbose is enabled."""
-        if self.verbose:
-            print(message)
+def find_image_offsets(tool_class, record_type: int, block, block_offset: int) -> list:
+    """Get the offsets in the PDZ of the images of an 'Image Details' block starting at `block_offset`."""
+    parsed = run_plan(compile_record(tool_class, record_type), block, _ImageRefsView(block_offset))
+    return [image.get('image_offset') for image in parsed.get('images', [])]
 
-    @abstractmethod
-    def get_record_types(self):
-        """Abstract method to extract blocks from the PDZ file."""
-        pass
 
-    @abstractmethod
-    def parse(self):
-        """Abstract method to parse the PDZ file. and set the parsed_data attribute."""
-        pass
+class PDZOutputMixin:
+    """
+    Outputs of parsed PDZ data: JSON, CSV and JPEG images.
+    Expects `parsed_data`, `file_path`, `pdz_file_name` and `verbose` to be set by the class using it.
+    """
+    def _print_verbose(self, message, *args):
+        """Helper method to print messages when verbose is enabled, formatted only then. See `utils.print_verbose`."""
+        print_verbose(self.verbose, message, *args)
 
-    def to_json(self):
-        """Transform the parsed data to JSON."""
+    def to_json(self, indent: int = 4, binary: str = "base64", backend: str = "json"):
+        """Transform the parsed data to JSON. See `iter_json` for the parameters."""
         try:
-            return json.dumps(self.parsed_data, indent=4)
+            return ''.join(self.iter_json(indent=indent, binary=binary, backend=backend))
         except Exception as e:
-            self._print_verbose(f"Error transforming data to JSON: {e}")
+            self._print_verbose("Error transforming data to JSON: %s", e)
+            raise
 
-    def get_images_bytes(self):
-        """Get bytes of images as a list."""
+    def iter_json(self, indent: int = 4, binary: str = "base64", ndjson: bool = False, backend: str = "json",
+                  output_dir: str = '.', sidecar_files: list = None):
+        """
+        Encode the parsed data to JSON one record at a time, yielding the text in chunks to write incrementally.
+        :param indent: int Default is 4. None writes compact JSON.
+        :param binary: str How images are written: "base64" (default), "reference" (offset and length in the PDZ,
+            read from the parsed data with `image_refs=True`, else found from the position of the record) or "sidecar" (JPEG files in `output_dir`, named like `save_images`)
+        :param ndjson: bool If True, write one compact JSON line per record: `{"file": ..., "record": ..., "data": ...}`
+        :param backend: str "json", "orjson" or "auto" (orjson if installed and supports the indent)
+        :param output_dir: str Directory of the sidecar files
+        :param sidecar_files: list If given, the paths of the sidecar files written are appended to it
+        """
+        if binary not in JSON_BINARY_MODES:
+            raise ValueError(f"Unknown binary mode: {binary}. Expected one of {JSON_BINARY_MODES}")
+        if ndjson:
+            indent = None
+        dumps = get_json_dumps(backend, indent)
+
+        if ndjson:
+            for record_name, record in self.parsed_data.items():
+                record = self._json_ready_record(record_name, record, binary, output_dir, sidecar_files)
+                yield dumps({"file": self.pdz_file_name, "record": record_name, "data": record}) + '\n'
+            return
+
+        # Lay out the top-level object like `json.dumps`, with each record encoded in one call
+        if indent is None:
+            key_separator, pad = ':', ''
+        else:
+            key_separator, pad = ': ', '\n' + ' ' * indent
+        yield '{'
+        empty = True
+        for record_name, record in self.parsed_data.items():
+            record = self._json_ready_record(record_name, record, binary, output_dir, sidecar_files)
+            value = dumps(record)
+            if indent is not None:
+                value = value.replace('\n', pad)  # Newlines only occur between tokens, as strings escape them
+            yield ('' if empty else ',') + pad + dumps(record_name) + key_separator + value
+            empty = False
+        yield '}' if empty or indent is None else '\n}'
+
+    def _json_ready_record(self, record_name: str, record, binary: str, output_dir: str, sidecar_files: list = None):
+        """Replace the image bytes of 'Image Details' as set by `binary`, adding sidecar files to `sidecar_files`."""
+        if record_name != 'Image Details' or not isinstance(record, Mapping) or not record.get('images'):
+            return record
+
+        images = []
+        image_offsets = None
+        for i, image in enumerate(record['images']):
+            image = dict(image)
+            if binary == "base64":
+                image_bytes = image['image'] if 'image' in image else self._read_image(image)
+                image['image'] = base64.b64encode(image_bytes).decode('ascii')
+            elif binary == "reference":
+                if 'image' in image:
+                    # Parsed without `image_refs`: point to the image at its position in the PDZ instead
+                    if image_offsets is None:
+                        image_offsets = self._image_offsets()
+                    if i >= len(image_offsets) or image_offsets[i] is None:
+                        raise ValueError(f"No offset of image {i} in {self.file_path}")
+                    image = {('image_offset' if key == 'image' else key): (image_offsets[i] if key == 'image' else value)
+                             for key, value in image.items()}
+            else:
+                file_name = f"{self.pdz_file_name}_{i}.jpeg"
+                output_file = os.path.join(output_dir, file_name)
+                if 'image' in image:
+                    with open(output_file, 'wb') as f:
+                        f.write(image['image'])
+                else:
+                    self._save_image_ref(image, output_file)
+                if sidecar_files is not None:
+                    sidecar_files.append(output_file)
+                image['image'] = file_name
+            images.append(image)
+        return {**record, 'images': images}
+
+    def _image_offsets(self) -> list:
+        """Get the offsets in the PDZ of the images of the parsed 'Image Details', for images parsed as bytes."""
+        raise ValueError(f"Image offsets of {self.file_path} are unknown, parse with `image_refs=True`")
+
+    def _get_images(self):
+        """Get the parsed image entries of 'Image Details' as a list."""
         if hasattr(self, 'parsed_data'):
             image_record = self.parsed_data.get('Image Details', 0)
-            images_bytes = []
+            images = []
             if image_record:
-                for image in image_record.get('images'):
-                    images_bytes.append(image['image'])
+                images = image_record.get('images')
             else:
-                self._print_verbose(f"No images found: {self.file_path}")
-            return images_bytes
+                self._print_verbose("No images found: %s", self.file_path)
+            return images
         else:
             raise ValueError(f"PDZ data not yet parsed and set. Run method `.parse()` before attempting to get images.")
 
-    def save_json(self, output_dir: str = '.'):
-        """Save the parsed data to a JSON file."""
+    def get_images_bytes(self):
+        """Get bytes of images as a list. Images parsed as references (`image_refs=True`) are read from the PDZ."""
+        images_bytes = []
+        for image in self._get_images():
+            if 'image' in image:
+                images_bytes.append(image['image'])
+            else:
+                images_bytes.append(self._read_image(image))
+        return images_bytes
+
+    def save_json(self, output_dir: str = '.', indent: int = 4, binary: str = "base64", ndjson: bool = False,
+                  backend: str = "auto", sidecar_files: list = None):
+        """
+        Save the parsed data to a JSON file (`.ndjson` with `ndjson=True`), written record by record,
+        and return its path. See `iter_json` for the parameters.
+        :raises OSError: If the file cannot be written; errors of encoding the data are raised too
+        """
         try:
-            output_file = os.path.join(output_dir, f"{self.pdz_file_name}.json")
-            with open(output_file, 'w') as f:
-                f.write(self.to_json())
-            self._print_verbose(f"Data saved to {output_file}")
+            output_file = os.path.join(output_dir, f"{self.pdz_file_name}.{'ndjson' if ndjson else 'json'}")
+            with open(output_file, 'w', encoding='utf-8') as f:
+                for chunk in self.iter_json(indent=indent, binary=binary, ndjson=ndjson, backend=backend,
+                                            output_dir=output_dir, sidecar_files=sidecar_files):
+                    f.write(chunk)
+            self._print_verbose("Data saved to %s", output_file)
+            return output_file
         except Exception as e:
-            self._print_verbose(f"Error saving data to JSON: {e}")
+            self._print_verbose("Error saving data to JSON: %s", e)
+            raise
 
     def save_csv(
             self,
             record_names: list[str] = ["XRF Spectrum"],
             include_channel_start_kev: bool = False,
             output_dir: str = '.',
-            output_suffix: str = None):
+            output_suffix: str = None,
+            delimiter: str = ',',
+            float_precision: int = None):
         """
         Save the parsed data to a CSV file for the records specified by `record_names`.
         :param record_names: list[str] Default is ["XRF Spectrum"], can be ["File Header", "XRF Instrument", etc.]
         :param output_dir: str Default is '.', the current directory.
         :param output_suffix: str If None (default), sets to `_lowercase_record_name` if one record name provided and `_multiple_records` if multiple record names provided.
-        :return:
+        :param delimiter: str Default is ','.
+        :param float_precision: int If given, floats are written with this many decimals. If None (default), floats are written in full.
+        :return: str Path of the CSV file, or None if no record names were provided
         """
         """
         Process a specific node in the data and write it to a CSV file.
@@ -93,7 +194,7 @@ class BasePDZTool(ABC):
         - output_suffix (str): String to append to filename of CSV file before `.csv`.
         """
         if not record_names:
-            self._print_verbose(f"No CSV file created because no record names were provided")
+            self._print_verbose("No CSV file created because no record names were provided")
             return
 
         record_data = {}
@@ -111,44 +212,65 @@ class BasePDZTool(ABC):
 
         output_file = os.path.join(output_dir, f"{self.pdz_file_name}{output_suffix}.csv")
 
+        format_float = repr if float_precision is None else f"{{:.{float_precision}f}}".format
+
+        # Build the whole file in memory and write it at once
+        buffer = io.StringIO()
+        csvwriter = csv.writer(buffer, delimiter=delimiter)
+        line_end = csvwriter.dialect.lineterminator
+
+        # Write all other key-value pairs first
+        rows = []
+        for key, value in record_data.items():
+            if key == "acquisition_date_time":
+                # Combine acquisition_date_time into a single string
+                rows.append([key, flatten_system_date_time(value)])
+            elif key == "spectrum_data":
+                # Skip for now, handled separately
+                continue
+            elif isinstance(value, float):
+                rows.append([key, format_float(value)])
+            else:
+                rows.append([key, value])
+        csvwriter.writerows(rows)
+
+        # Handle spectrum_data as channel number and count
+        if "spectrum_data" in record_data:
+            spectrum_data = record_data["spectrum_data"]
+            if hasattr(spectrum_data, 'tolist'):
+                spectrum_data = spectrum_data.tolist()
+            channel_numbers = range(1, len(spectrum_data) + 1)
+            if include_channel_start_kev:
+                csvwriter.writerow([
+                    'channel_number',
+                    'channel_start_kev (calculated)',
+                    'channel_count'])
+                channel_start_kev = record_data.get("channel_start", 0)/1000
+                kev_per_channel = record_data.get("ev_per_channel", 0)/1000
+                channel_start_kevs = self._channel_start_kevs(len(spectrum_data), channel_start_kev, kev_per_channel)
+                buffer.write(''.join([
+                    f"{index}{delimiter}{format_float(kev)}{delimiter}{count}{line_end}"
+                    for index, kev, count in zip(channel_numbers, channel_start_kevs, spectrum_data)]))
+            else:
+                csvwriter.writerow(['channel_number', 'channel_count'])
+                buffer.write(''.join([
+                    f"{index}{delimiter}{count}{line_end}"
+                    for index, count in zip(channel_numbers, spectrum_data)]))
+
         with open(output_file, 'w', newline='') as csvfile:
-            csvwriter = csv.writer(csvfile)
-
-            # Write all other key-value pairs first
-            for key, value in record_data.items():
-                if key == "acquisition_date_time":
-                    # Combine acquisition_date_time into a single string
-                    date_time_str = flatten_system_date_time(value)
-                    csvwriter.writerow([key, date_time_str])
-                elif key == "spectrum_data":
-                    # Skip for now, handled separately
-                    continue
-                else:
-                    csvwriter.writerow([key, value])
-
-            # Handle spectrum_data as channel number and count
-            if "spectrum_data" in record_data:
-                if include_channel_start_kev:
-                    csvwriter.writerow([
-                        'channel_number',
-                        'channel_start_kev (calculated)',
-                        'channel_count'])
-                    spectrum_data = record_data["spectrum_data"]
-                    channel_start_kev = record_data.get("channel_start", 0)/1000
-                    kev_per_channel = record_data.get("ev_per_channel", 0)/1000
-                    for index, count in enumerate(spectrum_data, start=1):
-                        csvwriter.writerow([
-                            index,
-                            channel_start_kev + (index - 1)*kev_per_channel,
-                            count
-                            ])
-                else:
-                    csvwriter.writerow(['channel_number', 'channel_count'])
-                    spectrum_data = record_data["spectrum_data"]
-                    for index, count in enumerate(spectrum_data, start=1):
-                        csvwriter.writerow([index, count])
+            csvfile.write(buffer.getvalue())
+
+        self._print_verbose("CSV file created: %s", output_file)
+        return output_file
 
-        self._print_verbose(f"CSV file created: {output_file}")
+    @staticmethod
+    def _channel_start_kevs(num_channels: int, channel_start_kev: float, kev_per_channel: float) -> list:
+        """Get the start energy in keV of each channel, vectorized with NumPy if it is installed."""
+        try:
+            numpy = require_numpy()
+        except ImportError:
+            return [channel_start_kev + i*kev_per_channel for i in range(num_channels)]
+        return (channel_start_kev + numpy.arange(num_channels, dtype=numpy.float64)*kev_per_channel).tolist()
 
     def save_images(self, output_dir: str = '.', output_suffix: str = '_'):
         """
@@ -165,12 +287,353 @@ class BasePDZTool(ABC):
         - output_suffix (str): String to append to filename of JPEG file before `#.jpeg`.
         """
         try:
-            images_bytes = self.get_images_bytes()
-            n = len(images_bytes)
-            for i, image_bytes in enumerate(images_bytes):
+            images = self._get_images()
+            n = len(images)
+            for i, image in enumerate(images):
                 output_file = os.path.join(output_dir, f"{self.pdz_file_name}{output_suffix}{i}.jpeg")
-                with open(output_file, 'wb') as f:
-                    f.write(image_bytes)
-                self._print_verbose(f"Image {i+1} of {n} saved to {output_file}")
+                if 'image' in image:
+                    with open(output_file, 'wb') as f:
+                        f.write(image['image'])
+                else:
+                    # Parsed as a reference: copy straight from the PDZ without loading the bytes
+                    self._save_image_ref(image, output_file)
+                self._print_verbose("Image %s of %s saved to %s", i + 1, n, output_file)
         except Exception as e:
-            self._print_verbose(f"Error saving images: {e}")
+            self._print_verbose("Error saving images: %s", e)
+
+
+def _stack_fields(records: list[dict], exclude: tuple = ()) -> dict:
+    """
+    Stack the fields of parsed records of one type into columns: a 1-D array per numeric field,
+    a 2-D array (records × repeats) per numeric field of repeatable blocks and a list per other field.
+    Fields missing from some records (e.g. of a truncated record) are left out.
+    """
+    numpy = require_numpy()
+    stacked = {}
+    for field_name, value in records[0].items():
+        if field_name in exclude or any(field_name not in record for record in records[1:]):
+            continue
+        values = [record[field_name] for record in records]
+        if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            # Repeatable block: a records × repeats column per field
+            for sub_field_name in value[0]:
+                try:
+                    column = numpy.array([[item[sub_field_name] for item in items] for items in values])
+                except (KeyError, ValueError):
+                    continue  # Not the same fields or repeats in every record
+                stacked.setdefault(sub_field_name if sub_field_name not in records[0] else f"{field_name}_{sub_field_name}", column)
+        elif isinstance(value, (int, float)):
+            stacked[field_name] = numpy.array(values)
+        else:
+            stacked[field_name] = values
+    return stacked
+
+
+class BasePDZTool(PDZOutputMixin, ABC):
+    def __init__(self, file_path: str, verbose: bool = False, debug: bool = False, io: str = "read",
+                 pdz_bytes: bytes | mmap.mmap = None, spectrum_array: bool = False, records: list[str] = None,
+                 image_refs: bool = False, stats=None):
+        """
+        :param io: str "read" (default) loads the whole file, "mmap" memory-maps it.
+        :param pdz_bytes: bytes-like PDZ data already in memory; if given, `file_path` is not read.
+        :param spectrum_array: bool If True, `spectrum_data` is a NumPy array instead of a list (requires NumPy).
+        :param records: list[str] Names of the records to parse, e.g. ["XRF Spectrum"]. If None (default), all records.
+            With `io="read"`, only the record headers and the blocks of these records are read from the file.
+        :param image_refs: bool If True, images are parsed as `image_offset` (offset in the PDZ) and `image_length`
+            instead of `image` bytes, and `save_images` copies them file-to-file.
+        :param stats: ParseStats If given, the parse time (and memory) of each record is added to it.
+        """
+        self.verbose = verbose
+        self.debug = debug
+        self.file_path = file_path
+        self.io = io
+        self.spectrum_array = spectrum_array
+        if spectrum_array:
+            require_numpy()
+        self.records = records
+        self.image_refs = image_refs
+        self.stats = stats
+        if stats is not None:
+            stats.n_files += 1
+        self._block_offset = 0  # Offset in the PDZ of the block being parsed, for image references
+        self.pdz_file_name: str = os.path.splitext(os.path.basename(self.file_path))[0]
+        self._file = None
+        self._closed = False
+
+        # Only read the file when no buffer is handed over, and only close what was opened here
+        self._owns_buffer: bool = pdz_bytes is None
+        if pdz_bytes is None and records is not None and io == "read":
+            # Selective mode: walk the record headers with seek and read only the requested blocks
+            self.pdz_bytes: bytes | mmap.mmap = None
+            self.pdz_view: memoryview = None
+            with open(file_path, 'rb') as opened_file:
+                self._file = opened_file
+                self._total_length = os.fstat(opened_file.fileno()).st_size
+                self.pdz_version: str = get_pdz_version(self._read_at(0, 2))
+                self.record_types: list = self.get_record_types()
+            self._file = None
+        else:
+            if pdz_bytes is None:
+                pdz_bytes = read_pdz_file(file_path, io=io)
+            self.pdz_bytes = pdz_bytes
+            self.pdz_view = memoryview(self.pdz_bytes)  # Zero-copy view shared by all record slices
+            self._total_length = len(self.pdz_view)
+            self.record_types = self.get_record_types()
+            self.pdz_version = get_pdz_version(self.pdz_bytes)
+        self.record_names: list = [record['record_name'] for record in self.record_types]
+
+
+        if self.debug:
+            self.verbose = True
+            self._print_verbose("Debug mode enabled.")
+            self._print_verbose("PDZ Version: %s", self.pdz_version)
+
+        self.parsed_data: dict = {}
+
+    @classmethod
+    def from_buffer(cls, buffer, name: str = "buffer.pdz", verbose: bool = False, debug: bool = False, **kwargs):
+        """
+        Create a tool from PDZ data already in memory, skipping disk I/O.
+        :param buffer: bytes | bytearray | memoryview | mmap.mmap PDZ file contents
+        :param name: str Name used in place of the file path, e.g. for output file names
+        :param kwargs: Other keyword arguments of the tool, e.g. `spectrum_array`
+        """
+        return cls(name, verbose, debug, pdz_bytes=buffer, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Release the views over the file buffer and close the memory map when `io="mmap"`.
+        Parsed data stays available since decoded values do not reference the buffer.
+        A `bytes` buffer (`io="read"`) is kept, as releasing views over it frees nothing, so the tool keeps working.
+        A memory map or a buffer handed over with `pdz_bytes` can no longer be read: decoding the records of a lazy
+        `parsed_data` or reading images parsed as references then raises ValueError.
+        """
+        if self.pdz_bytes is None or isinstance(self.pdz_bytes, bytes):
+            return
+        self._closed = True
+        views = [record['bytes'] for record in getattr(self, 'record_types', []) if isinstance(record.get('bytes'), memoryview)]
+        if getattr(self, 'pdz_view', None) is not None:
+            views.append(self.pdz_view)
+        for view in views:
+            try:
+                view.release()
+            except BufferError:
+                pass  # Still referenced, e.g. by zero-copy spectrum arrays over a bytes buffer
+        if self._owns_buffer and isinstance(self.pdz_bytes, mmap.mmap) and not self.pdz_bytes.closed:
+            self.pdz_bytes.close()
+            self._print_verbose("Memory map closed: %s", self.file_path)
+
+    def _check_open(self):
+        """Raise ValueError if the buffer was released by `close()`."""
+        if self._closed:
+            raise ValueError(f"The PDZ tool of {self.file_path} is closed: read its records and images before closing it, "
+                             f"or open it with io=\"read\"")
+
+    def _read_image(self, image: dict):
+        """Read the bytes of an image parsed as a reference."""
+        offset, length = image['image_offset'], image['image_length']
+        if self.pdz_view is not None:
+            self._check_open()
+            return bytes(self.pdz_view[offset:offset + length])
+        with open(self.file_path, 'rb') as opened_file:
+            opened_file.seek(offset)
+            return opened_file.read(length)
+
+    def _save_image_ref(self, image: dict, output_file: str):
+        """Write an image parsed as a reference to `output_file`, copying file-to-file when the PDZ is on disk."""
+        offset, length = image['image_offset'], image['image_length']
+        if self._owns_buffer:
+            copy_file_range_to(self.file_path, offset, length, output_file)
+        else:
+            self._check_open()
+            with open(output_file, 'wb') as f:
+                f.write(self.pdz_view[offset:offset + length])
+
+    def _image_offsets(self) -> list:
+        """Get the offsets of the images of the last 'Image Details' record, as kept by `parse()`, from its position."""
+        records = [record for record in self.record_types if record['record_name'] == 'Image Details']
+        if not records:
+            return []
+        record = records[-1]
+        self._load_blocks([record])
+        return find_image_offsets(type(self), record['record_type'], record['bytes'], record['offset'])
+
+    def _read_at(self, offset: int, length: int):
+        """Get `length` bytes at `offset` of the PDZ, as a view over the buffer or read with seek in selective mode."""
+        if self.pdz_view is not None:
+            return self.pdz_view[offset:offset + length]
+        self._file.seek(offset)
+        return memoryview(self._file.read(length))
+
+    def _is_record_wanted(self, record_name: str):
+        """Whether the block of a record is loaded by `get_record_types`; always True unless in selective mode."""
+        return self.pdz_view is not None or record_name in self.records
+
+    def _select_records(self, record_names: list[str] = None, lazy: bool = False):
+        """
+        Get the records of `record_types` to parse, reading any block not loaded yet.
+        :param record_names: list[str] Names of the records; if None, `self.records` or else all records.
+        :param lazy: bool If True, leave unread blocks to be read on first access.
+        """
+        if record_names is None:
+            record_names = self.records
+        selected = [
+            record for record in self.record_types
+            if record_names is None or record['record_name'] in record_names
+        ]
+
+        if not lazy:
+            self._load_blocks(selected)
+
+        return selected
+
+    def _load_blocks(self, records: list[dict]):
+        """Read the blocks of records skipped in selective mode."""
+        self._check_open()
+        missing = [record for record in records if record['bytes'] is None]
+        if missing:
+            with open(self.file_path, 'rb') as opened_file:
+                for record in missing:
+                    opened_file.seek(record['offset'])
+                    record['bytes'] = memoryview(opened_file.read(record['data_length']))
+
+    def _parse_record(self, record: dict):
+        """Parse a record of `record_types` with `parse_record_type`, measured by `stats` if given."""
+        if self.stats is None:
+            return self.parse_record_type(record['record_type'], record['bytes'], record['offset'])
+        return self.stats.measure(record['record_type'], record['record_name'], record['data_length'],
+                                  self.parse_record_type, record['record_type'], record['bytes'], record['offset'])
+
+    @abstractmethod
+    def get_record_types(self):
+        """
+        Abstract method to extract blocks from the PDZ file.
+        Headers and blocks are read with `_read_at`; blocks of records not wanted (`_is_record_wanted`) are left as None.
+        """
+        pass
+
+    def _parse_lazy(self, record_names: list[str] = None):
+        """Set `parsed_data` as a LazyParsedData which decodes each record on first access."""
+        self.parsed_data = LazyParsedData(self, self._select_records(record_names, lazy=True))
+        return self.parsed_data
+
+    def parse_records(self, record_name: str) -> list[dict]:
+        """
+        Parse every record named `record_name`, in file order. Unlike `parse()`, which keeps the last record
+        of each name, records that appear more than once (e.g. the XRF Spectrum of each phase) are all kept.
+        :return: list[dict]
+        """
+        return [self._parse_record(record) for record in self._select_records([record_name])]
+
+    def stack_spectra(self, record_name: str = 'XRF Spectrum') -> dict:
+        """
+        Stack the spectra of all phases (every record named `record_name`, e.g. the beams of a multi-beam assay)
+        into one phases × channels array, with one column per metadata field. Unlike `parse()`, which keeps the
+        last record of each name, all phases are kept, in file order. Requires NumPy.
+        :param record_name: str Name of the spectrum records
+        :return: dict
+            - "spectra": 2-D array (phases × channels) of channel counts
+            - a 1-D array (phases) per numeric field, e.g. "phase_number", "tube_voltage", "tube_current", "total_live"
+            - a 2-D array (phases × repeats) per numeric field of repeatable blocks, e.g. "filter_element", "filter_thickness"
+            - a list (phases) per other field, e.g. "acquisition_date_time"
+        """
+        numpy = require_numpy()
+        phases = self.parse_records(record_name)
+        if not phases:
+            raise ValueError(f"No {record_name} records in {self.file_path}")
+
+        num_channels = {len(phase.get('spectrum_data', ())) for phase in phases}
+        if len(num_channels) != 1:
+            raise ValueError(f"Spectra of {sorted(num_channels)} channels cannot be stacked: {self.file_path}")
+        spectra = numpy.empty((len(phases), num_channels.pop()), dtype=SpectrumStep.DTYPES[self.SPECTRUM_FORMAT])
+        for row, phase in zip(spectra, phases):
+            row[:] = phase['spectrum_data']
+
+        return {"spectra": spectra, **_stack_fields(phases, exclude=('spectrum_data',))}
+
+    def stack_results(self, record_name: str = 'Calculated Results Details') -> dict:
+        """
+        Collect the element results (every record named `record_name`, one per element) into columns.
+        Unlike `parse()`, which keeps the last record of each name, all elements are kept, in file order.
+        Requires NumPy. See `columnar.results_matrix` to pivot them over many PDZs.
+        :param record_name: str Name of the element result records
+        :return: dict with a list (elements) "name" and a 1-D array (elements) per numeric field:
+            "atomic_number", "units", "result", "type_std_result", "error", "min", "max", "tramp", "nominal"
+        """
+        elements = self.parse_records(record_name)
+        if not elements:
+            raise ValueError(f"No {record_name} records in {self.file_path}")
+        return _stack_fields(elements, exclude=('name_length',))
+
+    def stack_packets(self, record_name: str = 'Raw XRF Spectrum Packet') -> dict:
+        """
+        Decode all records named `record_name` in one pass with a NumPy structured dtype over their bytes,
+        for dead time, reset count and temperature diagnostics over many packets. Requires NumPy.
+        Values are raw as in the PDZ, e.g. `detector_temp` in half °C and `ambient_temp` in tenths of °F.
+        The spectra are the rest of each block; `parse()` leaves the `spectrum_data` of packets empty, as they have
+        no channel count field.
+        :param record_name: str Name of records of fixed-width fields, optionally ending with spectrum data
+        :return: dict
+            - "spectra": 2-D array (packets × channels) of channel counts
+            - a 1-D array (packets) per field, e.g. "dead_time", "reset_count", "detector_temp", "live_time"
+        """
+        records = self._select_records([record_name])
+        if not records:
+            raise ValueError(f"No {record_name} records in {self.file_path}")
+        columns = decode_blocks([record['bytes'] for record in records], type(self), records[0]['record_type'])
+        if 'spectrum_data' not in columns:
+            return columns
+        return {"spectra": columns.pop('spectrum_data'), **columns}
+
+    def save_phases_csv(self, output_dir: str = '.', output_suffix: str = '_phases', delimiter: str = ',',
+                        float_precision: int = None):
+        """
+        Save the spectra of all phases (see `stack_spectra`) to one CSV file, with a column per phase:
+        first a row per metadata field, then the channel counts. Requires NumPy.
+        :param output_dir: str Default is '.', the current directory.
+        :param output_suffix: str Default is '_phases', where the filename is `pdz_file_name` + `output_suffix` + `.csv`.
+        :param delimiter: str Default is ','.
+        :param float_precision: int If given, floats are written with this many decimals. If None (default), floats are written in full.
+        :return: str Path of the CSV file
+        """
+        stacked = self.stack_spectra()
+        spectra = stacked.pop("spectra")
+        format_float = repr if float_precision is None else f"{{:.{float_precision}f}}".format
+
+        def format_values(values):
+            return [format_float(value) if isinstance(value, float) else value for value in values]
+
+        rows = []
+        for key, column in stacked.items():
+            if hasattr(column, 'ndim') and column.ndim == 2:
+                for j, values in enumerate(column.T.tolist()):
+                    rows.append([f"{key}_{j + 1}", *format_values(values)])
+            else:
+                rows.append([key, *format_values(column.tolist() if hasattr(column, 'tolist') else column)])
+
+        buffer = io.StringIO()
+        csvwriter = csv.writer(buffer, delimiter=delimiter)
+        csvwriter.writerows(rows)
+        csvwriter.writerow(['channel_number', *(f"phase_{i + 1}_count" for i in range(len(spectra)))])
+        line_end = csvwriter.dialect.lineterminator
+        buffer.write(''.join([
+            f"{index}{delimiter}{delimiter.join(map(str, counts))}{line_end}"
+            for index, counts in enumerate(spectra.T.tolist(), start=1)]))
+
+        output_file = os.path.join(output_dir, f"{self.pdz_file_name}{output_suffix}.csv")
+        with open(output_file, 'w', newline='') as csvfile:
+            csvfile.write(buffer.getvalue())
+
+        self._print_verbose("CSV file created: %s", output_file)
+        return output_file
+
+    @abstractmethod
+    def parse(self, record_names: list[str] = None, lazy: bool = False):
+        """Abstract method to parse the PDZ file. and set the parsed_data attribute."""
+        pass
@@ -1,59 +1,337 @@
 import argparse
+import glob
 import os
-from pdz_tool import PDZTool
-from .config import VERSION
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-def print_verbose(msg, verbose=False):
-    if verbose:
-        print(msg)
+from .pdz_tool import PDZTool
+from .stream import PDZStreamReader
+from .columnar import export_corpus
+from .parse_cache import ParseCache
+from .manifest import BatchManifest, fingerprint_file, describe_outputs
+from .stats import ParseStats
+from .config import VERSION, COLUMNAR_FORMATS, JSON_BINARY_MODES
+from .utils import print_verbose
 
-def parse_pdz_file(file_path, output_dir, output_format, verbose=False, debug=False):
-    try:
-        print(f"PDZ Tool v{VERSION} CLI\n")
+STDIN_PATH = '-'  # File path argument to read a PDZ streamed on stdin
+STATS_FILE_NAME = 'pdz_stats.json'  # Parse stats saved in the output directory with `--stats`
+
+def collect_pdz_files(paths, recursive=False, roots=None):
+    """
+    Expand files, directories and glob patterns into a sorted list of unique PDZ file paths.
+    :param paths: list[str] Files, directories (searched for `*.pdz`) or glob patterns
+    :param recursive: bool If True, search directories recursively and let `**` in patterns match subdirectories
+    :param roots: dict If given, the root of each file is added to it as `{file_path: root}`: the directory
+        searched, the directory part of the pattern before any wildcard, or the directory of an explicit file
+    :return: list[str]
+    """
+    file_paths = set()
+    for path in paths:
+        if path == STDIN_PATH:
+            file_paths.add(path)
+            continue
+        elif os.path.isdir(path):
+            root = path
+            pattern = os.path.join(path, '**', '*.pdz') if recursive else os.path.join(path, '*.pdz')
+            matches = glob.glob(pattern, recursive=recursive)
+        elif glob.has_magic(path):
+            root = _pattern_root(path)
+            matches = []
+            for match in glob.glob(path, recursive=recursive):
+                if os.path.isdir(match):
+                    matches.extend(collect_pdz_files([match], recursive=recursive))
+                elif match.lower().endswith('.pdz'):
+                    matches.append(match)
+        else:
+            root = os.path.dirname(path)
+            matches = [path]  # Explicit files are kept even if missing so the failure is reported
+        matches = [os.path.abspath(match) for match in matches]
+        file_paths.update(matches)
+        if roots is not None:
+            for match in matches:
+                roots.setdefault(match, os.path.abspath(root))
+    return sorted(file_paths)
+
+def _pattern_root(pattern):
+    """Get the directory part of a glob pattern before its first wildcard."""
+    parts = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or os.curdir
+
+def get_output_dirs(file_paths, output_dir, roots=None):
+    """
+    Get the output directory of each file, mirroring its directory relative to its root under `output_dir`,
+    so files of the same name in different directories do not overwrite each other's outputs.
+    :param roots: dict {file_path: root} from `collect_pdz_files`; files without a root are written to `output_dir`
+    :return: dict {file_path: output directory}
+    :raises ValueError: If files would still write the same outputs, e.g. explicit files of the same name
+    """
+    roots = roots or {}
+    output_dirs = {}
+    stems = {}
+    for file_path in file_paths:
+        root = roots.get(file_path)
+        relative_dir = os.path.relpath(os.path.dirname(file_path), root) if root else os.curdir
+        file_output_dir = os.path.normpath(os.path.join(output_dir, relative_dir))
+        output_dirs[file_path] = file_output_dir
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        stems.setdefault(os.path.normcase(os.path.join(file_output_dir, stem)), []).append(file_path)
+
+    conflicts = [paths for paths in stems.values() if len(paths) > 1]
+    if conflicts:
+        raise ValueError("These files would write the same outputs, rename them or process them separately:\n"
+                         + '\n'.join(f"    {', '.join(paths)}" for paths in conflicts))
+    return output_dirs
+
+@lru_cache(maxsize=None)
+def get_parse_cache(cache_dir):
+    """Get the parse cache of a directory, one per process."""
+    return ParseCache(cache_dir)
 
+def parse_pdz_file(file_path, output_dir, output_format, verbose=False, debug=False, cache_dir=None, outputs=None,
+                   json_options=None, stats=None, phases=False):
+    """
+    Parse a PDZ file and save it to JSON and/or CSV.
+    :param phases: bool If True, with CSV output also save the spectra of all phases to `<name>_phases.csv`
+        (see `save_phases_csv`), as the CSV of the XRF Spectrum has the last phase only
+    :param cache_dir: str If given, reuse the parsed data of unchanged files from this cache directory
+    :param json_options: dict Options of `save_json`, e.g. `{"indent": None, "binary": "reference"}`
+    :param stats: ParseStats If given, the parse time of each record is added to it (files parsed from the cache are not)
+    :param outputs: list If given, the paths of the saved files are appended to it
+    :return: str | None Error message if processing failed, else None
+    """
+    saved = []
+    json_options = json_options or {}
+    image_refs = json_options.get('binary') == 'reference'  # Offsets of the images in the PDZ
+    try:
         if debug:
             verbose = True
             print("Debug mode enabled.")
 
 
-        print_verbose(f"Processing {file_path} ...", verbose=verbose)
+        print_verbose(verbose, "Processing %s ...", file_path)
 
-        pdz_tool = PDZTool(file_path, verbose=verbose, debug=debug)
+        if file_path == STDIN_PATH:
+            # Parse records as they arrive on stdin, one block in memory at a time
+            pdz_tool = PDZStreamReader(sys.stdin.buffer, name="stdin.pdz", verbose=verbose, debug=debug)
+        elif cache_dir:
+            pdz_tool = get_parse_cache(cache_dir).parse(file_path, verbose=verbose, debug=debug, image_refs=image_refs, stats=stats)
+            if pdz_tool is None:
+                raise ValueError("Unable to parse PDZ file")
+        else:
+            pdz_tool = PDZTool(file_path, verbose=verbose, debug=debug, image_refs=image_refs, stats=stats)
 
-        print_verbose("Parsing file ...", verbose=verbose)
+        print_verbose(verbose, "Parsing file ...")
         parsed_pdz = pdz_tool.parse()
+        if parsed_pdz is None:
+            raise ValueError("Unable to parse PDZ file")
 
-        if debug:
-            print_verbose(f"PDZ Version: {pdz_tool.pdz_version}", verbose=verbose)
-            print_verbose(f"PDZ Bytes: {pdz_tool.pdz_bytes[:10]}...", verbose=verbose)
-            print_verbose(f"PDZ Record Types Count: {len(pdz_tool.record_types)}", verbose=verbose)
-            print_verbose(f"Record Names: {pdz_tool.record_names}", verbose=verbose)
+        if debug and isinstance(pdz_tool, PDZTool):
+            print_verbose(verbose, "PDZ Version: %s", pdz_tool.pdz_version)
+            print_verbose(verbose, "PDZ Bytes: %s...", pdz_tool.pdz_bytes[:10])
+            print_verbose(verbose, "PDZ Record Types Count: %s", len(pdz_tool.record_types))
+            print_verbose(verbose, "Record Names: %s", pdz_tool.record_names)
 
+        os.makedirs(output_dir, exist_ok=True)
         if output_format == 'json' or output_format == 'all':
-            print_verbose(f"Saving JSON to {output_dir} ...", verbose=verbose)
-            pdz_tool.save_json(output_dir=output_dir)
+            print_verbose(verbose, "Saving JSON to %s ...", output_dir)
+            sidecar_files = []
+            output_file = pdz_tool.save_json(output_dir=output_dir, sidecar_files=sidecar_files, **json_options)
+            if output_file is None:
+                raise ValueError("Unable to save JSON")
+            saved.append(output_file)
+            saved.extend(sidecar_files)  # Images of `--json-binary sidecar`
 
         if output_format == 'csv' or output_format == 'all':
-            print_verbose("Saving XRF Spectrum to CSV ...", verbose=verbose)
-            pdz_tool.save_csv(output_dir=output_dir)
+            print_verbose(verbose, "Saving XRF Spectrum to CSV ...")
+            saved.append(pdz_tool.save_csv(output_dir=output_dir))
+            if phases:
+                print_verbose(verbose, "Saving the spectra of all phases to CSV ...")
+                saved.append(_save_phases_csv(pdz_tool, file_path, output_dir))
 
+        if outputs is not None:
+            outputs.extend(saved)
         print(f"File {file_path} processed successfully.")
+        return None
     except Exception as e:
         print(f"An error occurred while processing {file_path}: {e}")
+        return f"{type(e).__name__}: {e}"
+
+def _save_phases_csv(pdz_tool, file_path, output_dir):
+    """Save the spectra of all phases, reading them from the PDZ if `pdz_tool` only has the cached parsed data."""
+    if hasattr(pdz_tool, 'save_phases_csv'):
+        return pdz_tool.save_phases_csv(output_dir=output_dir)
+    if file_path == STDIN_PATH:
+        raise ValueError("The spectra of all phases cannot be saved from stdin")
+    with PDZTool(file_path, records=['XRF Spectrum']) as phases_tool:
+        return phases_tool.save_phases_csv(output_dir=output_dir)
+
+def _parse_pdz_file_task(task):
+    """
+    Unpack a task for `ProcessPoolExecutor.map` and return the file path with its error, if any,
+    its manifest entry `(fingerprint, outputs)` if the task asks for one, and its parse stats if it asks for them.
+    """
+    file_path, output_dir, output_format, verbose, debug, cache_dir, json_options, phases, manifest, trace_memory = task
+    stats = None
+    if trace_memory is not None:
+        stats = ParseStats(trace_memory=trace_memory)
+        stats.start()
+    try:
+        if not manifest:
+            return file_path, parse_pdz_file(file_path, output_dir, output_format, verbose=verbose, debug=debug, cache_dir=cache_dir,
+                                             json_options=json_options, stats=stats, phases=phases), None, stats and stats.to_dict()
+
+        outputs = []
+        try:
+            fingerprint = fingerprint_file(file_path)  # Taken first, so a file changed while processing is processed again
+        except OSError as e:
+            print(f"An error occurred while processing {file_path}: {e}")
+            return file_path, f"{type(e).__name__}: {e}", None, None
+        error = parse_pdz_file(file_path, output_dir, output_format, verbose=verbose, debug=debug, cache_dir=cache_dir, outputs=outputs,
+                               json_options=json_options, stats=stats, phases=phases)
+        if error:
+            return file_path, error, None, stats and stats.to_dict()
+        return file_path, None, (fingerprint, describe_outputs(outputs)), stats and stats.to_dict()
+    finally:
+        if stats is not None:
+            stats.stop()
+
+def parse_pdz_files(file_paths, output_dir, output_format, jobs=1, verbose=False, debug=False, cache_dir=None, manifest=False,
+                    json_options=None, stats=None, output_dirs=None, verify_outputs=False, phases=False):
+    """
+    Parse PDZ files serially or across `jobs` worker processes, isolating failures per file.
+    :param phases: bool If True, with CSV output also save the spectra of all phases, see `parse_pdz_file`
+    :param output_dirs: dict {file_path: output directory} from `get_output_dirs`; other files are saved to `output_dir`
+    :param json_options: dict Options of `save_json`, see `parse_pdz_file`
+    :param stats: ParseStats If given, the parse stats of all files (from all workers) are added to it
+    :param manifest: bool If True, skip files recorded as unchanged in the manifest of `output_dir`, and record
+        each processed file as soon as it is done, so a rerun (or a run after a crash) only processes the rest
+    :param verify_outputs: bool With `manifest`, also compare the content hashes of the outputs, not only their sizes
+    :return: dict {file_path: error message} of the files that failed
+    """
+    failures = {}
+    if STDIN_PATH in file_paths:
+        # stdin belongs to this process, so it is never handed to a worker
+        error = parse_pdz_file(STDIN_PATH, output_dir, output_format, verbose=verbose, debug=debug, json_options=json_options,
+                               phases=phases)
+        if error:
+            failures[STDIN_PATH] = error
+
+    file_paths = [file_path for file_path in file_paths if file_path != STDIN_PATH]
+    if not manifest:
+        _run_tasks(file_paths, output_dir, output_format, jobs, verbose, debug, cache_dir, json_options, failures, stats=stats,
+                   output_dirs=output_dirs, phases=phases)
+        return failures
+
+    options = {"output_format": output_format, **(json_options or {})}
+    if phases:
+        options["phases"] = True  # Only when set, so files recorded before the option existed stay current
+    with BatchManifest(output_dir, verify_outputs=verify_outputs) as batch_manifest:
+        changed = [file_path for file_path in file_paths if not batch_manifest.is_current(file_path, options)]
+        n_unchanged = len(file_paths) - len(changed)
+        if n_unchanged:
+            print(f"Skipping {n_unchanged} unchanged PDZ file{'s'[:n_unchanged^1]} recorded in {batch_manifest.path}")
+        _run_tasks(changed, output_dir, output_format, jobs, verbose, debug, cache_dir, json_options, failures, stats=stats,
+                   output_dirs=output_dirs, phases=phases, on_done=lambda file_path, entry: batch_manifest.record(file_path, *entry, options=options))
+    return failures
+
+def _run_tasks(file_paths, output_dir, output_format, jobs, verbose, debug, cache_dir, json_options, failures, stats=None,
+               output_dirs=None, phases=False, on_done=None):
+    """
+    Run the tasks of the files, adding errors to `failures`, parse stats to `stats` and passing manifest entries
+    to `on_done` as they finish.
+    """
+    trace_memory = None if stats is None else stats.trace_memory
+    output_dirs = output_dirs or {}
+    tasks = [(file_path, output_dirs.get(file_path, output_dir), output_format, verbose, debug, cache_dir, json_options, phases,
+              on_done is not None, trace_memory)
+             for file_path in file_paths]
+
+    def collect(results):
+        for file_path, error, entry, file_stats in results:
+            if file_stats is not None:
+                stats.merge(file_stats)
+            if error:
+                failures[file_path] = error
+            elif on_done is not None:
+                on_done(file_path, entry)
+
+    if jobs == 1 or len(tasks) <= 1:
+        collect(map(_parse_pdz_file_task, tasks))
+        return
+
+    # Send tasks in chunks to limit inter-process overhead on large batches
+    chunksize = max(1, min(64, len(tasks) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        collect(executor.map(_parse_pdz_file_task, tasks, chunksize=chunksize))
+
+def print_summary(file_paths, failures):
+    n = len(file_paths)
+    n_failed = len(failures)
+    print(f"\n{n - n_failed} of {n} PDZ file{'s'[:n^1]} processed successfully, {n_failed} failed.")
+    for file_path, error in failures.items():
+        print(f"    {file_path}: {error}")
 
 def main():
     parser = argparse.ArgumentParser(description="PDZ Tool CLI - Parse and convert PDZ files to JSON and CSV formats.")
 
-    parser.add_argument('file_path', type=str, help='Path to the PDZ file')
+    parser.add_argument('file_paths', type=str, nargs='+', help='Paths to PDZ files, directories of PDZ files, or glob patterns; `-` reads a PDZ from stdin')
+    parser.add_argument('--recursive', '-r', action='store_true', help='Search directories (and `**` in patterns) recursively')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Number of worker processes; 0 uses all CPUs')
     parser.add_argument('--output-dir', type=str, default=os.getcwd(), help='Output directory for parsed files')
-    parser.add_argument('--output-format', type=str, default='all', choices=['json', 'csv', 'all'], help='Output format for parsed files')
+    parser.add_argument('--output-format', type=str, default='all', choices=['json', 'csv', 'all', *COLUMNAR_FORMATS],
+                        help='Output format for parsed files; `parquet` and `arrow` write one set of tables for all files')
+    parser.add_argument('--phases', action='store_true', help='With CSV output, also save the spectra of all phases to `<name>_phases.csv` (requires NumPy)')
+    parser.add_argument('--compact', action='store_true', help='Write JSON without indentation')
+    parser.add_argument('--ndjson', action='store_true', help='Write JSON as one line per record (`.ndjson`)')
+    parser.add_argument('--json-binary', type=str, default='base64', choices=JSON_BINARY_MODES,
+                        help='How images are written in JSON: base64 strings, offset and length in the PDZ, or sidecar JPEG files')
+    parser.add_argument('--incremental', action='store_true', help='Only process new or changed files, using a manifest kept in the output directory')
+    parser.add_argument('--verify-outputs', action='store_true', help='With --incremental, also check the content hashes of the outputs, not only their sizes')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Directory to cache parsed files, so unchanged files are not parsed again')
+    parser.add_argument('--stats', action='store_true', help=f'Report the parse time per record type and save it to {STATS_FILE_NAME} in the output directory')
+    parser.add_argument('--trace-memory', action='store_true', help='With --stats, also report the memory allocated per record type (slower)')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose mode')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
     parser.add_argument('--version', action='version', version=f'PDZ Tool v{VERSION} CLI')
 
     args = parser.parse_args()
 
-    parse_pdz_file(args.file_path, args.output_dir, args.output_format, verbose=args.verbose, debug=args.debug)
+    print(f"PDZ Tool v{VERSION} CLI\n")
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    roots = {}
+    file_paths = collect_pdz_files(args.file_paths, recursive=args.recursive, roots=roots)
+    if not file_paths:
+        print("No PDZ files found.")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stats = ParseStats(trace_memory=args.trace_memory) if args.stats else None
+    if args.output_format in COLUMNAR_FORMATS:
+        failures = {STDIN_PATH: "Columnar output is only for PDZ files"} if STDIN_PATH in file_paths else {}
+        failures.update(export_corpus([file_path for file_path in file_paths if file_path != STDIN_PATH], args.output_dir,
+                                      output_format=args.output_format, jobs=jobs, verbose=args.verbose or args.debug, stats=stats))
+    else:
+        try:
+            output_dirs = get_output_dirs([file_path for file_path in file_paths if file_path != STDIN_PATH], args.output_dir, roots)
+        except ValueError as e:
+            print(e)
+            return 1
+        failures = parse_pdz_files(file_paths, args.output_dir, args.output_format, jobs=jobs, verbose=args.verbose, debug=args.debug,
+                                   cache_dir=args.cache_dir, manifest=args.incremental, verify_outputs=args.verify_outputs,
+                                   json_options={"indent": None if args.compact else 4, "ndjson": args.ndjson, "binary": args.json_binary},
+                                   stats=stats, output_dirs=output_dirs, phases=args.phases)
+    print_summary(file_paths, failures)
+    if stats is not None:
+        print(f"\n{stats.report()}")
+        print(f"\nParse stats saved to {stats.save_json(os.path.join(args.output_dir, STATS_FILE_NAME))}")
+
+    return 1 if failures else 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,341 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from .config import COLUMNAR_FORMATS
+from .pdz_tool import PDZTool
+from .stats import ParseStats
+from .utils import print_verbose, require_numpy, require_pyarrow
+
+
+class PDZColumnarExporter:
+    """
+    Write the records of many PDZs to columnar Arrow IPC or Parquet files, one table per record.
+
+    - `spectra` has the `XRF Spectrum` fields of each phase of each PDZ (numbered from 1 in file order in the
+      `phase` column), with `spectrum_data` as a fixed-size list of channel counts next to the energy calibration
+      (`channel_start`, `ev_per_channel`)
+    - each metadata record (e.g. 'XRF Instrument', 'GPS Details') gets a table named like
+      `xrf_instrument`, with one row per PDZ
+
+    Every table starts with a `file` column. Only scalar fields are kept in the tables; repeatable blocks
+    (e.g. filters) and images stay in the JSON output. Rows are buffered and written as one row group
+    (Parquet) or record batch (Arrow) every `row_group_size` PDZs, so memory stays flat for any corpus size.
+
+    Example:
+        with PDZColumnarExporter('out', output_format='parquet') as exporter:
+            for file_path in file_paths:
+                with PDZTool(file_path, records=exporter.record_names) as pdz_tool:
+                    pdz_tool.parse()
+                    exporter.add(pdz_tool)
+    """
+    SPECTRUM_RECORD = 'XRF Spectrum'
+    SPECTRA_TABLE = 'spectra'
+    METADATA_RECORDS = (
+        'File Header',
+        'XRF Instrument',
+        'XRF Assay Summary',
+        'Calculated Results',
+        'Filter Layers',
+        'GPS Details',
+        'Miscellaneous Information',
+    )
+    EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+    def __init__(self, output_dir: str = '.', output_format: str = "parquet", metadata_records: list[str] = None,
+                 row_group_size: int = 1024, verbose: bool = False):
+        """
+        :param output_dir: str Directory of the table files, created if missing
+        :param output_format: str `"parquet"` or `"arrow"` (Arrow IPC file)
+        :param metadata_records: list[str] Names of the metadata records written to their own tables. Default is `METADATA_RECORDS`.
+        :param row_group_size: int Number of PDZs buffered per row group
+        """
+        if output_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar output format: {output_format}. Choose from {COLUMNAR_FORMATS}")
+        self.pa = require_pyarrow()
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.metadata_records = list(self.METADATA_RECORDS if metadata_records is None else metadata_records)
+        self.row_group_size = row_group_size
+        self.verbose = verbose
+
+        self._rows = {}  # {record_name: [row, ...]} waiting to be written
+        self._writers = {}  # {record_name: (writer, schema of the rows without spectrum_data)}
+        self._num_channels = None
+        self.n_files = 0
+
+    @property
+    def record_names(self) -> list[str]:
+        """Names of the records used by the exporter, e.g. for `PDZTool(path, records=...)`."""
+        return [self.SPECTRUM_RECORD] + self.metadata_records
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _print_verbose(self, message, *args):
+        """Helper method to print messages when verbose is enabled, formatted only then. See `utils.print_verbose`."""
+        print_verbose(self.verbose, message, *args)
+
+    def add(self, pdz_tool):
+        """Add the parsed data of a PDZ tool (after `.parse()`), with the spectra of all its phases."""
+        self.add_parsed_data(pdz_tool.file_path, pdz_tool.parsed_data, pdz_tool.parse_records(self.SPECTRUM_RECORD))
+
+    def add_parsed_data(self, file_path: str, parsed_data, spectra: list[dict] = None):
+        """
+        Add the parsed data of a PDZ, keyed by record name as returned by `parse()`.
+        :param file_path: str Value of the `file` column
+        :param parsed_data: dict | LazyParsedData
+        :param spectra: list[dict] XRF Spectrum records of all phases, e.g. from `parse_records`.
+            If None, the spectrum of `parsed_data` (the last phase) is the only one.
+        """
+        if spectra is None:
+            spectra = [parsed_data.get(self.SPECTRUM_RECORD)]
+
+        rows = {}
+        for record_name in self.record_names:
+            records = spectra if record_name == self.SPECTRUM_RECORD else [parsed_data.get(record_name)]
+            for phase, record in enumerate(records, 1):
+                if not isinstance(record, dict):
+                    continue  # Missing, or a record without fields to parse
+                row = {'file': file_path}
+                if record_name == self.SPECTRUM_RECORD:
+                    row['phase'] = phase
+                row.update((key, value) for key, value in record.items() if isinstance(value, (int, float, str)))
+                if record_name == self.SPECTRUM_RECORD:
+                    row['spectrum_data'] = self._check_spectrum(record.get('spectrum_data'), file_path)
+                rows.setdefault(record_name, []).append(row)
+
+        # Checked before buffering, so a PDZ that does not fit adds no rows to any table
+        for record_name, record_rows in rows.items():
+            self._rows.setdefault(record_name, []).extend(record_rows)
+
+        self.n_files += 1
+        if self.n_files % self.row_group_size == 0:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows of each table as a row group."""
+        for record_name, rows in self._rows.items():
+            if rows:
+                self._write_rows(record_name, rows)
+                rows.clear()
+
+    def close(self):
+        """Write the remaining rows and close the table files."""
+        self.flush()
+        for writer, _ in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def table_path(self, record_name: str) -> str:
+        """Get the file path of the table of a record."""
+        if record_name == self.SPECTRUM_RECORD:
+            table_name = self.SPECTRA_TABLE
+        else:
+            table_name = record_name.replace(' ', '_').replace('/', '_').lower()
+        return os.path.join(self.output_dir, f"{table_name}{self.EXTENSIONS[self.output_format]}")
+
+    def _write_rows(self, record_name: str, rows: list[dict]):
+        pa = self.pa
+        spectra = None
+        if record_name == self.SPECTRUM_RECORD:
+            spectra = [row.pop('spectrum_data') for row in rows]
+
+        if record_name in self._writers:
+            writer, row_schema = self._writers[record_name]
+            # Match the schema of the first row group: missing fields are null and new fields are dropped
+            table = pa.Table.from_pylist(rows, schema=row_schema)
+        else:
+            writer = None
+            table = pa.Table.from_pylist(rows)
+            row_schema = table.schema
+
+        if spectra is not None:
+            table = table.append_column('spectrum_data', self._spectra_array(spectra))
+
+        if writer is None:
+            writer = self._open_writer(self.table_path(record_name), table.schema)
+            self._writers[record_name] = (writer, row_schema)
+            self._print_verbose("Writing %s to %s", record_name, self.table_path(record_name))
+
+        if self.output_format == "parquet":
+            writer.write_table(table, row_group_size=len(table))
+        else:
+            writer.write_table(table)
+
+    def _check_spectrum(self, spectrum, file_path: str):
+        """Check that a spectrum fits the fixed-size list column, which takes its size from the first spectrum."""
+        if spectrum is None:
+            raise ValueError(f"No spectrum data in file: {file_path}")
+        if self._num_channels is None:
+            self._num_channels = len(spectrum)
+        elif len(spectrum) != self._num_channels:
+            raise ValueError(f"Spectrum of {len(spectrum)} channels does not fit the {self._num_channels} "
+                             f"channels of the spectra table. File: {file_path}")
+        return spectrum
+
+    def _spectra_array(self, spectra: list):
+        """
+        Build the fixed-size list column of channel counts of a row group.
+        Counts are 64-bit signed, to hold both the unsigned counts of PDZ 25 and the signed counts of PDZ 24.
+        """
+        pa = self.pa
+        counts = pa.array(chain.from_iterable(spectra), type=pa.int64(), size=len(spectra) * self._num_channels)
+        return pa.FixedSizeListArray.from_arrays(counts, self._num_channels)
+
+    def _open_writer(self, path: str, schema):
+        if self.output_format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(path, schema)
+        return self.pa.ipc.new_file(path, schema)
+
+
+def _parse_for_export(task):
+    """
+    Parse only the exported records of a PDZ in a worker and return them with the spectra of all phases,
+    the error, if any, and the parse stats if the task asks for them.
+    """
+    file_path, record_names, trace_memory = task
+    stats = None
+    if trace_memory is not None:
+        stats = ParseStats(trace_memory=trace_memory)
+        stats.start()
+    try:
+        with PDZTool(file_path, records=record_names, stats=stats) as pdz_tool:
+            spectrum_record = PDZColumnarExporter.SPECTRUM_RECORD
+            parsed_data = pdz_tool.parse([record_name for record_name in record_names if record_name != spectrum_record])
+            if parsed_data is None:
+                raise ValueError("Unable to parse PDZ file")
+            spectra = pdz_tool.parse_records(spectrum_record) if spectrum_record in record_names else []
+            return file_path, parsed_data, spectra, None, stats and stats.to_dict()
+    except Exception as e:
+        return file_path, None, None, f"{type(e).__name__}: {e}", stats and stats.to_dict()
+    finally:
+        if stats is not None:
+            stats.stop()
+
+
+def export_corpus(file_paths: list[str], output_dir: str = '.', output_format: str = "parquet", jobs: int = 1,
+                  verbose: bool = False, stats: ParseStats = None, **kwargs):
+    """
+    Parse PDZ files, serially or across `jobs` worker processes, and write them to columnar tables.
+    :param stats: ParseStats If given, the parse stats of all files (from all workers) are added to it
+    :param kwargs: Passed to `PDZColumnarExporter`, e.g. `metadata_records` and `row_group_size`
+    :return: dict {file_path: error message} of the files that failed
+    """
+    failures = {}
+    with PDZColumnarExporter(output_dir, output_format=output_format, verbose=verbose, **kwargs) as exporter:
+        trace_memory = None if stats is None else stats.trace_memory
+        tasks = [(file_path, exporter.record_names, trace_memory) for file_path in file_paths]
+
+        if jobs == 1 or len(tasks) <= 1:
+            results = map(_parse_for_export, tasks)
+            executor = None
+        else:
+            chunksize = max(1, min(64, len(tasks) // (jobs * 4)))
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            results = executor.map(_parse_for_export, tasks, chunksize=chunksize)
+
+        try:
+            for file_path, parsed_data, spectra, error, file_stats in results:
+                if file_stats is not None:
+                    stats.merge(file_stats)
+                if error is None:
+                    try:
+                        exporter.add_parsed_data(file_path, parsed_data, spectra)
+                    except ValueError as e:
+                        error = f"{type(e).__name__}: {e}"
+                if error:
+                    print(f"An error occurred while processing {file_path}: {error}")
+                    failures[file_path] = error
+                else:
+                    print(f"File {file_path} processed successfully.")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    return failures
+
+
+RESULTS_RECORD = 'Calculated Results Details'
+
+
+def _stack_results(task):
+    """
+    Collect the element results of a PDZ in a worker; return them with the error, if any.
+    A PDZ missing any of the fields of the task, e.g. of a truncated record, fails.
+    """
+    file_path, fields = task
+    try:
+        with PDZTool(file_path, records=[RESULTS_RECORD]) as pdz_tool:
+            stacked = pdz_tool.stack_results(RESULTS_RECORD)
+        missing = [field for field in ('name', 'atomic_number', *fields) if field not in stacked]
+        if missing:
+            raise ValueError(f"Fields missing from the {RESULTS_RECORD} of {file_path}: {', '.join(missing)}")
+        return file_path, stacked, None
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}"
+
+
+def results_matrix(file_paths: list[str], fields: tuple = ("result", "error"), jobs: int = 1,
+                   verbose: bool = False) -> dict:
+    """
+    Pivot the element results (Calculated Results Details) of many PDZs into samples × elements matrices,
+    with one column per element found in any PDZ, ordered by atomic number. Elements not reported by a PDZ are NaN.
+    The columns of each PDZ (see `stack_results`) are concatenated and scattered into the matrices at once.
+    Requires NumPy.
+    :param file_paths: list[str] Paths of the PDZs, one row each in this order (failed files, e.g. without
+        all of `fields`, are left out)
+    :param fields: tuple Numeric fields with a matrix each, e.g. "result", "error", "min", "max", "tramp", "nominal"
+    :param jobs: int Number of worker processes parsing the PDZs
+    :return: dict
+        - "file": list[str] (samples) Paths of the PDZs of the rows
+        - "element": list[str] (elements) Element names of the columns
+        - "atomic_number": 1-D array (elements)
+        - a 2-D float array (samples × elements) per field of `fields`
+        - "failures": dict {file_path: error message} of the files that failed
+    """
+    numpy = require_numpy()
+    tasks = [(file_path, tuple(fields)) for file_path in file_paths]
+    if jobs == 1 or len(tasks) <= 1:
+        results = map(_stack_results, tasks)
+        executor = None
+    else:
+        chunksize = max(1, min(64, len(tasks) // (jobs * 4)))
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = executor.map(_stack_results, tasks, chunksize=chunksize)
+
+    files, columns, failures = [], [], {}
+    try:
+        for file_path, stacked, error in results:
+            if error is not None:
+                print_verbose(verbose, "Skipping %s: %s", file_path, error)
+                failures[file_path] = error
+                continue
+            files.append(file_path)
+            columns.append(stacked)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    atomic_numbers = numpy.concatenate([stacked['atomic_number'] for stacked in columns]) if columns else numpy.empty(0, int)
+    element_atomic_numbers, first_index = numpy.unique(atomic_numbers, return_index=True)
+    names = list(chain.from_iterable(stacked['name'] for stacked in columns))
+
+    rows = numpy.repeat(numpy.arange(len(columns)), [len(stacked['atomic_number']) for stacked in columns])
+    element_columns = numpy.searchsorted(element_atomic_numbers, atomic_numbers)
+    matrix = {
+        "file": files,
+        "element": [names[i] for i in first_index],
+        "atomic_number": element_atomic_numbers,
+    }
+    for field in fields:
+        values = numpy.full((len(columns), len(element_atomic_numbers)), numpy.nan)
+        if columns:
+            values[rows, element_columns] = numpy.concatenate([stacked[field] for stacked in columns])
+        matrix[field] = values
+    matrix["failures"] = failures
+    return matrix
@@ -16,4 +16,34 @@ Supoorted PDZ versions
 SUPPORTED_PDZ_VERSIONS = {
     25: "pdz25",
     257: "pdz24"
-}
\ No newline at end of file
+}
+
+"""
+Input modes for reading PDZ files
+- read: load the whole file into a bytes object
+- mmap: memory-map the file read-only (close the tool to release the mapping)
+"""
+IO_MODES = ("read", "mmap")
+
+"""
+Columnar output formats for a corpus of PDZ files
+- parquet: Apache Parquet
+- arrow: Arrow IPC file (Feather v2)
+"""
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+"""
+Outputs of binary fields (e.g. JPEG images) in JSON
+- base64: base64-encoded string in place of the bytes
+- reference: offset and length of the bytes in the PDZ (parse with `image_refs=True`), without the bytes
+- sidecar: name of a file next to the JSON holding the bytes
+"""
+JSON_BINARY_MODES = ("base64", "reference", "sidecar")
+
+"""
+JSON encoders
+- auto: orjson if installed (and the indent is 2 or compact), else json
+- json: the standard library
+- orjson: orjson (optional dependency, indents by 2 only)
+"""
+JSON_BACKENDS = ("auto", "json", "orjson")
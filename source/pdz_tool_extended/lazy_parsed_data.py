@@ -0,0 +1,44 @@
+from collections.abc import Mapping
+
+
+class LazyParsedData(Mapping):
+    """
+    Read-only mapping of record name to parsed record, like the `parsed_data` dict set by `parse()`,
+    but each record is decoded with `parse_record_type` only when first accessed and then memoized.
+
+    Like `parse()`, if several records have the same name, the last one is kept.
+    With `io="mmap"` or a buffer handed over with `pdz_bytes`, access records before closing the tool:
+    records not decoded by then raise ValueError.
+    """
+    def __init__(self, tool, records: list[dict]):
+        self._tool = tool
+        self._records = {}
+        for record in records:
+            record_type_name = tool.RECORDS.get(record['record_type'], {}).get('name', 'Unknown')
+            self._records[record_type_name] = record
+        self._parsed = {}
+
+    def __getitem__(self, record_name):
+        if record_name not in self._parsed:
+            record = self._records[record_name]
+            self._tool._load_blocks([record])
+            self._tool._print_verbose("Parsing record type: %s - %s", record['record_type'], record_name)
+            self._parsed[record_name] = self._tool._parse_record(record)
+        return self._parsed[record_name]
+
+    def __contains__(self, record_name):
+        # Check the record names without decoding (Mapping.__contains__ would call __getitem__)
+        return record_name in self._records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self._records)}, parsed={list(self._parsed)})"
+
+    def to_dict(self):
+        """Decode all records and return them as a dict."""
+        return {record_name: self[record_name] for record_name in self}
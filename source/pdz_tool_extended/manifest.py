@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import tempfile
+
+
+def hash_file(file_path: str) -> str:
+    """Get the BLAKE2b content hash of a file as hex."""
+    with open(file_path, 'rb') as opened_file:
+        return hashlib.file_digest(opened_file, 'blake2b').hexdigest()
+
+
+def fingerprint_file(file_path: str) -> dict:
+    """
+    Get the fingerprint of a file: its size, modification time and content hash.
+    :return: dict {"size": int, "mtime_ns": int, "hash": str}
+    """
+    stat_result = os.stat(file_path)
+    return {"size": stat_result.st_size, "mtime_ns": stat_result.st_mtime_ns, "hash": hash_file(file_path)}
+
+
+class BatchManifest:
+    """
+    Manifest of a batch run, kept alongside the outputs, recording for each input PDZ its fingerprint,
+    the options it was processed with and the outputs produced with their sizes and hashes.
+
+    Outputs are current if they have their recorded size; with `verify_outputs`, their content hash is
+    also compared, so an output corrupted or edited in place is produced again (slower, as every output is read).
+
+    Each processed file is appended as one JSON line and flushed right away, so a killed run keeps
+    everything it finished and the next run picks up where it left off. Later lines of the same file
+    replace earlier ones; `close()` rewrites the manifest with one line per file.
+
+    Example:
+        with BatchManifest(output_dir) as manifest:
+            for file_path in file_paths:
+                if not manifest.is_current(file_path, options):
+                    outputs = process(file_path)
+                    manifest.record(file_path, fingerprint_file(file_path), outputs, options)
+    """
+    FILE_NAME = 'pdz_manifest.jsonl'
+
+    def __init__(self, output_dir: str = '.', file_name: str = None, verify_outputs: bool = False):
+        """
+        :param verify_outputs: bool If True, `is_current` also compares the content hashes of the outputs
+        """
+        self.verify_outputs = verify_outputs
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, file_name or self.FILE_NAME)
+        self.entries = {}  # {input file path: entry}
+        self._n_lines = 0
+        ends_with_newline = self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if not ends_with_newline:
+            self._file.write('\n')  # End the line cut short by a killed run before appending
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _load(self) -> bool:
+        """Load the entries and return whether the manifest ends with a complete line."""
+        if not os.path.exists(self.path):
+            return True
+        line = '\n'
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self._n_lines += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Line cut short by a killed run; dropped when the manifest is rewritten
+                self.entries[entry['file']] = entry
+        return line.endswith('\n')
+
+    def is_current(self, file_path: str, options: dict = None) -> bool:
+        """
+        Check whether a file was processed with these options and is unchanged since, with all its outputs in place.
+        The content is hashed only if the size or modification time changed, e.g. for a copied or touched file.
+        Outputs are checked by size, and by content hash too with `verify_outputs`.
+        """
+        entry = self.entries.get(os.path.abspath(file_path))
+        if entry is None or entry.get('options') != (options or {}):
+            return False
+
+        try:
+            stat_result = os.stat(file_path)
+            if stat_result.st_size != entry['size']:
+                return False
+            touched = stat_result.st_mtime_ns != entry['mtime_ns']
+            if touched and hash_file(file_path) != entry['hash']:
+                return False
+            for output_path, output in entry['outputs'].items():
+                if os.stat(output_path).st_size != output['size']:
+                    return False
+                if self.verify_outputs and hash_file(output_path) != output['hash']:
+                    return False
+        except OSError:
+            return False  # The input or an output is missing
+
+        if touched:
+            # Same content: keep the new modification time so the file is not hashed again next run
+            self.record(file_path, {**entry, "mtime_ns": stat_result.st_mtime_ns}, entry['outputs'], entry['options'])
+        return True
+
+    def record(self, file_path: str, fingerprint: dict, outputs: dict, options: dict = None):
+        """
+        Record a processed file.
+        :param file_path: str Path to the input file
+        :param fingerprint: dict Fingerprint of the input from `fingerprint_file`, taken before processing
+        :param outputs: dict {output path: {"size": int, "hash": str}}, e.g. from `describe_outputs`
+        :param options: dict Options that change the outputs, e.g. the output format
+        """
+        fingerprint = {key: fingerprint[key] for key in ("size", "mtime_ns", "hash")}
+        entry = {"file": os.path.abspath(file_path), **fingerprint, "options": options or {}, "outputs": outputs}
+        self.entries[entry['file']] = entry
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        self._n_lines += 1
+
+    def close(self):
+        """Close the manifest, rewriting it with one line per file if files were processed more than once."""
+        if self._file.closed:
+            return
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if self._n_lines > len(self.entries):
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in self.entries.values())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self._n_lines = len(self.entries)
+
+
+def describe_outputs(output_paths: list[str]) -> dict:
+    """Get the size and content hash of output files as `{output path: {"size": int, "hash": str}}`."""
+    return {os.path.abspath(output_path): {"size": os.path.getsize(output_path), "hash": hash_file(output_path)}
+            for output_path in output_paths}
@@ -0,0 +1,243 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+from .base_tool import PDZOutputMixin
+from .config import VERSION
+from .pdz_tool import PDZTool
+from .utils import copy_file_range_to, print_verbose, read_pdz_file
+
+CACHE_NAME = 'pdz-extractor'
+
+
+def default_cache_dir() -> str:
+    """
+    Get the cache directory of the platform: `%LOCALAPPDATA%\\pdz-extractor\\Cache` on Windows,
+    `~/Library/Caches/pdz-extractor` on macOS and `$XDG_CACHE_HOME/pdz-extractor` (default `~/.cache`) elsewhere.
+    """
+    if sys.platform == 'win32':
+        base_dir = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+        return os.path.join(base_dir, CACHE_NAME, 'Cache')
+    if sys.platform == 'darwin':
+        return os.path.join(os.path.expanduser('~'), 'Library', 'Caches', CACHE_NAME)
+    base_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base_dir, CACHE_NAME)
+
+
+class CachedPDZ(PDZOutputMixin):
+    """
+    Parsed PDZ loaded from a `ParseCache`, with the attributes and outputs of a parsed tool
+    (`parsed_data`, `record_names`, `pdz_version`, `save_json`, `save_csv`, `save_images`, ...).
+    """
+    def __init__(self, file_path: str, pdz_version: str, record_names: list, parsed_data: dict, verbose: bool = False):
+        self.file_path = file_path
+        self.pdz_file_name: str = os.path.splitext(os.path.basename(file_path))[0]
+        self.pdz_version = pdz_version
+        self.record_names = record_names
+        self.parsed_data = parsed_data
+        self.verbose = verbose
+
+    def parse(self, record_names: list[str] = None, lazy: bool = False):
+        """Return the cached parsed data, like `parse()` of the tools."""
+        return self.parsed_data
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _image_offsets(self) -> list:
+        """Get the offsets of the images from the PDZ, for entries parsed without `image_refs`."""
+        with PDZTool(self.file_path, records=['Image Details']) as pdz_tool:
+            return pdz_tool._image_offsets()
+
+    def _read_image(self, image: dict):
+        """Read the bytes of an image parsed as a reference."""
+        with open(self.file_path, 'rb') as opened_file:
+            opened_file.seek(image['image_offset'])
+            return opened_file.read(image['image_length'])
+
+    def _save_image_ref(self, image: dict, output_file: str):
+        """Copy an image parsed as a reference from the PDZ to `output_file`."""
+        copy_file_range_to(self.file_path, image['image_offset'], image['image_length'], output_file)
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed PDZ files, so unchanged files are not parsed again.
+
+    Entries are pickled and keyed by the content hash of the file, which is found from the path, size and
+    modification time without reading the file. If those changed (e.g. the file was copied, moved or touched),
+    the file is read once, and its content hashed, so identical content is still parsed only once; a file not in the
+    cache is parsed from that same buffer. The least recently used entries are removed when the cache exceeds `max_size`.
+    Entries that cannot be written (e.g. on a read-only disk) are skipped.
+
+    Entries are written to temporary files and then renamed into place, so several processes can share
+    a cache directory: readers never see a partial entry, and entries removed by another process are misses.
+    Only use cache directories you trust, as entries are unpickled.
+
+    Example:
+        cache = ParseCache(cache_dir)
+        pdz = cache.parse(file_path, image_refs=True)
+        pdz.save_csv(output_dir=output_dir)
+    """
+    FORMAT = 1  # Increase if the parsed data changes, so entries of older versions are not used
+    ENTRY_SUFFIX = '.pkl'
+
+    def __init__(self, cache_dir: str, max_size: int = 512 * 1024**2, verbose: bool = False):
+        """
+        :param cache_dir: str Directory of the cache, created if needed. See `default_cache_dir`.
+        :raises OSError: If the directory cannot be created
+        :param max_size: int Size in bytes above which the least recently used entries are removed
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.verbose = verbose
+        self._size = None  # Estimate of the size of the cache, scanned on the first write
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _print_verbose(self, message, *args):
+        """Helper method to print messages when verbose is enabled, formatted only then. See `utils.print_verbose`."""
+        print_verbose(self.verbose, message, *args)
+
+    def parse(self, file_path: str, **kwargs):
+        """
+        Get the parsed PDZ from the cache, or parse it with `PDZTool` and add it to the cache.
+        :param file_path: str Path to the PDZ file
+        :param kwargs: Options of `PDZTool` that change the parsed data, e.g. `image_refs` or `records`.
+            They are part of the key of the entry, so an entry parsed with only some `records` is never
+            returned for other records or for all of them (the default).
+        :return: CachedPDZ | None None if the file could not be parsed
+        """
+        file_path = os.path.abspath(file_path)
+        stat_result = os.stat(file_path)
+        options = self._options_key(kwargs)
+
+        # The entry of the path, size and modification time only holds the key of the content entry
+        stat_entry = self._entry_path('s', self._hash_key(file_path, stat_result.st_size, stat_result.st_mtime_ns, options))
+        content_key = self._load(stat_entry)
+        entry = self._load(self._entry_path('c', content_key)) if content_key else None
+        if entry is None:
+            # The file is new or changed on disk: look it up by content, reading it once to hash and parse it
+            pdz_bytes = read_pdz_file(file_path)
+            content_key = self._hash_key(hashlib.blake2b(pdz_bytes).hexdigest(), options)
+            content_entry = self._entry_path('c', content_key)
+            entry = self._load(content_entry)
+            if entry is None:
+                entry = self._parse(file_path, pdz_bytes, kwargs)
+                if entry is None:
+                    return None
+                self._store(content_entry, entry)
+            self._store(stat_entry, content_key)
+
+        pdz_version, record_names, parsed_data = entry
+        return CachedPDZ(file_path, pdz_version, record_names, parsed_data, verbose=kwargs.get('verbose', False))
+
+    def clear(self):
+        """Remove all entries."""
+        for path, _, _ in self._scan():
+            self._remove(path)
+        self._size = 0
+
+    def _parse(self, file_path: str, pdz_bytes: bytes, kwargs: dict):
+        self._print_verbose("Parsing (not cached): %s", file_path)
+        kwargs = {key: value for key, value in kwargs.items() if key != 'io'}  # Already read
+        with PDZTool.from_buffer(pdz_bytes, name=file_path, **kwargs) as pdz_tool:
+            parsed_data = pdz_tool.parse()
+            if parsed_data is None:
+                return None
+            return pdz_tool.pdz_version, pdz_tool.record_names, parsed_data
+
+    @staticmethod
+    def _options_key(kwargs: dict) -> str:
+        # Output-only options (e.g. verbose) do not change the parsed data
+        options = {key: value for key, value in kwargs.items() if key not in ('verbose', 'debug', 'io', 'stats')}
+        return repr(sorted(options.items()))
+
+    def _hash_key(self, *parts) -> str:
+        key = '\0'.join(str(part) for part in (VERSION, self.FORMAT, *parts))
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=20).hexdigest()
+
+    def _entry_path(self, kind: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{kind}-{key}{self.ENTRY_SUFFIX}")
+
+    def _load(self, path: str):
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Corrupt or from an incompatible version: treat as a miss
+            self._print_verbose("Removing unreadable cache entry %s: %s", path, e)
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return entry
+
+    def _store(self, path: str, entry):
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        except OSError as e:
+            self._print_verbose("Not caching %s: %s", path, e)
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(temp_path, path)
+        except OSError as e:
+            self._remove(temp_path)
+            self._print_verbose("Not caching %s: %s", path, e)
+            return
+        except BaseException:
+            self._remove(temp_path)
+            raise
+
+        if self._size is None:
+            self._size = sum(entry_size for _, entry_size, _ in self._scan())
+        else:
+            self._size += size
+        if self._size > self.max_size:
+            self._evict()
+
+    def _scan(self):
+        """Yield `(path, size, last_used)` of each entry."""
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(self.ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat_result = entry.stat()
+                except FileNotFoundError:
+                    continue  # Removed by another process
+                yield entry.path, stat_result.st_size, stat_result.st_mtime_ns
+
+    def _evict(self):
+        """Remove the least recently used entries until the cache is below 90% of `max_size`."""
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_size * 0.9
+        for path, entry_size, _ in entries:
+            if size <= target:
+                break
+            self._remove(path)
+            size -= entry_size
+        self._size = size
+        self._print_verbose("Cache size after eviction: %s bytes", size)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,367 @@
+"""
+Compiled parse plans for the RECORDS schemas of the PDZ tools.
+
+Each record schema is compiled once per process into a list of steps:
+- consecutive fixed-width fields are merged into one precompiled `struct.Struct`
+- length-prefixed and fixed-length `wchar_t` strings, SYSTEMTIME, spectrum data,
+  raw bytes and repeatable blocks each get a specialized step
+Steps write their values into the result dict and return the next offset. To stop
+parsing the current block they return `~offset` (a negative number) instead, where
+`offset` is how far the step got, as the field-by-field parser did.
+"""
+import struct
+from functools import lru_cache
+
+from .utils import flatten_system_date_time, require_numpy
+
+
+class FixedStep:
+    """Consecutive fixed-width fields unpacked with a single merged struct."""
+    __slots__ = ('name', 'fields', 'names', 'struct', 'size')
+
+    def __init__(self, fields: list):
+        # fields: [(field_name, struct.Struct, is_skip), ...]
+        self.name = fields[0][0]
+        self.fields = fields
+        self.names = tuple(name for name, _, is_skip in fields if not is_skip)
+        fmt = '<' + ''.join(
+            f'{field_struct.size}x' if is_skip else field_struct.format[1:]
+            for _, field_struct, is_skip in fields)
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+
+    def parse(self, block, offset, total, result, tool):
+        end = offset + self.size
+        if end <= total:
+            result.update(zip(self.names, self.struct.unpack_from(block, offset)))
+            return end
+
+        # Not all fields fit: fall back to one field at a time to keep the partial values
+        for field_name, field_struct, is_skip in self.fields:
+            if offset >= total:
+                tool._print_verbose("Warning: Reached end of data before parsing %s", field_name)
+                return ~offset
+            if is_skip:
+                offset += field_struct.size
+                continue
+            if offset + field_struct.size > total:
+                tool._print_verbose("Error: Insufficient bytes for %s", field_name)
+                return ~offset
+            result[field_name] = field_struct.unpack_from(block, offset)[0]
+            offset += field_struct.size
+        return offset
+
+
+class StringStep:
+    """UTF-16 `wchar_t` string, fixed length or prefixed by a `<name>_length` field."""
+    __slots__ = ('name', 'length_name', 'length')
+
+    def __init__(self, name: str, length: int = None):
+        self.name = name
+        self.length_name = name + '_length'
+        self.length = length
+
+    def parse(self, block, offset, total, result, tool):
+        length = self.length if self.length is not None else result.get(self.length_name, 0)
+        n_bytes = length * 2
+        if offset + n_bytes > total:
+            tool._print_verbose("Error: Insufficient bytes for %s", self.name)
+            return ~offset
+        result[self.name] = str(block[offset:offset + n_bytes], 'utf-16').strip('\x00')
+        return offset + n_bytes
+
+
+class SystemTimeStep:
+    """SYSTEMTIME (8 unsigned shorts) flattened to a date/time string."""
+    __slots__ = ('name',)
+    STRUCT = struct.Struct('<8H')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def parse(self, block, offset, total, result, tool):
+        n_bytes = self.STRUCT.size
+        if offset + n_bytes > total:
+            tool._print_verbose("Error: Insufficient bytes for %s", self.name)
+            return ~offset
+        year, month, day_of_week, day, hour, minute, second, milliseconds = self.STRUCT.unpack_from(block, offset)
+        result[self.name] = flatten_system_date_time({
+            "year": year,
+            "month": month,
+            "day": day,
+            "hour": hour,
+            "minute": minute,
+            "second": second,
+            "milliseconds": milliseconds
+        })
+        return offset + n_bytes
+
+
+class SpectrumStep:
+    """
+    Array of 4-byte channel counts, with the count taken from an earlier field; empty for records without that field
+    (e.g. Raw XRF Spectrum Packet, whose spectra are decoded by `decode_blocks` instead).
+    Decoded to a list, or to a NumPy array when the tool has `spectrum_array` enabled.
+    """
+    __slots__ = ('name', 'channels_name', 'code', 'dtype')
+    DTYPES = {'L': '<u4', 'I': '<u4', 'l': '<i4', 'i': '<i4'}
+
+    def __init__(self, name: str, channels_name: str, code: str):
+        self.name = name
+        self.channels_name = channels_name
+        self.code = code
+        self.dtype = self.DTYPES[code]
+
+    def parse(self, block, offset, total, result, tool):
+        num_channels = result.get(self.channels_name, 0)
+        if num_channels < 0:
+            tool._print_verbose("Error: Invalid channel count %s for %s", num_channels, self.name)
+            return ~offset
+        spectrum_struct = _array_struct(self.code, num_channels)
+        if offset + spectrum_struct.size > total:
+            tool._print_verbose("Error: Insufficient bytes for %s", self.name)
+            return ~offset
+        if tool.spectrum_array:
+            result[self.name] = self._to_array(block, offset, num_channels)
+        else:
+            result[self.name] = list(spectrum_struct.unpack_from(block, offset))
+        return offset + spectrum_struct.size
+
+    def _to_array(self, block, offset, num_channels):
+        spectrum = require_numpy().frombuffer(block, dtype=self.dtype, count=num_channels, offset=offset)
+        # Share memory only with an immutable bytes buffer; copy out of writable buffers and memory maps
+        if not isinstance(getattr(block, 'obj', block), bytes):
+            spectrum = spectrum.copy()
+        return spectrum
+
+
+class BytesStep:
+    """
+    Raw bytes prefixed by a `<name>_length` field, e.g. JPEG images.
+    With the tool's `image_refs` enabled, only `<name>_offset` (the offset in the PDZ) is kept instead of the bytes.
+    """
+    __slots__ = ('name', 'length_name')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.length_name = name + '_length'
+
+    def parse(self, block, offset, total, result, tool):
+        n_bytes = result.get(self.length_name, 0)
+        if offset + n_bytes > total:
+            tool._print_verbose("Error: Insufficient bytes for %s", self.name)
+            return ~offset
+        if tool.image_refs:
+            result[self.name + '_offset'] = tool._block_offset + offset
+        else:
+            # Copy out of the file buffer so the bytes outlive the view
+            result[self.name] = bytes(block[offset:offset + n_bytes])
+        return offset + n_bytes
+
+
+class RepeatStep:
+    """Repeatable block of sub-fields, repeated a fixed number of times or by a count field."""
+    __slots__ = ('name', 'repeat', 'steps')
+
+    def __init__(self, name: str, repeat, steps: list):
+        self.name = name
+        self.repeat = repeat
+        self.steps = steps
+
+    def parse(self, block, offset, total, result, tool):
+        repeat_count = self.repeat
+        if isinstance(repeat_count, str):
+            repeat_count = int(result.get(repeat_count, 0))
+
+        if repeat_count == 0:
+            tool._print_verbose("Skipping repeatable block %s with %s repeats", self.name, repeat_count)
+            return offset
+
+        repeated_data = []
+        for _ in range(repeat_count):
+            sub_result = {}
+            for step in self.steps:
+                offset = step.parse(block, offset, total, sub_result, tool)
+                if offset < 0:
+                    offset = ~offset
+                    break
+            repeated_data.append(sub_result)
+
+        result[self.name] = repeated_data
+        return offset
+
+
+class InvalidStep:
+    """Field type that cannot be decoded; stops parsing of the block."""
+    __slots__ = ('name', 'error')
+
+    def __init__(self, name: str, error: str):
+        self.name = name
+        self.error = error
+
+    def parse(self, block, offset, total, result, tool):
+        tool._print_verbose("Struct error in field %s: %s", self.name, self.error)
+        return ~offset
+
+
+@lru_cache(maxsize=64)
+def _array_struct(code: str, count: int):
+    return struct.Struct(f'<{count}{code}')
+
+
+def compile_fields(fields: list, tool_class) -> list:
+    """
+    Compile a list of `(field_name, field_type)` schema entries into parse steps.
+    :param fields: list Fields of a RECORDS entry (or of a repeatable block)
+    :param tool_class: type Tool class providing SPECTRUM_CHANNELS_FIELD, SPECTRUM_FORMAT and SKIP_FIELD_NAME
+    :return: list of steps
+    """
+    steps = []
+    fixed = []
+
+    def flush_fixed():
+        if fixed:
+            steps.append(FixedStep(list(fixed)))
+            fixed.clear()
+
+    for field_name, field_type in fields:
+        if isinstance(field_type, dict):
+            flush_fixed()
+            steps.append(RepeatStep(field_name, field_type['repeat'],
+                                    compile_fields(field_type['fields'], tool_class)))
+            continue
+
+        if 'wchar_t' in field_type:
+            flush_fixed()
+            length = None
+            if field_type != 'wchar_t':
+                length = int(field_type.split('[')[1].split(']')[0])
+            steps.append(StringStep(field_name, length))
+        elif field_type == 'system_time':
+            flush_fixed()
+            steps.append(SystemTimeStep(field_name))
+        elif field_type == 'spectrum_data':
+            flush_fixed()
+            steps.append(SpectrumStep(field_name, tool_class.SPECTRUM_CHANNELS_FIELD, tool_class.SPECTRUM_FORMAT))
+        elif field_type == 'bytes':
+            flush_fixed()
+            steps.append(BytesStep(field_name))
+        else:
+            try:
+                field_struct = struct.Struct('<' + field_type)
+            except struct.error as e:
+                flush_fixed()
+                steps.append(InvalidStep(field_name, str(e)))
+                continue
+            fixed.append((field_name, field_struct, field_name == tool_class.SKIP_FIELD_NAME))
+
+    flush_fixed()
+    return steps
+
+
+# NumPy dtypes of the struct codes of fixed-width fields, little-endian like the PDZ
+STRUCT_DTYPES = {
+    'B': 'u1', 'b': 'i1', '?': '?', 'H': '<u2', 'h': '<i2', 'I': '<u4', 'i': '<i4', 'L': '<u4', 'l': '<i4',
+    'Q': '<u8', 'q': '<i8', 'f': '<f4', 'd': '<f8',
+}
+
+
+@lru_cache(maxsize=None)
+def compile_record_dtype(tool_class, record_type: int):
+    """
+    Get the layout of a record type whose fields are all fixed-width, optionally followed by spectrum data,
+    as fields of a NumPy structured dtype (packed, as the PDZ has no padding).
+    :return: tuple (names, formats, offsets, header_size, spectrum_name) where `spectrum_name` is None without
+        spectrum data, or None if the record type has a field that is not fixed-width (e.g. a string)
+    """
+    fields = tool_class.RECORDS.get(record_type, {}).get('fields', [])
+    names, formats, offsets = [], [], []
+    offset = 0
+    for i, (field_name, field_type) in enumerate(fields):
+        if field_type == 'spectrum_data' and i == len(fields) - 1:
+            return names, formats, offsets, offset, field_name
+        if not isinstance(field_type, str):
+            return None  # Repeatable block
+        if field_type in STRUCT_DTYPES:
+            field_format = STRUCT_DTYPES[field_type]
+        elif field_type.endswith('s') and field_type[:-1].isdigit():
+            field_format = f'V{field_type[:-1]}'  # Raw bytes, e.g. 'skip' and 'xilinx_vars'
+        else:
+            return None
+        if field_name != tool_class.SKIP_FIELD_NAME:
+            names.append(field_name)
+            formats.append(field_format)
+            offsets.append(offset)
+        offset += struct.calcsize('<' + field_type)
+    return (names, formats, offsets, offset, None) if fields else None
+
+
+def decode_blocks(blocks: list, tool_class, record_type: int) -> dict:
+    """
+    Decode many blocks of a fixed-width record type at once with a NumPy structured dtype over their
+    concatenated bytes, instead of one struct unpack per field and record. The blocks must have the same length;
+    the channel count of the spectrum data is the rest of the block. Requires NumPy.
+    :param blocks: list[bytes | memoryview] Blocks of the records, without record headers
+    :param tool_class: type Tool class of the RECORDS schema
+    :param record_type: int Record type Id
+    :return: dict {field name: 1-D array (records)}, with the spectrum data as a 2-D array (records × channels)
+    """
+    numpy = require_numpy()
+    layout = compile_record_dtype(tool_class, record_type)
+    if layout is None:
+        raise ValueError(f"Record type {record_type} of {tool_class.__name__} has fields that are not fixed-width")
+    names, formats, offsets, header_size, spectrum_name = layout
+
+    block_lengths = {len(block) for block in blocks}
+    if len(block_lengths) > 1:
+        raise ValueError(f"Blocks of {sorted(block_lengths)} bytes cannot be decoded together")
+    block_length = block_lengths.pop() if block_lengths else header_size
+    if block_length < header_size:
+        raise ValueError(f"Blocks of {block_length} bytes are shorter than the {header_size} bytes of their fields")
+
+    names, formats, offsets = list(names), list(formats), list(offsets)
+    if spectrum_name is not None:
+        spectrum_dtype = numpy.dtype(SpectrumStep.DTYPES[tool_class.SPECTRUM_FORMAT])
+        names.append(spectrum_name)
+        formats.append((spectrum_dtype, (block_length - header_size) // spectrum_dtype.itemsize))
+        offsets.append(header_size)
+    dtype = numpy.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': block_length})
+
+    records = numpy.frombuffer(b''.join(blocks), dtype=dtype)
+    # Contiguous columns rather than strided views into the records
+    return {name: numpy.ascontiguousarray(records[name]) for name in names}
+
+
+@lru_cache(maxsize=None)
+def compile_record(tool_class, record_type: int):
+    """
+    Get the cached parse plan of a record type of a tool class.
+    :return: list of steps, or None if the record type has no fields to parse
+    """
+    fields = tool_class.RECORDS.get(record_type, {}).get('fields', [])
+    if not fields:
+        return None
+    return compile_fields(fields, tool_class)
+
+
+def run_plan(plan: list, block, tool) -> dict:
+    """
+    Parse a block of bytes with a compiled plan.
+    :param plan: list Steps from `compile_record`
+    :param block: bytes | memoryview Block data
+    :param tool: BasePDZTool Tool used for verbose messages
+    :return: dict Parsed fields
+    """
+    total = len(block)
+    offset = 0
+    result = {}
+
+    for step in plan:
+        if offset >= total:
+            tool._print_verbose("Warning: Reached end of data before parsing %s", step.name)
+            break
+        offset = step.parse(block, offset, total, result, tool)
+        if offset < 0:
+            break
+
+    return result
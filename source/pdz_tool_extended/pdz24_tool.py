@@ -1,9 +1,14 @@
-import struct
 import traceback
 
 from .base_tool import BasePDZTool
+from .parse_plan import compile_record, run_plan
 
 class PDZ24Tool(BasePDZTool):
+    # Schema conventions used when compiling parse plans (see parse_plan.py)
+    SPECTRUM_CHANNELS_FIELD = 'num_channels'  # Field holding the number of channels of `spectrum_data`
+    SPECTRUM_FORMAT = 'i'  # Signed int counts
+    SKIP_FIELD_NAME = 'skip'  # 'skip' fields are stepped over and not kept
+
     RECORDS = {
         0: {
             "name": 'File Header',
@@ -24,13 +29,13 @@ class PDZ24Tool(BasePDZTool):
                 ('skip', '184s'),  # Skip 184 bytes
                 ('live_time', 'f'),  # Float (4 bytes)
                 # The 'remaining_data' here represents the dynamic spectrum data
-                ('spectrum_data', 'Z'),  # Remaining data
+                ('spectrum_data', 'spectrum_data'),  # Remaining data
             ]
         },
     }
 
-    def __init__(self, file_path: str, verbose: bool = False, debug: bool = False):
-        super().__init__(file_path, verbose, debug)
+    def __init__(self, file_path: str, verbose: bool = False, debug: bool = False, **kwargs):
+        super().__init__(file_path, verbose, debug, **kwargs)
 
     def get_record_types(self):
         """
@@ -38,7 +43,7 @@ class PDZ24Tool(BasePDZTool):
         - The first 6 bytes as record_type 0.
         - The remaining bytes as record_type 1.
         """
-        total_length = len(self.pdz_bytes)
+        total_length = self._total_length
         record_types = []
 
         # Ensure we have at least 6 bytes to extract the first record
@@ -46,24 +51,26 @@ class PDZ24Tool(BasePDZTool):
             self._print_verbose("Insufficient bytes for reading the first 6-byte header.")
             return record_types
 
-        # Extract the first 6 bytes as the first record
-        first_record_bytes = self.pdz_bytes[:6]
+        # Extract the first 6 bytes as the first record (views over the file buffer, no copy)
+        first_record_bytes = self._read_at(0, 6) if self._is_record_wanted('File Header') else None
         record_types.append({
             'record_type': 0,
             'record_name': 'File Header',
             'data_length': 6,
+            'offset': 0,
             'bytes': first_record_bytes
         })
 
         # Remaining bytes are treated as the second record
-        remaining_bytes = self.pdz_bytes[6:]
         remaining_length = total_length - 6
+        remaining_bytes = self._read_at(6, remaining_length) if self._is_record_wanted('XRF Spectrum') else None
 
         if remaining_length > 0:
             record_types.append({
                 'record_type': 1,
                 'record_name': 'XRF Spectrum',
                 'data_length': remaining_length,
+                'offset': 6,
                 'bytes': remaining_bytes
             })
         else:
@@ -71,84 +78,40 @@ class PDZ24Tool(BasePDZTool):
 
         return record_types
 
-    def parse_record_type(self, record_type: int, block_bytes: bytes):
+    def parse_record_type(self, record_type: int, block_bytes: bytes, block_offset: int = 0):
         """
-        Parse a specific record type.
+        Parse a specific record type with its compiled parse plan.
         :param record_type: int Record type Id that is being parsed
-        :param block_bytes: bytes Block data
+        :param block_bytes: bytes | memoryview Block data
+        :param block_offset: int Offset of the block in the PDZ, used for image references
         :return:
         """
-        fields = self.RECORDS.get(record_type, {}).get('fields', [])
-        if not fields:
+        plan = compile_record(type(self), record_type)
+        self._block_offset = block_offset
+        if plan is None:
             return "No fields to parse"
 
-        total_byte_length = len(block_bytes)
-        offset = 0
-        result = {}
-
-        for field_name, field_type in fields:
-            if offset >= total_byte_length:
-                self._print_verbose(f"Warning: Reached end of data before parsing {field_name}")
-                break
-
-            try:
-                # Skip bytes based on the 's' indicator in the format
-                if field_name == 'skip':
-                    size = struct.calcsize(field_type)
-                    offset += size
-                    continue
-
-                # Handle dynamic spectrum data
-                if field_name == 'spectrum_data':
-                    num_channels = result.get('num_channels', 0)
-                    size = num_channels * 4  # Assuming each intensity value is a 4-byte float
-
-                    if offset + size > total_byte_length:
-                        self._print_verbose(f"Error: Insufficient bytes for {field_name}")
-                        break
-
-                    # Read the spectrum data as a list of floats
-                    fmt = f'<{num_channels}i'
-                    spectrum_data = struct.unpack_from(fmt, block_bytes, offset)
-                    result['spectrum_data'] = list(spectrum_data)
-                    offset += size
-                    continue
-
-                # Regular struct unpacking
-                fmt = '<' + field_type
-                size = struct.calcsize(fmt)
-
-                if offset + size > total_byte_length:
-                    self._print_verbose(f"Error: Insufficient bytes for {field_name}")
-                    break
-
-                value = struct.unpack_from(fmt, block_bytes, offset)[0]
-                result[field_name] = value
-                offset += size
-
-            except Exception as e:
-                self._print_verbose(f"Error parsing field {field_name}: {e}")
-                if self.debug:
-                    traceback.print_exc()
-                break
-
-        return result
-
-    def parse(self):
+        return run_plan(plan, block_bytes, self)
+
+    def parse(self, record_names: list[str] = None, lazy: bool = False):
         """
         Parse the PDZ file and set the parsed data.
+        :param record_names: list[str] Names of the records to parse. If None (default), the `records` given to the tool, or else all.
+        :param lazy: bool If True, return a mapping which decodes each record on first access instead of a dict.
         :return:
         """
+        if lazy:
+            return self._parse_lazy(record_names)
+
         try:
             parsed_data = {}
-            for record in self.record_types:
+            for record in self._select_records(record_names):
                 record_type = record['record_type']
-                block_bytes = record['bytes']
                 record_type_name = self.RECORDS.get(record_type, {}).get('name', 'Unknown')
 
-                self._print_verbose(f"Parsing record type: {record_type} - {record_type_name}")
+                self._print_verbose("Parsing record type: %s - %s", record_type, record_type_name)
 
-                parsed_record_type = self.parse_record_type(record_type, block_bytes)
+                parsed_record_type = self._parse_record(record)
 
                 parsed_data[record_type_name] = parsed_record_type
 
@@ -156,7 +119,7 @@ class PDZ24Tool(BasePDZTool):
 
             return self.parsed_data
         except Exception as e:
-            self._print_verbose(f"Error parsing PDZ file: {e}")
+            self._print_verbose("Error parsing PDZ file: %s", e)
             if self.debug:
                 traceback.print_exc()
             return None
@@ -2,9 +2,14 @@ import struct
 import traceback
 
 from .base_tool import BasePDZTool
-from .utils import decode_system_time, flatten_system_date_time
+from .parse_plan import compile_record, run_plan
 
 class PDZ25Tool(BasePDZTool):
+    # Schema conventions used when compiling parse plans (see parse_plan.py)
+    SPECTRUM_CHANNELS_FIELD = 'channels'  # Field holding the number of channels of `spectrum_data`
+    SPECTRUM_FORMAT = 'L'  # Unsigned long counts
+    SKIP_FIELD_NAME = None  # 'skip' fields are kept as values
+
     # Records for PDZ 25 format
     # { record_type: { name: str, fields: [(field_name, field_type), ...] } }
     # See /docs/pdz_version_25_file_format for more details
@@ -404,15 +409,15 @@ class PDZ25Tool(BasePDZTool):
         }
     }
 
-    def __init__(self, file_path: str, verbose: bool = False, debug: bool = False):
-        super().__init__(file_path, verbose, debug)
+    def __init__(self, file_path: str, verbose: bool = False, debug: bool = False, **kwargs):
+        super().__init__(file_path, verbose, debug, **kwargs)
 
     def get_record_types(self):
         """
         Extracts blocks from PDZ 25 format.
         """
         offset = 0
-        total_length = len(self.pdz_bytes)
+        total_length = self._total_length
         record_types = []
 
         while offset < total_length:
@@ -423,32 +428,35 @@ class PDZ25Tool(BasePDZTool):
 
             # Extract record_type (2 bytes) and data_length (4 bytes)
             try:
-                record_type, data_length = struct.unpack_from('<HI', self.pdz_bytes, offset)
+                record_type, data_length = struct.unpack_from('<HI', self._read_at(offset, 6))
             except struct.error as e:
-                self._print_verbose(f"Error unpacking block at offset {offset}: {e}")
+                self._print_verbose("Error unpacking block at offset %s: %s", offset, e)
                 if self.debug:
                     traceback.print_exc()
                 break
 
-            self._print_verbose(f"Found block - Type: {record_type}, Size: {data_length}, Offset: {offset}")
+            self._print_verbose("Found block - Type: %s, Size: %s, Offset: %s", record_type, data_length, offset)
 
             if data_length <= 0 or data_length > total_length:
-                self._print_verbose(f"Invalid block size detected: {data_length} for block type {record_type}.")
+                self._print_verbose("Invalid block size detected: %s for block type %s.", data_length, record_type)
                 break
 
             offset += 6  # Move the offset to the start of the block data
             if offset + data_length > total_length:
-                self._print_verbose(f"Insufficient bytes for block {record_type}: required {data_length}, available {total_length - offset}")
+                self._print_verbose("Insufficient bytes for block %s: required %s, available %s", record_type, data_length, total_length - offset)
                 break
 
-            # Extract block data
-            block_data = self.pdz_bytes[offset:offset + data_length]
+            record_name = self.RECORDS.get(record_type, {}).get('name', f'Unknown Record Type {record_type}')
+
+            # Slice block data as a view over the file buffer (no copy), or read it if wanted in selective mode
+            block_data = self._read_at(offset, data_length) if self._is_record_wanted(record_name) else None
 
             # Store the block info
             record_types.append({
                 'record_type': record_type,
-                'record_name': self.RECORDS.get(record_type, {}).get('name', f'Unknown Record Type {record_type}'),
+                'record_name': record_name,
                 'data_length': data_length,
+                'offset': offset,
                 'bytes': block_data
             })
 
@@ -456,175 +464,41 @@ class PDZ25Tool(BasePDZTool):
 
         return record_types
 
-    def parse_record_type(self, record_type: int, block_bytes: bytes):
+    def parse_record_type(self, record_type: int, block_bytes: bytes, block_offset: int = 0):
         """
-        Parse a specific record type.
+        Parse a specific record type with its compiled parse plan.
         :param record_type: int Record type Id that is being parsed
-        :param block_bytes: bytes Block data
+        :param block_bytes: bytes | memoryview Block data
+        :param block_offset: int Offset of the block in the PDZ, used for image references
         :return:
         """
-        fields = self.RECORDS.get(record_type, {}).get('fields', [])
+        plan = compile_record(type(self), record_type)
+        self._block_offset = block_offset
 
-        if not fields:
+        if plan is None:
             return "No fields to parse"
 
-        total_byte_length = len(block_bytes)
-        offset = 0
-        result = {}
-
-        for field in fields:
-            if offset >= total_byte_length:
-                self._print_verbose(f"Warning: Reached end of data before parsing {field}")
-                break
-
-            field_name, field_type = field
-
-            # Handle repeatable blocks if `field_type` is a dict
-            if isinstance(field_type, dict):
-                field_details = field_type
-                repeat_count = field_details['repeat']
-
-                # Resolve `repeat_count` if it's a string (dynamic count)
-                if isinstance(repeat_count, str):
-                    repeat_count = int(result.get(repeat_count, 0))
-
-                if repeat_count == 0:
-                    self._print_verbose(f"Skipping repeatable block {field_name} with {repeat_count} repeats")
-                    continue
-
-                sub_fields = field_details['fields']
-                repeated_data = []
-
-                for _ in range(repeat_count):
-                    sub_result = {}
-                    for sub_field_name, sub_field_type in sub_fields:
-                        sub_value, sub_size = self._parse_field(sub_field_name, sub_field_type, block_bytes, offset,
-                                                                sub_result)
-                        if sub_value is None:
-                            break
-                        sub_result[sub_field_name] = sub_value
-                        offset += sub_size
-                    repeated_data.append(sub_result)
-
-                # Store repeated data
-                result[field_name] = repeated_data
-
-                continue
-
-            # Handle normal tuple field
-            field_name, field_type = field
-
-            # Use _parse_field for normal tuple fields
-            field_value, field_size = self._parse_field(field_name, field_type, block_bytes, offset, result)
-            if field_value is None:
-                break
-            result[field_name] = field_value
-            offset += field_size
-
-        return result
-
-    def _parse_field(self, field_name, field_type, block_bytes, offset, result):
-        total_byte_length = len(block_bytes)
+        return run_plan(plan, block_bytes, self)
 
-        try:
-            # Handle wchar_t strings
-            if 'wchar_t' in field_type:
-                if field_type == 'wchar_t':
-                    length_field_name = field_name + '_length'
-                    length = result.get(length_field_name, 0)
-                    n_bytes = length * 2
-                else:
-                    length = int(field_type.split('[')[1].split(']')[0])
-                    n_bytes = length * 2
-
-                if offset + n_bytes > total_byte_length:
-                    self._print_verbose(f"Error: Insufficient bytes for {field_name}")
-                    return None, 0
-
-                string_data_bytes = block_bytes[offset:offset + n_bytes]
-                string_data = string_data_bytes.decode('utf-16').strip('\x00')
-                return string_data, n_bytes
-
-            # Handle system_time fields
-            elif field_type == 'system_time':
-                n_bytes = 16
-                if offset + n_bytes > total_byte_length:
-                    self._print_verbose(f"Error: Insufficient bytes for {field_name}")
-                    return None, 0
-
-                year, month, day_of_week, day, hour, minute, second, milliseconds = struct.unpack_from('<8H',
-                                                                                                       block_bytes, offset)
-                acquisition_datetime = {
-                    "year": year,
-                    "month": month,
-                    "day": day,
-                    "hour": hour,
-                    "minute": minute,
-                    "second": second,
-                    "milliseconds": milliseconds
-                }
-                return flatten_system_date_time(acquisition_datetime), n_bytes
-
-            # Handle spectrum_data fields
-            elif field_type == 'spectrum_data':
-                num_channels = result.get('channels', 0)
-                n_bytes = num_channels * 4  # 4 bytes per channel
-
-                if offset + n_bytes > total_byte_length:
-                    self._print_verbose(f"Error: Insufficient bytes for {field_name}")
-                    return None, 0
-
-                fmt = f'<{num_channels}L'  # Little-endian unsigned long array
-                spectrum_data = struct.unpack_from(fmt, block_bytes, offset)
-                return list(spectrum_data), n_bytes
-            
-            elif field_type == 'bytes':
-
-                # Handle image bytes
-                if field_name == 'image':
-                    length_field_name = field_name + '_length'
-                    length = result.get(length_field_name, 0)
-                    n_bytes = length
-
-                    if offset + n_bytes > total_byte_length:
-                        self._print_verbose(f"Error: Insufficient bytes for {field_name}")
-                        return None, 0
-                    
-                    jpg_bytes = block_bytes[offset:offset+n_bytes]
-                    return jpg_bytes, len(jpg_bytes)
-
-            # Regular struct unpacking
-            fmt = '<' + field_type
-            size = struct.calcsize(fmt)
-
-            if offset + size > total_byte_length:
-                self._print_verbose(f"Error: Insufficient bytes for {field_name}")
-                return None, 0
-
-            value = struct.unpack_from(fmt, block_bytes, offset)[0]
-            return value, size
-
-        except struct.error as e:
-            self._print_verbose(f"Struct error in field {field_name}: {e}")
-            if self.debug:
-                traceback.print_exc()
-            return None, 0
-
-    def parse(self):
+    def parse(self, record_names: list[str] = None, lazy: bool = False):
         """
         Parse the PDZ file and set the parsed data.
+        :param record_names: list[str] Names of the records to parse. If None (default), the `records` given to the tool, or else all.
+        :param lazy: bool If True, return a mapping which decodes each record on first access instead of a dict.
         :return:
         """
+        if lazy:
+            return self._parse_lazy(record_names)
+
         try:
             parsed_data = {}
-            for record in self.record_types:
+            for record in self._select_records(record_names):
                 record_type = record['record_type']
-                block_bytes = record['bytes']
                 record_type_name = self.RECORDS.get(record_type, {}).get('name', 'Unknown')
 
-                self._print_verbose(f"Parsing record type: {record_type} - {record_type_name}")
+                self._print_verbose("Parsing record type: %s - %s", record_type, record_type_name)
 
-                parsed_record_type = self.parse_record_type(record_type, block_bytes)
+                parsed_record_type = self._parse_record(record)
 
                 parsed_data[record_type_name] = parsed_record_type
 
@@ -633,7 +507,7 @@ class PDZ25Tool(BasePDZTool):
 
             return self.parsed_data
         except Exception as e:
-            self._print_verbose(f"Error parsing PDZ file: {e}")
+            self._print_verbose("Error parsing PDZ file: %s", e)
             if self.debug:
                 traceback.print_exc()
             return None
@@ -1,29 +1,75 @@
-import struct
+import mmap
 from .pdz25_tool import PDZ25Tool
 from .pdz24_tool import PDZ24Tool
-from .utils import read_pdz_file, get_pdz_version
+from .utils import read_pdz_file, read_pdz_version, get_pdz_version
 
 
 class PDZTool:
-    def __init__(self, file_path, verbose=False, debug=False):
+    # { pdz_version: tool class }
+    TOOLS = {
+        "pdz25": PDZ25Tool,
+        "pdz24": PDZ24Tool,
+    }
+
+    def __init__(self, file_path, verbose=False, debug=False, io="read", pdz_bytes=None, **kwargs):
+        """
+        :param io: str "read" (default) loads the whole file, "mmap" memory-maps it.
+            With "mmap", use PDZTool as a context manager or call `.close()` to release the mapping.
+        :param pdz_bytes: bytes-like PDZ data already in memory; if given, `file_path` is not read.
+        :param kwargs: Other keyword arguments of the tool, e.g. `spectrum_array=True` for NumPy spectra
+            or `records=["XRF Spectrum"]` to read and parse only those records
+        """
         self.file_path = file_path
         self.verbose = verbose
 
-        # Read bytes and detect version before instantiating the correct tool
-        pdz_bytes = read_pdz_file(file_path)
-        pdz_version = get_pdz_version(pdz_bytes)
+        # Read the file once; the version is sniffed from its first two bytes and
+        # the same buffer is handed to the chosen tool.
+        # With `records` and io="read", the tool reads only those blocks, so only the version is read here.
+        self._owns_buffer = pdz_bytes is None
+        selective = pdz_bytes is None and kwargs.get('records') is not None and io == "read"
+        if pdz_bytes is None and not selective:
+            pdz_bytes = read_pdz_file(file_path, io=io)
+        self._pdz_bytes = pdz_bytes
+
+        try:
+            pdz_version = read_pdz_version(file_path) if selective else get_pdz_version(pdz_bytes)
+            if pdz_version not in self.TOOLS:
+                raise ValueError(f"Unknown PDZ version: {pdz_version}")
+        except ValueError:
+            self._close_buffer()
+            raise
 
         # Now instantiate the correct tool
-        if pdz_version == "pdz25":
-            self.tool = PDZ25Tool(file_path, verbose, debug)
-        elif pdz_version == "pdz24":
-            self.tool = PDZ24Tool(file_path, verbose, debug)
-        else:
-            raise ValueError(f"Unknown PDZ version: {pdz_version}")
+        self.tool = self.TOOLS[pdz_version](file_path, verbose, debug, io=io, pdz_bytes=pdz_bytes, **kwargs)
+
+    @classmethod
+    def from_buffer(cls, buffer, name="buffer.pdz", verbose=False, debug=False, **kwargs):
+        """
+        Create a tool from PDZ data already in memory, skipping disk I/O.
+        :param buffer: bytes | bytearray | memoryview | mmap.mmap PDZ file contents
+        :param name: str Name used in place of the file path, e.g. for output file names
+        :param kwargs: Other keyword arguments of the tool, e.g. `spectrum_array`
+        """
+        return cls(name, verbose, debug, pdz_bytes=buffer, **kwargs)
+
+    def _close_buffer(self):
+        if self._owns_buffer and isinstance(self._pdz_bytes, mmap.mmap) and not self._pdz_bytes.closed:
+            self._pdz_bytes.close()
+
+    def close(self):
+        """Release the tool's views over the file buffer, then the memory map if one was opened."""
+        self.tool.close()
+        self._close_buffer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def __getattr__(self, name):
         """
         Delegate attribute access to the appropriate tool.
         This method is called only if `name` is not found in `PDZTool`.
         """
-        return getattr(self.tool, name)
\ No newline at end of file
+        return getattr(self.tool, name)
@@ -0,0 +1,102 @@
+import json
+import time
+import tracemalloc
+
+
+class ParseStats:
+    """
+    Collector of parse statistics per record type: number of records parsed, bytes decoded, wall time and,
+    with `trace_memory`, the memory allocated while decoding (peak traced by `tracemalloc`, so slower).
+
+    Pass it to the tools as `stats=...`; one collector can be shared by many tools, and the collectors of
+    worker processes are combined with `merge(other.to_dict())`. Memory is only traced between `start()` and `stop()`.
+
+    Example:
+        stats = ParseStats(trace_memory=True)
+        stats.start()
+        for file_path in file_paths:
+            with PDZTool(file_path, stats=stats) as pdz_tool:
+                pdz_tool.parse()
+        stats.stop()
+        print(stats.report())
+    """
+    FIELDS = ("count", "bytes", "seconds", "allocated_bytes")
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.n_files = 0
+        self.records = {}  # {record_name: {"record_type": int, "count": int, "bytes": int, "seconds": float, "allocated_bytes": int}}
+        self._started_tracing = False
+
+    def start(self):
+        """Start tracing memory allocations if `trace_memory` is enabled and no one else traces them."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """Stop tracing memory allocations if started by `start()`."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def measure(self, record_type: int, record_name: str, n_bytes: int, parse, *args):
+        """
+        Call `parse(*args)` to decode a record, and add its time (and allocations) to the stats of the record type.
+        :return: The result of `parse`
+        """
+        trace_memory = self.trace_memory and tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return parse(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            allocated_bytes = tracemalloc.get_traced_memory()[1] - start_memory if trace_memory else 0
+            self.add(record_type, record_name, 1, n_bytes, seconds, allocated_bytes)
+
+    def add(self, record_type: int, record_name: str, count: int, n_bytes: int, seconds: float, allocated_bytes: int = 0):
+        record_stats = self.records.get(record_name)
+        if record_stats is None:
+            record_stats = self.records[record_name] = {"record_type": record_type, **dict.fromkeys(self.FIELDS, 0)}
+        record_stats["count"] += count
+        record_stats["bytes"] += n_bytes
+        record_stats["seconds"] += seconds
+        record_stats["allocated_bytes"] = max(record_stats["allocated_bytes"], allocated_bytes)
+
+    def merge(self, stats: dict):
+        """Add the stats of another collector, given as `to_dict()`, e.g. from a worker process."""
+        self.n_files += stats["n_files"]
+        for record_name, record_stats in stats["records"].items():
+            self.add(record_stats["record_type"], record_name,
+                     *(record_stats[field] for field in self.FIELDS))
+
+    def to_dict(self) -> dict:
+        """
+        Get the stats, with records sorted by total time.
+        `allocated_bytes` of a record type is the largest allocation while decoding one of its records.
+        :return: dict {"n_files": int, "trace_memory": bool, "records": {record_name: {...}}}
+        """
+        records = dict(sorted(self.records.items(), key=lambda item: item[1]["seconds"], reverse=True))
+        return {"n_files": self.n_files, "trace_memory": self.trace_memory, "records": records}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=4)
+
+    def save_json(self, output_file: str) -> str:
+        with open(output_file, 'w') as f:
+            f.write(self.to_json())
+        return output_file
+
+    def report(self) -> str:
+        """Get the stats as a text table, slowest record types first."""
+        lines = [f"Parse stats of {self.n_files} PDZ file{'s'[:self.n_files^1]}",
+                 f"{'record':<32} {'count':>8} {'MB':>10} {'seconds':>10} {'MB/s':>10} {'max alloc KiB':>14}"]
+        for record_name, record_stats in self.to_dict()["records"].items():
+            seconds = record_stats["seconds"]
+            mb = record_stats["bytes"] / 1e6
+            lines.append(f"{record_name[:32]:<32} {record_stats['count']:>8} {mb:>10.3f} {seconds:>10.4f} "
+                         f"{mb / seconds if seconds else 0:>10.1f} {record_stats['allocated_bytes'] / 1024:>14.1f}")
+        return '\n'.join(lines)
@@ -0,0 +1,180 @@
+import os
+import struct
+
+from .base_tool import PDZOutputMixin, find_image_offsets
+from .parse_plan import compile_record, run_plan
+from .pdz_tool import PDZTool
+from .utils import get_pdz_version, require_numpy
+
+
+class PDZStreamReader(PDZOutputMixin):
+    """
+    Parse PDZ records from any binary file-like object (file, stdin, pipe, socket) as they arrive.
+
+    Iterating yields `(record_type, parsed_record)` for each block, reading one block at a time,
+    so memory is bounded by the largest record rather than the file. `parse()` consumes the
+    stream and sets `parsed_data` like the tools do, so JSON/CSV/image outputs work as usual.
+
+    Example:
+        with open(path, 'rb') as f:
+            for record_type, parsed_record in PDZStreamReader(f):
+                ...
+    """
+    CHUNK_SIZE = 1 << 16  # Bytes read at a time when discarding unwanted blocks or reading the rest of the stream
+
+    def __init__(self, stream, name: str = "stream.pdz", verbose: bool = False, debug: bool = False,
+                 spectrum_array: bool = False, records: list[str] = None, max_record_length: int = None):
+        """
+        :param stream: Binary file-like object with `read(n)`, e.g. `sys.stdin.buffer`
+        :param name: str Name used in place of the file path, e.g. for output file names
+        :param spectrum_array: bool If True, `spectrum_data` is a NumPy array instead of a list (requires NumPy).
+        :param records: list[str] Names of the records to parse. Other blocks are skipped without being kept in memory.
+        :param max_record_length: int If given, stop at any block larger than this many bytes.
+        """
+        self.stream = stream
+        self.verbose = verbose or debug
+        self.debug = debug
+        self.file_path = name
+        self.pdz_file_name: str = os.path.splitext(os.path.basename(name))[0]
+        self.spectrum_array = spectrum_array
+        if spectrum_array:
+            require_numpy()
+        self.records = records
+        self.max_record_length = max_record_length
+        self.image_refs = False  # There is no file to reference, so images are always read
+        self._block_offset = 0  # Offset in the stream of the block being parsed
+        self._image_offsets_in_stream = []  # Offsets in the stream of the images of the last 'Image Details'
+
+        self.pdz_version: str = None
+        self.tool_class = None
+        self.record_names: list = []
+        self.parsed_data: dict = {}
+
+    def __iter__(self):
+        header = self._read_exactly(6)
+        self.pdz_version = get_pdz_version(header)
+        self.tool_class = PDZTool.TOOLS.get(self.pdz_version)
+        if self.tool_class is None:
+            raise ValueError(f"Unknown PDZ version: {self.pdz_version}")
+        self._print_verbose("PDZ Version: %s", self.pdz_version)
+
+        if self.pdz_version == "pdz24":
+            blocks = self._iter_pdz24_blocks(header)
+        else:
+            blocks = self._iter_pdz25_blocks(header)
+
+        for record_type, block in blocks:
+            if block is not None:
+                parsed_record = self.parse_record_type(record_type, block)
+                if self.tool_class.RECORDS.get(record_type, {}).get('name') == 'Image Details':
+                    self._image_offsets_in_stream = find_image_offsets(self.tool_class, record_type, block, self._block_offset)
+                yield record_type, parsed_record
+
+    def parse(self):
+        """
+        Consume the stream and set the parsed data, keyed by record name as in `BasePDZTool.parse()`.
+        :return: dict
+        """
+        parsed_data = {}
+        for record_type, parsed_record_type in self:
+            record_type_name = self.tool_class.RECORDS.get(record_type, {}).get('name', 'Unknown')
+            parsed_data[record_type_name] = parsed_record_type
+        self.parsed_data = parsed_data
+        return self.parsed_data
+
+    def parse_record_type(self, record_type: int, block_bytes: bytes):
+        """
+        Parse a specific record type with the compiled parse plan of the detected format.
+        :param record_type: int Record type Id that is being parsed
+        :param block_bytes: bytes Block data
+        :return:
+        """
+        plan = compile_record(self.tool_class, record_type)
+        if plan is None:
+            return "No fields to parse"
+
+        return run_plan(plan, block_bytes, self)
+
+    def _image_offsets(self) -> list:
+        """Get the offsets in the stream of the images of the parsed 'Image Details'."""
+        return self._image_offsets_in_stream
+
+    def _iter_pdz25_blocks(self, header: bytes):
+        """Yield `(record_type, block_bytes)` for each 6-byte `<HI` header and its block; skipped blocks yield None."""
+        offset = 0
+        while len(header) == 6:
+            record_type, data_length = struct.unpack('<HI', header)
+            offset += 6
+            self._block_offset = offset
+            self._print_verbose("Found block - Type: %s, Size: %s", record_type, data_length)
+
+            if data_length <= 0 or (self.max_record_length is not None and data_length > self.max_record_length):
+                self._print_verbose("Invalid block size detected: %s for block type %s.", data_length, record_type)
+                return
+
+            record_name = self.tool_class.RECORDS.get(record_type, {}).get('name', f'Unknown Record Type {record_type}')
+            self.record_names.append(record_name)
+            if self.records is not None and record_name not in self.records:
+                if self._skip(data_length) < data_length:
+                    self._print_verbose("Insufficient bytes for block %s", record_type)
+                    return
+                yield record_type, None
+            else:
+                block = self._read_exactly(data_length)
+                if len(block) < data_length:
+                    self._print_verbose("Insufficient bytes for block %s: required %s, available %s", record_type, data_length, len(block))
+                    return
+                yield record_type, block
+
+            offset += data_length
+            header = self._read_exactly(6)
+
+        if header:
+            self._print_verbose("Insufficient bytes for reading block header.")
+
+    def _iter_pdz24_blocks(self, header: bytes):
+        """Yield the 6-byte File Header and then the rest of the stream as the XRF Spectrum."""
+        for record_type, record_name in ((0, 'File Header'), (1, 'XRF Spectrum')):
+            self.record_names.append(record_name)
+            wanted = self.records is None or record_name in self.records
+            if record_type == 0:
+                yield record_type, header if wanted else None
+            elif wanted:
+                block = self._read_to_end()
+                if not block:
+                    self._print_verbose("No remaining bytes for the second record.")
+                    return
+                yield record_type, block
+
+    def _read_exactly(self, n: int) -> bytes:
+        """Read `n` bytes, looping over short reads from pipes and sockets; fewer only at end of stream."""
+        data = self.stream.read(n)
+        if data is None or len(data) == n:
+            return data or b''
+        chunks = [data]
+        remaining = n - len(data)
+        while remaining and data:
+            data = self.stream.read(remaining)
+            if data:
+                chunks.append(data)
+                remaining -= len(data)
+        return b''.join(chunks)
+
+    def _read_to_end(self) -> bytes:
+        """Read the rest of the stream, looping over short reads from pipes and sockets."""
+        chunks = []
+        while True:
+            chunk = self.stream.read(self.CHUNK_SIZE)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def _skip(self, n: int) -> int:
+        """Discard `n` bytes without holding them in memory, and return the number of bytes skipped."""
+        skipped = 0
+        while skipped < n:
+            chunk = self.stream.read(min(self.CHUNK_SIZE, n - skipped))
+            if not chunk:
+                break
+            skipped += len(chunk)
+        return skipped
@@ -0,0 +1,233 @@
+"""
+Seeded generator of synthetic PDZ 25 (and PDZ 24) files, for benchmarks and tests without real measurements.
+
+The files have the records of an assay: File Header, XRF Instrument, XRF Assay Summary, one XRF Spectrum per phase,
+Calculated Results with one Calculated Results Details per element, and optionally Raw XRF Spectrum Packets,
+Image Details and a Trace Log. PDZ 24 files have their File Header and one XRF Spectrum.
+Values are plausible but not physical: spectra are a decaying background with a few peaks and noise, and images
+are random bytes between JPEG start and end markers. The same seed and index always give the same file.
+
+Example:
+    file_paths = generate_corpus('corpus', 1000, seed=0, channels=2048, phases=3, images=2)
+"""
+import datetime
+import math
+import os
+import random
+import struct
+from functools import lru_cache
+
+from .writer import complete_record, encode_pdz
+from .pdz24_tool import PDZ24Tool
+from .pdz25_tool import PDZ25Tool
+
+# Symbols by atomic number (index 0 is Z = 1)
+ELEMENTS = (
+    'H', 'He', 'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne', 'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar', 'K', 'Ca',
+    'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr', 'Rb', 'Sr', 'Y', 'Zr',
+    'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe', 'Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd',
+    'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg',
+    'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn', 'Fr', 'Ra', 'Ac', 'Th', 'Pa', 'U',
+)
+FIRST_RESULT_ELEMENT = 12  # Results start at Mg, the lightest element usually reported by handheld XRF
+EV_PER_CHANNEL = 20.0
+FLOAT = struct.Struct('<f')
+
+
+def _f32(value: float) -> float:
+    """Round to a 4-byte float, so the value is parsed back unchanged."""
+    return FLOAT.unpack(FLOAT.pack(value))[0]
+
+
+@lru_cache(maxsize=16)
+def _spectrum_shape(channels: int, phase: int) -> tuple:
+    """Background decaying with energy plus Gaussian peaks, the same for all files of a phase."""
+    peak_channels = [channels * fraction for fraction in (0.08, 0.13, 0.32, 0.35, 0.52 + 0.05 * phase)]
+    width = max(channels / 400, 1.0)
+    return tuple(
+        int(200 * math.exp(-channel / (channels / 6))
+            + sum(3000 / (1 + i) * math.exp(-((channel - peak) / width) ** 2 / 2) for i, peak in enumerate(peak_channels)))
+        for channel in range(channels))
+
+
+def _spectrum(rng: random.Random, channels: int, phase: int) -> list:
+    scale = rng.uniform(0.5, 2.0)
+    return [int(count * scale) + noise for count, noise in zip(_spectrum_shape(channels, phase), rng.randbytes(channels))]
+
+
+def _date_time(rng: random.Random) -> str:
+    date_time = datetime.datetime(2020, 1, 1) + datetime.timedelta(seconds=rng.randrange(5 * 365 * 24 * 3600))
+    return date_time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _packets(rng: random.Random, spectrum_record: dict, n_packets: int) -> list:
+    """Split the spectrum of a phase into packets, with the running totals of the phase."""
+    packets = []
+    totals = dict.fromkeys(('raw_counts', 'valid_counts', 'valid_counts_in_range', 'reset_counts'), 0)
+    packet_time = spectrum_record['total_packet_time'] / max(n_packets, 1)
+    total_dead = 0
+    for i in range(n_packets):
+        spectrum = [count // n_packets + (count % n_packets > i) for count in spectrum_record['spectrum_data']]
+        valid_count = sum(spectrum)
+        raw_count = valid_count + rng.randrange(100)
+        reset_count = rng.randrange(20)
+        dead_time = rng.randrange(int(packet_time * 10_000) + 1)  # Times in 10 µs ticks
+        total_dead += dead_time
+        for name, count in zip(totals, (raw_count, valid_count, valid_count, reset_count)):
+            totals[name] += count
+        packets.append({
+            'phase_number': spectrum_record['phase_number'], 'xilinx_fw_ver': 1, 'xilinx_fw_sub_ver': 0,
+            'packet_len': len(spectrum), 'time_since_trigger': int(packet_time * (i + 1) * 100_000),
+            'raw_count': raw_count, 'valid_count': valid_count, 'valid_count_in_range': valid_count,
+            'packet_time': int(packet_time * 100_000), 'dead_time': dead_time, 'reset_time': reset_count * 10,
+            'live_time': int(packet_time * 100_000) - dead_time, 'service': 0, 'reset_count': reset_count,
+            'packet_count': i + 1, 'skip': bytes(20), 'xilinx_vars': rng.randbytes(58),
+            'detector_temp': -60 + rng.randrange(-2, 3), 'ambient_temp': int(spectrum_record['ambient_temp'] * 10),
+            'controller_fw_ver': 1, 'controller_fw_sub_ver': 0,
+            'total_raw_counts': totals['raw_counts'], 'total_valid_counts': totals['valid_counts'],
+            'total_valid_counts_in_range': totals['valid_counts_in_range'], 'total_reset_counts': totals['reset_counts'],
+            'total_time_since_trigger': _f32(packet_time * (i + 1)), 'total_packet_time': _f32(packet_time * (i + 1)),
+            'total_dead': _f32(total_dead / 100_000), 'total_reset': _f32(reset_count / 10_000),
+            'total_live': _f32(packet_time * (i + 1)), 'spectrum_data': spectrum,
+        })
+    return packets
+
+
+def generate_records(seed=0, channels: int = 2048, phases: int = 1, images: int = 0, image_size: int = 20000,
+                     trace_log_length: int = 0, results: int = 20, packets: int = 0, pdz_version: str = "pdz25") -> list:
+    """
+    Generate the records of a synthetic PDZ file.
+    :param seed: Seed of the random values (int, str, ...)
+    :param channels: int Number of channels of each spectrum, at least 1
+    :param phases: int Number of XRF Spectrum records
+    :param images: int Number of images of the Image Details record; 0 for none
+    :param image_size: int Size of each image in bytes
+    :param trace_log_length: int Number of characters of the Trace Log record; 0 for none
+    :param results: int Number of Calculated Results Details records (elements)
+    :param packets: int Number of Raw XRF Spectrum Packet records per phase, each with a share of its spectrum
+    :param pdz_version: str "pdz25" or "pdz24". PDZ 24 files only use `seed` and `channels`.
+    :return: list `[(record_type, record), ...]` in file order, as parsed back from the written file (see `encode_pdz`)
+    """
+    if channels < 1:
+        raise ValueError(f"Spectra need at least 1 channel, got {channels}")
+    if results > len(ELEMENTS) - FIRST_RESULT_ELEMENT + 1:
+        raise ValueError(f"At most {len(ELEMENTS) - FIRST_RESULT_ELEMENT + 1} results, got {results}")
+    rng = random.Random(seed)
+    if pdz_version == "pdz24":
+        return _generate_pdz24_records(rng, channels)
+    if pdz_version != "pdz25":
+        raise ValueError(f"Unknown PDZ version: {pdz_version}")
+    serial_number = f"SYN{rng.randrange(100000):05d}"
+    date_time = _date_time(rng)
+    live_time = _f32(rng.uniform(10, 60))
+
+    records = [
+        (25, {'file_type_id': 'pdz25', 'instrument_type': 1}),
+        (1, {
+            'serial_number': serial_number, 'build_number': 'SYN-1', 'tube_target_element': 45,
+            'anode_takeoff_angle': 52, 'sample_incidence_angle': 55, 'sample_takeoff_angle': 45, 'be_thickness': 25,
+            'detector_model': 'SDD', 'tube_type': 'Rh', 'hw_spot_size': 8, 'sw_spot_size': 8,
+            'collimator_type': 'Standard', 'num_versions': 8,
+            **{f'{name}_record_num': i for i, name in enumerate(
+                ('sw_version', 'xilinx_version', 'sup_version', 'uup_version', 'xray_source_version', 'dpp_version',
+                 'header_version', 'baseboard_version'))},
+            **{name: '1.0.0' for name in (
+                'sw_version', 'xilinx_fw_ver', 'sup_fw_ver', 'uup_fw_ver', 'xray_src_fw_ver', 'dpp_fw_ver',
+                'header_fw_ver', 'baseboard_fw_ver')},
+        }),
+    ]
+
+    spectra = []
+    for phase in range(phases):
+        spectrum = _spectrum(rng, channels, phase)
+        raw_counts = sum(spectrum)
+        spectra.append((3, {
+            'phase_number': phase, 'raw_counts': raw_counts + rng.randrange(1000), 'valid_counts': raw_counts,
+            'valid_counts_in_range': raw_counts, 'reset_counts': rng.randrange(100),
+            'time_since_trigger': live_time, 'total_packet_time': live_time, 'total_dead': _f32(live_time * 0.1),
+            'total_reset': _f32(0.01), 'total_live': live_time,
+            'tube_voltage': _f32((40.0, 15.0, 50.0)[phase % 3]), 'tube_current': _f32(rng.uniform(5, 50)),
+            'filters': [{'filter_element': element, 'filter_thickness': thickness}
+                        for element, thickness in ((13, 100 * (phase % 2)), (22, 25 * (phase % 3 == 2)), (0, 0))],
+            'filter_wheel_number': phase, 'detector_temp': _f32(-30.0), 'ambient_temp': _f32(rng.uniform(60, 100)),
+            'vacuum': 0, 'ev_per_channel': EV_PER_CHANNEL, 'gain_drift_algorithm': 1, 'channel_start': 0.0,
+            'acquisition_date_time': date_time, 'atmospheric_pressure': _f32(rng.uniform(95, 102)),
+            'channels': channels, 'nose_temp': 30, 'environment': 0, 'illumination': 'Phase',
+            'normal_packet_start': 0, 'spectrum_data': spectrum,
+        }))
+
+    records.append((2, {
+        'number_of_phases': phases,
+        **{name: sum(record[name] for _, record in spectra)
+           for name in ('raw_counts', 'valid_counts', 'valid_counts_in_range', 'reset_counts')},
+        'total_real_time': _f32(live_time * phases * 1.1), 'total_packet_time': _f32(live_time * phases),
+        'total_dead': _f32(live_time * phases * 0.1), 'total_reset': _f32(0.01 * phases),
+        'total_live': _f32(live_time * phases), 'elapsed_time': _f32(live_time * phases * 1.2),
+        'application_name': 'Synthetic', 'application_part_number': '000-0000', 'user_id': 'synthetic',
+    }))
+    for _, spectrum_record in spectra:
+        records.append((3, spectrum_record))
+        records.extend((4, packet) for packet in _packets(rng, spectrum_record, packets))
+
+    records.append((5, {
+        'analysis_mode': 1, 'analysis_type': 1, 'used_auto_cal_select': 0, 'result_type': 0, 'error_multiplier': 2,
+        # The length fields of the file name and part number do not match their names, so they are parsed empty
+        'cal_file_length': 0, 'cal_file_name': '', 'cal_pkg_name': 'Synthetic', 'cal_pkg_pn_length': 0,
+        'cal_pkg_part_number': '', 'type_std_set_name': 'Synthetic',
+    }))
+    for atomic_number in range(FIRST_RESULT_ELEMENT, FIRST_RESULT_ELEMENT + results):
+        result = _f32(rng.expovariate(1.0))
+        error = _f32(result * 0.05 + 0.001)
+        records.append((6, {
+            'name': ELEMENTS[atomic_number - 1], 'atomic_number': atomic_number, 'units': 1, 'result': result,
+            'type_std_result': 0.0, 'error': error, 'min': 0.0, 'max': _f32(result * 2), 'tramp': 0, 'nominal': 0,
+        }))
+
+    if images:
+        records.append((137, {'images': [
+            {'image': b'\xff\xd8' + rng.randbytes(max(image_size - 4, 0)) + b'\xff\xd9',
+             'x_dimension': 640, 'y_dimension': 480, 'annotation': f'Image {i}'}
+            for i in range(images)]}))
+    records.append((138, {'gps_valid': 1, 'latitude': rng.uniform(-90, 90), 'longitude': rng.uniform(-180, 180),
+                          'altitude': _f32(rng.uniform(0, 3000))}))
+    records.append((139, {'std_multiplier': 2, 'active_cal': 'Synthetic', 'sample_id': f"Sample {rng.randrange(10**6)}"}))
+    if trace_log_length:
+        line = f"{date_time} Synthetic trace log of {serial_number}\r\n"
+        log = (line * (trace_log_length // len(line) + 1))[:trace_log_length]
+        records.append((900, {'log': log}))
+
+    return [(record_type, complete_record(PDZ25Tool, record_type, record)) for record_type, record in records]
+
+
+def _generate_pdz24_records(rng: random.Random, channels: int) -> list:
+    if channels > 32767:
+        raise ValueError(f"PDZ 24 spectra have at most 32767 channels, got {channels}")
+    records = [
+        (0, {'file_type': 257, 'version': 1}),
+        (1, {'ev_per_channel': EV_PER_CHANNEL, 'xray_voltage_kv': _f32(40.0), 'xray_filament_current': _f32(rng.uniform(5, 50)),
+             'live_time': _f32(rng.uniform(10, 60)), 'spectrum_data': _spectrum(rng, channels, 0)}),
+    ]
+    return [(record_type, complete_record(PDZ24Tool, record_type, record)) for record_type, record in records]
+
+
+def generate_pdz(seed=0, pdz_version: str = "pdz25", **kwargs) -> bytes:
+    """Generate the bytes of a synthetic PDZ file. See `generate_records` for the parameters."""
+    return encode_pdz(generate_records(seed, pdz_version=pdz_version, **kwargs), pdz_version=pdz_version)
+
+
+def generate_corpus(output_dir: str, n_files: int, seed=0, prefix: str = 'synthetic_', **kwargs) -> list:
+    """
+    Write a corpus of synthetic PDZ files to `output_dir`, each with its own seed derived from `seed` and its index,
+    so a corpus can be generated in parts or extended and stays the same.
+    :param kwargs: Options of `generate_records`, e.g. `channels`, `phases`, `images` or `pdz_version`
+    :return: list[str] Paths of the files
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    width = max(len(str(n_files - 1)), 7)
+    file_paths = []
+    for i in range(n_files):
+        file_path = os.path.join(output_dir, f"{prefix}{i:0{width}d}.pdz")
+        with open(file_path, 'wb') as f:
+            f.write(generate_pdz(f"{seed}-{i}", **kwargs))
+        file_paths.append(file_path)
+    return file_paths
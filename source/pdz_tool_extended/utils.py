@@ -1,11 +1,141 @@
+import base64
+import json
+import logging
+import mmap
+import os
 import struct
-from .config import SUPPORTED_PDZ_VERSIONS
+from collections.abc import Mapping
+from .config import SUPPORTED_PDZ_VERSIONS, IO_MODES, JSON_BACKENDS
+
+logger = logging.getLogger('pdz_tool_extended')
+
+def print_verbose(verbose: bool, message: str, *args):
+    """
+    Print a message when verbose is enabled, else log it to the `pdz_tool_extended` logger at DEBUG level.
+    The message is formatted with `message % args` only when it is printed or logged, so pass values as `args`.
+    """
+    if verbose:
+        print(message % args if args else message)
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, *args)
+
+def read_pdz_file(file_path, io: str = "read"):
+    """
+    Reads the PDZ file and returns its bytes.
+    With `io="mmap"` the file is memory-mapped read-only instead, and the caller is
+    responsible for closing the returned `mmap.mmap`.
+    """
+    if io not in IO_MODES:
+        raise ValueError(f"Unknown io mode: {io}. Expected one of {IO_MODES}")
 
-def read_pdz_file(file_path):
-    """Reads the PDZ file and returns its bytes."""
     with open(file_path, 'rb') as opened_file:
+        if io == "mmap":
+            return mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ)
         return opened_file.read()
 
+def require_numpy():
+    """Imports and returns NumPy, which is only needed for the array outputs."""
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("NumPy is required for array outputs. Install it with `pip install numpy`.") from e
+    return numpy
+
+def require_pyarrow():
+    """Imports and returns PyArrow, which is only needed for the columnar outputs."""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("PyArrow is required for Parquet and Arrow outputs. Install it with `pip install pyarrow`.") from e
+    return pyarrow
+
+def json_default(obj):
+    """
+    `default` for `json.dumps` converting NumPy arrays and scalars to Python lists and numbers,
+    other mappings (like LazyParsedData) to dicts, and bytes to base64 strings.
+    """
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(obj).decode('ascii')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def get_json_dumps(backend: str = "auto", indent: int = None):
+    """
+    Get a function encoding an object to a JSON string with a backend.
+    :param backend: str "auto" uses orjson if it is installed and supports the indent, else json
+    :param indent: int Spaces of indentation, or None for compact JSON
+    """
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {backend}. Expected one of {JSON_BACKENDS}")
+
+    if backend != "json" and indent in (None, 2):
+        try:
+            import orjson
+        except ImportError:
+            if backend == "orjson":
+                raise ImportError("orjson is required for the orjson JSON backend. Install it with `pip install orjson`.")
+        else:
+            option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+            return lambda obj: orjson.dumps(obj, default=json_default, option=option).decode('utf-8')
+    elif backend == "orjson":
+        raise ValueError(f"The orjson JSON backend only indents by 2, not {indent}")
+
+    separators = (',', ': ') if indent is not None else (',', ':')
+    return lambda obj: json.dumps(obj, indent=indent, separators=separators, default=json_default)
+
+def read_pdz_version(file_path):
+    """Reads only the first two bytes of the PDZ file and returns its version."""
+    with open(file_path, 'rb') as opened_file:
+        return get_pdz_version(opened_file.read(2))
+
+def copy_file_range_to(src_path, offset, length, dst_path, chunk_size=1 << 20):
+    """
+    Copies `length` bytes at `offset` of file `src_path` to a new file `dst_path`.
+    Uses `os.copy_file_range` or `os.sendfile` so the bytes stay in the kernel, with a chunked read/write fallback.
+    """
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        copied = 0
+
+        for copy in (_copy_with_copy_file_range, _copy_with_sendfile):
+            if copied < length:
+                try:
+                    copied = copy(src.fileno(), dst.fileno(), offset, length, copied)
+                except OSError:
+                    pass  # Not supported for these files (e.g. across file systems or on this OS); try the next way
+
+        src.seek(offset + copied)
+        dst.seek(copied)
+        while copied < length:
+            chunk = src.read(min(chunk_size, length - copied))
+            if not chunk:
+                raise ValueError(f"Insufficient bytes in {src_path}: required {length} at offset {offset}, copied {copied}")
+            dst.write(chunk)
+            copied += len(chunk)
+
+def _copy_with_copy_file_range(src_fd, dst_fd, offset, length, copied):
+    if not hasattr(os, 'copy_file_range'):
+        return copied
+    while copied < length:
+        n = os.copy_file_range(src_fd, dst_fd, length - copied, offset + copied, copied)
+        if n == 0:
+            break
+        copied += n
+    return copied
+
+def _copy_with_sendfile(src_fd, dst_fd, offset, length, copied):
+    if not hasattr(os, 'sendfile'):
+        return copied
+    os.lseek(dst_fd, copied, os.SEEK_SET)
+    while copied < length:
+        n = os.sendfile(dst_fd, src_fd, offset + copied, length - copied)
+        if n == 0:
+            break
+        copied += n
+    return copied
+
 def get_pdz_version(pdz_bytes):
     """Extracts the PDZ version from the first two bytes of `pdz_bytes`."""
     if len(pdz_bytes) < 2:
@@ -0,0 +1,206 @@
+"""
+Encode parsed PDZ records back into PDZ bytes, the inverse of parsing with the RECORDS schemas of the tools.
+
+Records are written field by field in schema order, so parsing the written PDZ gives the same records:
+`parse(encode_pdz(records)) == records` for records as returned by `parse()`. Length, count and channel fields
+(e.g. `serial_number_length`, `num_images`, `channels`) are derived from their values when missing,
+see `complete_record`. As in parsing, a record ends at the first field it does not have, and strings without
+a `<name>_length` field in the schema are empty. Empty values at the end of a block are not parsed back.
+
+Some information is not kept by parsing, so a parsed PDZ is not always written back byte for byte:
+`skip` fields of PDZ 24 are written as zeros, SYSTEMTIME milliseconds as 0 and bytes after the last field
+of a block are dropped. Records without fields to parse can be given as raw block bytes.
+
+Example:
+    with PDZTool(path) as pdz_tool:
+        pdz_bytes = encode_pdz(pdz_tool.parse(), pdz_version=pdz_tool.pdz_version)
+"""
+import datetime
+import re
+import struct
+from collections.abc import Mapping
+from functools import lru_cache
+
+from .parse_plan import SpectrumStep, SystemTimeStep
+from .pdz_tool import PDZTool
+
+RECORD_HEADER = struct.Struct('<HI')  # Record type and block length of each PDZ 25 block
+
+
+@lru_cache(maxsize=None)
+def _field_struct(field_type: str):
+    return struct.Struct('<' + field_type)
+
+
+@lru_cache(maxsize=None)
+def _record_types_by_name(tool_class) -> dict:
+    return {record['name']: record_type for record_type, record in tool_class.RECORDS.items()}
+
+
+def _utf16_length(value: str) -> int:
+    return len(value.encode('utf-16-le')) // 2
+
+
+def complete_record(tool_class, record_type: int, record: dict) -> dict:
+    """
+    Get a copy of a record with its missing length, count and channel fields derived from their values,
+    i.e. the record as it is parsed once written.
+    :param tool_class: type PDZ25Tool or PDZ24Tool
+    :param record_type: int Record type Id
+    :param record: dict Record fields keyed by field name
+    :return: dict
+    """
+    fields = tool_class.RECORDS.get(record_type, {}).get('fields', [])
+    return _complete_fields(fields, record, tool_class)
+
+
+def _complete_fields(fields: list, values: Mapping, tool_class) -> dict:
+    values = dict(values)
+    field_names = {field_name for field_name, _ in fields}
+    for field_name, field_type in fields:
+        if field_name not in values:
+            continue
+        if isinstance(field_type, dict):
+            repeat = field_type['repeat']
+            items = [_complete_fields(field_type['fields'], item, tool_class) for item in values[field_name]]
+            values[field_name] = items
+            if isinstance(repeat, str) and repeat in field_names:
+                values.setdefault(repeat, len(items))
+        elif field_type == 'wchar_t' and field_name + '_length' in field_names:
+            values.setdefault(field_name + '_length', _utf16_length(values[field_name]))
+        elif field_type == 'bytes' and field_name + '_length' in field_names:
+            values.setdefault(field_name + '_length', len(values[field_name]))
+        elif field_type == 'spectrum_data' and tool_class.SPECTRUM_CHANNELS_FIELD in field_names:
+            values.setdefault(tool_class.SPECTRUM_CHANNELS_FIELD, len(values[field_name]))
+    return values
+
+
+def encode_record(tool_class, record_type: int, record) -> bytes:
+    """
+    Encode the block of a record, without its record header.
+    :param tool_class: type PDZ25Tool or PDZ24Tool
+    :param record_type: int Record type Id
+    :param record: dict | bytes Record fields keyed by field name, or the raw block bytes
+    :return: bytes
+    """
+    if isinstance(record, (bytes, bytearray, memoryview)):
+        return bytes(record)
+    if not isinstance(record, Mapping):
+        raise ValueError(f"Record type {record_type} has no fields to encode: {record!r}")
+
+    fields = tool_class.RECORDS.get(record_type, {}).get('fields', [])
+    if not fields:
+        raise ValueError(f"Unknown record type {record_type} of {tool_class.__name__}; give the raw block bytes instead")
+
+    chunks = []
+    _encode_fields(fields, _complete_fields(fields, record, tool_class), tool_class, chunks)
+    return b''.join(chunks)
+
+
+def _encode_fields(fields: list, values: dict, tool_class, chunks: list) -> bool:
+    """Append the encoded fields to `chunks`; return False where the values end, as parsing stops there."""
+    for field_name, field_type in fields:
+        if isinstance(field_type, dict):
+            repeat = field_type['repeat']
+            if isinstance(repeat, str):
+                repeat = int(values.get(repeat, 0))
+                if repeat == 0:
+                    continue  # Not parsed either, so the values have no items
+            if field_name not in values:
+                return False
+            items = values[field_name]
+            if len(items) != repeat:
+                raise ValueError(f"Expected {repeat} items in {field_name}, got {len(items)}")
+            for item in items:
+                _encode_fields(field_type['fields'], item, tool_class, chunks)
+            continue
+
+        if field_name == tool_class.SKIP_FIELD_NAME:
+            chunks.append(bytes(_field_struct(field_type).size))
+            continue
+        if field_name not in values:
+            return False
+        value = values[field_name]
+
+        if 'wchar_t' in field_type:
+            if field_type == 'wchar_t':
+                length = values.get(field_name + '_length', 0)
+            else:
+                length = int(field_type.split('[')[1].split(']')[0])
+            encoded = value.encode('utf-16-le')
+            if len(encoded) > length * 2:
+                raise ValueError(f"String of {len(encoded) // 2} characters does not fit {field_name} of {length}")
+            chunks.append(encoded.ljust(length * 2, b'\x00'))
+        elif field_type == 'system_time':
+            chunks.append(_encode_system_time(value))
+        elif field_type == 'spectrum_data':
+            chunks.append(_encode_spectrum(value, values.get(tool_class.SPECTRUM_CHANNELS_FIELD, len(value)), tool_class))
+        elif field_type == 'bytes':
+            length = values.get(field_name + '_length', 0)
+            if len(value) != length:
+                raise ValueError(f"Expected {length} bytes in {field_name}, got {len(value)}")
+            chunks.append(bytes(value))
+        else:
+            try:
+                field_struct = _field_struct(field_type)
+            except struct.error:
+                return False  # Not decoded by the parser either
+            chunks.append(field_struct.pack(value))
+    return True
+
+
+def _encode_system_time(value) -> bytes:
+    """Encode a date/time string like `2024-01-31 12:00:00` (or a dict of its parts) as SYSTEMTIME."""
+    if isinstance(value, Mapping):
+        parts = [value['year'], value['month'], value['day'], value['hour'], value['minute'], value['second']]
+    else:
+        parts = [int(part) for part in re.split(r'[- :]', value.strip())]
+    year, month, day, hour, minute, second = parts
+    try:
+        day_of_week = (datetime.date(year, month, day).weekday() + 1) % 7  # SYSTEMTIME weeks start on Sunday
+    except ValueError:
+        day_of_week = 0
+    return SystemTimeStep.STRUCT.pack(year, month, day_of_week, day, hour, minute, second, 0)
+
+
+def _encode_spectrum(spectrum, num_channels: int, tool_class) -> bytes:
+    if len(spectrum) != num_channels:
+        raise ValueError(f"Spectrum of {len(spectrum)} channels does not match {num_channels} channels")
+    if hasattr(spectrum, 'astype'):
+        return spectrum.astype(SpectrumStep.DTYPES[tool_class.SPECTRUM_FORMAT], copy=False).tobytes()
+    return struct.pack(f'<{num_channels}{tool_class.SPECTRUM_FORMAT}', *spectrum)
+
+
+def encode_pdz(records, pdz_version: str = "pdz25") -> bytes:
+    """
+    Encode records into the bytes of a PDZ file.
+    :param records: dict | list Records keyed by record name as returned by `parse()`, or a list of
+        `(record_type, record)` in file order, e.g. to write several records of the same type
+    :param pdz_version: str "pdz25" or "pdz24". PDZ 24 files hold the File Header and XRF Spectrum, without record headers.
+    :return: bytes
+    """
+    tool_class = PDZTool.TOOLS.get(pdz_version)
+    if tool_class is None:
+        raise ValueError(f"Unknown PDZ version: {pdz_version}")
+
+    if isinstance(records, Mapping):
+        record_types = _record_types_by_name(tool_class)
+        try:
+            records = [(record_types[record_name], record) for record_name, record in records.items()]
+        except KeyError as e:
+            raise ValueError(f"Unknown record name of {pdz_version}: {e}") from None
+
+    chunks = []
+    for record_type, record in records:
+        block = encode_record(tool_class, record_type, record)
+        if pdz_version == "pdz25":
+            chunks.append(RECORD_HEADER.pack(record_type, len(block)))
+        chunks.append(block)
+    return b''.join(chunks)
+
+
+def write_pdz(file_path: str, records, pdz_version: str = "pdz25") -> str:
+    """Encode records with `encode_pdz` and write them to a PDZ file, returning its path."""
+    with open(file_path, 'wb') as f:
+        f.write(encode_pdz(records, pdz_version=pdz_version))
+    return file_path
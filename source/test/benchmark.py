@@ -0,0 +1,282 @@
+"""
+Benchmarks of reading, parsing and saving PDZ files and of the GUI's output predictions, over corpora of PDZ files.
+
+Each benchmark reports the best wall time of `--repeat` runs, the throughput in MB/s (of PDZ input) and files/s,
+and the peak of memory allocated during a separate run traced with `tracemalloc`. Results are saved to
+`test/benchmark_results/<machine>/<commit>.json`, so runs of different commits on one machine can be compared.
+
+Run from `source`:
+    python test/benchmark.py
+    python test/benchmark.py --corpus small medium --bench parse save_csv
+    python test/benchmark.py --compare <commit>   # Ratios to the results stored for another commit
+    python test/benchmark.py --corpus large --n-files 1000000 --phases 3
+    python test/benchmark.py --packets 50 --bench parse stack_packets
+    python test/benchmark.py --corpus-dir <dir>   # A directory of your own PDZ files instead of the generated corpora
+
+Corpora are synthetic PDZ files from `pdz_tool_extended.synthetic`, with 3 images like the example file.
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+from pdz_tool_extended.pdz_tool import PDZTool
+from pdz_tool_extended.synthetic import generate_corpus
+from paths import DirectoryIndex
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(TEST_DIR, 'benchmark_results')
+
+# { corpus name: number of files }
+CORPORA = {
+    "small": 10,
+    "medium": 100,
+    "large": 1000,
+}
+
+
+def open_tools(file_paths: list, parse: bool = False):
+    tools = []
+    for file_path in file_paths:
+        pdz_tool = PDZTool(file_path)
+        if parse:
+            pdz_tool.parse()
+        tools.append(pdz_tool)
+    return tools
+
+
+def headless_gui(file_paths: list, pdz_tools: list):
+    """
+    Get a `PdzToolGui` with only the state of its output predictions, so they run without a display.
+    """
+    from interfaces import PdzToolGui
+    gui = object.__new__(PdzToolGui)
+    gui._csv_suffix = '.pdz'
+    gui._image_suffix = '-'
+    gui._image_record_name = 'Image Details'
+    gui._extensions = ["csv", "jpeg"]
+    gui._directory_index = DirectoryIndex()
+    gui._view_model = None
+    gui._pdz_file_paths = file_paths
+    gui._pdz_tools = pdz_tools
+    return gui
+
+
+# Setups of the benchmarks take the file paths of the corpus and an output directory, and return the function to time
+def setup_get_record_types(file_paths, output_dir):
+    tools = open_tools(file_paths)
+    return lambda: [pdz_tool.get_record_types() for pdz_tool in tools]
+
+
+def setup_parse(file_paths, output_dir):
+    def run():
+        for file_path in file_paths:
+            with PDZTool(file_path) as pdz_tool:
+                pdz_tool.parse()
+    return run
+
+
+def setup_stack_packets(file_paths, output_dir):
+    tools = open_tools(file_paths)
+    return lambda: [pdz_tool.stack_packets() for pdz_tool in tools]
+
+
+def setup_save_csv(file_paths, output_dir):
+    tools = open_tools(file_paths, parse=True)
+    return lambda: [pdz_tool.save_csv(output_dir=output_dir) for pdz_tool in tools]
+
+
+def setup_save_json(file_paths, output_dir):
+    tools = open_tools(file_paths, parse=True)
+    return lambda: [pdz_tool.save_json(output_dir=output_dir) for pdz_tool in tools]
+
+
+def setup_save_images(file_paths, output_dir):
+    tools = open_tools(file_paths, parse=True)
+    return lambda: [pdz_tool.save_images(output_dir=output_dir) for pdz_tool in tools]
+
+
+def setup_gui_predicted_output_filenames(file_paths, output_dir):
+    gui = headless_gui(file_paths, open_tools(file_paths, parse=True))
+    return gui.compute_predicted_output_filenames
+
+
+def setup_gui_exists_output_filenames(file_paths, output_dir):
+    gui = headless_gui(file_paths, open_tools(file_paths, parse=True))
+    predicted_filenames = gui.compute_predicted_output_filenames()
+
+    def run():
+        gui._directory_index.invalidate()  # List the directories again, as after opening files
+        return gui.compute_exists_output_filenames(predicted_filenames)
+    return run
+
+
+BENCHMARKS = {
+    "get_record_types": setup_get_record_types,
+    "parse": setup_parse,
+    "stack_packets": setup_stack_packets,
+    "save_csv": setup_save_csv,
+    "save_json": setup_save_json,
+    "save_images": setup_save_images,
+    "gui_predicted_output_filenames": setup_gui_predicted_output_filenames,
+    "gui_exists_output_filenames": setup_gui_exists_output_filenames,
+}
+
+
+def has_packets(file_path: str) -> bool:
+    with PDZTool(file_path) as pdz_tool:
+        return any(record['record_name'] == 'Raw XRF Spectrum Packet' for record in pdz_tool.record_types)
+
+
+# Filters of the files of a corpus for the benchmarks that only apply to some files; the throughput is of those files
+FILE_FILTERS = {
+    "stack_packets": has_packets,
+}
+
+
+def run_benchmark(setup, file_paths: list, repeat: int):
+    """
+    Time the function of a setup over a corpus.
+    :return: dict {"seconds": best wall time, "mb_per_s", "files_per_s", "peak_mib": peak of traced memory,
+        "files": number of files}
+    """
+    n_bytes = sum(os.path.getsize(file_path) for file_path in file_paths)
+    with tempfile.TemporaryDirectory() as output_dir:
+        run = setup(file_paths, output_dir)
+
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    seconds = min(times)
+    return {
+        "seconds": seconds,
+        "mb_per_s": n_bytes / 1e6 / seconds,
+        "files_per_s": len(file_paths) / seconds,
+        "peak_mib": peak / 1024**2,
+        "files": len(file_paths),
+    }
+
+
+def get_commit():
+    """Short hash of the checked out commit, with `-dirty` if tracked files are modified."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=TEST_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=TEST_DIR).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ('-dirty' if dirty else '')
+
+
+def results_path(commit: str):
+    return os.path.join(RESULTS_DIR, platform.node() or "machine", f'{commit}.json')
+
+
+def print_results(results: dict, baseline: dict = None):
+    header = f"{'corpus':<8} {'benchmark':<32} {'seconds':>10} {'MB/s':>10} {'files/s':>11} {'peak MiB':>9}"
+    if baseline is not None:
+        header += f" {'speedup':>8}"
+    print(header)
+    for corpus_name, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            line = (f"{corpus_name:<8} {name:<32} {result['seconds']:>10.4f} {result['mb_per_s']:>10.1f} "
+                    f"{result['files_per_s']:>11.1f} {result['peak_mib']:>9.2f}")
+            if baseline is not None:
+                baseline_result = baseline.get(corpus_name, {}).get(name)
+                speedup = baseline_result['seconds'] / result['seconds'] if baseline_result else None
+                line += f" {speedup:>7.2f}x" if speedup else f" {'-':>8}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the PDZ Tool.")
+    parser.add_argument('--corpus', nargs='+', default=list(CORPORA), choices=list(CORPORA), help='Corpora to run on')
+    parser.add_argument('--bench', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS), help='Benchmarks to run')
+    parser.add_argument('--corpus-dir', type=str, default=None, help='Run on the PDZ files of this directory instead')
+    parser.add_argument('--n-files', type=int, default=None, help='Number of files of the corpora, instead of their default')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic corpora')
+    parser.add_argument('--channels', type=int, default=2048, help='Channels of the synthetic spectra')
+    parser.add_argument('--phases', type=int, default=1, help='XRF Spectrum records per synthetic file')
+    parser.add_argument('--images', type=int, default=3, help='Images per synthetic file')
+    parser.add_argument('--image-size', type=int, default=20000, help='Bytes per synthetic image')
+    parser.add_argument('--trace-log-length', type=int, default=0, help='Characters of the Trace Log of synthetic files')
+    parser.add_argument('--results', type=int, default=20, help='Calculated Results Details (elements) per synthetic file')
+    parser.add_argument('--packets', type=int, default=0, help='Raw XRF Spectrum Packets per phase of synthetic files')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs of each benchmark; the best is kept')
+    parser.add_argument('--compare', type=str, default=None, help='Commit whose stored results to compare with')
+    parser.add_argument('--no-save', action='store_true', help='Do not store the results')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(results_path(args.compare)) as f:
+            baseline = json.load(f)['results']
+
+    corpus_options = {
+        "channels": args.channels, "phases": args.phases, "images": args.images, "image_size": args.image_size,
+        "trace_log_length": args.trace_log_length, "results": args.results, "packets": args.packets,
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.corpus_dir:
+            corpora = {"custom": sorted(glob.glob(os.path.join(args.corpus_dir, '*.pdz')))}
+        else:
+            corpora = {}
+            for corpus_name in args.corpus:
+                n_files = args.n_files or CORPORA[corpus_name]
+                print(f"Generating {corpus_name} corpus of {n_files} files ...")
+                corpora[corpus_name] = generate_corpus(os.path.join(temp_dir, corpus_name), n_files, seed=args.seed,
+                                                       **corpus_options)
+
+        for corpus_name, file_paths in corpora.items():
+            results[corpus_name] = {}
+            for name in args.bench:
+                bench_file_paths = list(filter(FILE_FILTERS[name], file_paths)) if name in FILE_FILTERS else file_paths
+                if not bench_file_paths:
+                    print(f"Skipping {name} on {corpus_name}: no files apply")
+                    continue
+                print(f"Running {name} on {corpus_name} ({len(bench_file_paths)} files) ...")
+                results[corpus_name][name] = run_benchmark(BENCHMARKS[name], bench_file_paths, args.repeat)
+
+    print()
+    print_results(results, baseline)
+
+    if not args.no_save:
+        commit = get_commit()
+        output_file = results_path(commit)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        report = {
+            "commit": commit,
+            "machine": platform.node(),
+            "python": platform.python_version(),
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "repeat": args.repeat,
+            "corpus": args.corpus_dir or corpus_options,
+            "results": results,
+        }
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults saved to {output_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import `pdz_tool_extended` from `source`, whichever directory pytest is run from
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
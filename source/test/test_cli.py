@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import pytest
+
+from pdz_tool_extended.cli import collect_pdz_files, get_output_dirs, parse_pdz_files
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    """Files of the same name in nested directories: x/s.pdz, y/s.pdz and y/z/s.pdz."""
+    for directory in ('x', 'y', os.path.join('y', 'z')):
+        os.makedirs(tmp_path / 'in' / directory)
+        shutil.copy(EXAMPLE_PDZ25, tmp_path / 'in' / directory / 's.pdz')
+    return tmp_path / 'in'
+
+
+def test_output_dirs_mirror_inputs(tmp_path, input_dir):
+    roots = {}
+    file_paths = collect_pdz_files([str(input_dir)], recursive=True, roots=roots)
+    output_dir = str(tmp_path / 'out')
+    output_dirs = get_output_dirs(file_paths, output_dir, roots)
+    assert sorted(output_dirs.values()) == [os.path.join(output_dir, 'x'), os.path.join(output_dir, 'y'),
+                                            os.path.join(output_dir, 'y', 'z')]
+
+    failures = parse_pdz_files(file_paths, output_dir, 'csv', output_dirs=output_dirs)
+    assert failures == {}
+    for file_path in file_paths:
+        assert os.path.exists(os.path.join(output_dirs[file_path], 's_xrf_spectrum.csv'))
+
+
+def test_output_dirs_of_glob_pattern(tmp_path, input_dir):
+    roots = {}
+    file_paths = collect_pdz_files([os.path.join(str(input_dir), '*', 's.pdz')], roots=roots)
+    output_dirs = get_output_dirs(file_paths, str(tmp_path / 'out'), roots)
+    assert sorted(output_dirs.values()) == [str(tmp_path / 'out' / 'x'), str(tmp_path / 'out' / 'y')]
+
+
+def test_output_dirs_conflict(tmp_path, input_dir):
+    roots = {}
+    file_paths = collect_pdz_files([str(input_dir / 'x' / 's.pdz'), str(input_dir / 'y' / 's.pdz')], roots=roots)
+    with pytest.raises(ValueError, match="same outputs"):
+        get_output_dirs(file_paths, str(tmp_path / 'out'), roots)
@@ -0,0 +1,62 @@
+import struct
+
+import pytest
+
+from pdz_tool_extended import PDZTool, export_corpus, results_matrix
+from pdz_tool_extended.synthetic import generate_corpus
+from test_parse_plan import make_pdz24
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def test_export_spectra_of_all_phases(tmp_path):
+    file_paths = generate_corpus(str(tmp_path / 'in'), 3, phases=3, channels=64)
+    output_dir = tmp_path / 'out' / 'tables'  # Created by the export
+    assert export_corpus(file_paths, str(output_dir), row_group_size=2) == {}
+
+    spectra = pq.read_table(output_dir / 'spectra.parquet')
+    assert spectra.num_rows == 9
+    assert spectra['phase'].to_pylist() == [1, 2, 3] * 3
+    with PDZTool(file_paths[1]) as pdz_tool:
+        phases = pdz_tool.parse_records('XRF Spectrum')
+    assert spectra['spectrum_data'].to_pylist()[3:6] == [phase['spectrum_data'] for phase in phases]
+    assert pq.read_table(output_dir / 'xrf_instrument.parquet').num_rows == 3
+
+
+def test_export_signed_pdz24_counts(tmp_path):
+    file_path = tmp_path / 'pdz24.pdz'
+    file_path.write_bytes(make_pdz24())
+    assert export_corpus([str(file_path)], str(tmp_path / 'out')) == {}
+    assert min(pq.read_table(tmp_path / 'out' / 'spectra.parquet')['spectrum_data'][0].as_py()) < 0
+
+
+def truncate_last_record(file_path: str, record_name: str, length: int):
+    """Cut the last record named `record_name` of a PDZ 25 file to its first `length` bytes."""
+    with PDZTool(file_path) as pdz_tool:
+        record = [record for record in pdz_tool.record_types if record['record_name'] == record_name][-1]
+        pdz_bytes = bytes(pdz_tool.pdz_bytes)
+        start, end = record['offset'], record['offset'] + len(record['bytes'])
+    header = struct.pack('<HI', record['record_type'], length)
+    with open(file_path, 'wb') as f:
+        f.write(pdz_bytes[:start - len(header)] + header + pdz_bytes[start:start + length] + pdz_bytes[end:])
+
+
+def test_results_matrix(tmp_path):
+    file_paths = generate_corpus(str(tmp_path), 3, results=5)
+    truncate_last_record(file_paths[1], 'Calculated Results Details', 20)  # Without 'error'
+    missing_path = str(tmp_path / 'missing.pdz')
+
+    matrix = results_matrix(file_paths + [missing_path], fields=("result", "error"))
+    assert matrix["file"] == [file_paths[0], file_paths[2]]
+    assert list(matrix["failures"]) == [file_paths[1], missing_path]
+    assert "error" in matrix["failures"][file_paths[1]]
+    assert matrix["result"].shape == (2, len(matrix["element"]))
+    for row, file_path in enumerate(matrix["file"]):
+        with PDZTool(file_path) as pdz_tool:
+            stacked = pdz_tool.stack_results()
+        columns = [list(matrix["atomic_number"]).index(atomic_number) for atomic_number in stacked['atomic_number']]
+        assert list(matrix["result"][row, columns]) == list(stacked['result'])
+        assert list(matrix["error"][row, columns]) == list(stacked['error'])
+
+    # The truncated file has all the other fields
+    assert results_matrix([file_paths[1]], fields=("result",))["failures"] == {}
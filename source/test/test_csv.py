@@ -0,0 +1,66 @@
+import csv
+import io
+import os
+
+import pytest
+
+from pdz_tool_extended import PDZTool
+from pdz_tool_extended.utils import flatten_system_date_time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+def reference_csv(record_data: dict, include_channel_start_kev: bool = False) -> str:
+    """The CSV written row by row with `csv.writer`, as `save_csv` did before it built the file at once."""
+    buffer = io.StringIO(newline='')
+    csvwriter = csv.writer(buffer)
+    for key, value in record_data.items():
+        if key == "acquisition_date_time":
+            csvwriter.writerow([key, flatten_system_date_time(value)])
+        elif key != "spectrum_data":
+            csvwriter.writerow([key, value])
+    spectrum_data = record_data["spectrum_data"]
+    if include_channel_start_kev:
+        csvwriter.writerow(['channel_number', 'channel_start_kev (calculated)', 'channel_count'])
+        channel_start_kev = record_data.get("channel_start", 0)/1000
+        kev_per_channel = record_data.get("ev_per_channel", 0)/1000
+        for index, count in enumerate(spectrum_data, start=1):
+            csvwriter.writerow([index, channel_start_kev + (index - 1)*kev_per_channel, count])
+    else:
+        csvwriter.writerow(['channel_number', 'channel_count'])
+        for index, count in enumerate(spectrum_data, start=1):
+            csvwriter.writerow([index, count])
+    return buffer.getvalue()
+
+
+def read_text(file_path: str) -> str:
+    with open(file_path, newline='') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('include_channel_start_kev', [False, True])
+@pytest.mark.parametrize('spectrum_array', [False, True])
+def test_save_csv_matches_reference(tmp_path, include_channel_start_kev, spectrum_array):
+    if spectrum_array:
+        pytest.importorskip('numpy')
+    with PDZTool(EXAMPLE_PDZ25, spectrum_array=spectrum_array) as pdz_tool:
+        pdz_tool.parse()
+        output_file = pdz_tool.save_csv(output_dir=str(tmp_path), include_channel_start_kev=include_channel_start_kev)
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        expected = reference_csv(pdz_tool.parse()['XRF Spectrum'], include_channel_start_kev)
+    assert output_file == str(tmp_path / 'pdz25_example_images_xrf_spectrum.csv')
+    assert read_text(output_file) == expected
+
+
+def test_save_csv_options(tmp_path):
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        parsed_data = pdz_tool.parse()
+        output_file = pdz_tool.save_csv(record_names=['File Header', 'XRF Instrument'], output_dir=str(tmp_path),
+                                        delimiter=';', float_precision=2)
+    assert os.path.basename(output_file) == 'pdz25_example_images_multiple_records.csv'
+    rows = dict(row for row in csv.reader(io.StringIO(read_text(output_file)), delimiter=';'))
+    assert rows['file_type_id'] == parsed_data['File Header']['file_type_id']
+    for key, value in parsed_data['XRF Instrument'].items():
+        if isinstance(value, float):
+            assert rows[key] == f"{value:.2f}"
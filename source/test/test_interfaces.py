@@ -0,0 +1,94 @@
+"""Tests of the state of `PdzToolGui` that does not need a display: the GUI is made without its widgets."""
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('tkinter')
+from interfaces import PdzToolGui
+from paths import DirectoryIndex
+from pdz_tool_extended import PDZTool
+from pdz_tool_extended.parse_cache import ParseCache
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+def headless_gui(file_paths: list, pdz_tools: list):
+    gui = object.__new__(PdzToolGui)
+    gui._csv_suffix = '.pdz'
+    gui._image_suffix = '-'
+    gui._image_record_name = 'Image Details'
+    gui._extensions = ["csv", "jpeg"]
+    gui._directory_index = DirectoryIndex()
+    gui._view_model = None
+    gui._parse_cache = None
+    gui.pdz_file_paths = file_paths
+    gui.pdz_tools = pdz_tools
+    return gui
+
+
+@pytest.fixture
+def file_paths(tmp_path):
+    file_paths = []
+    for directory in ('b', 'a'):
+        os.makedirs(tmp_path / directory)
+        file_paths.append(str(tmp_path / directory / 's.pdz'))
+        shutil.copy(EXAMPLE_PDZ25, file_paths[-1])
+    return file_paths
+
+
+def open_gui(file_paths):
+    gui = headless_gui(file_paths, [])
+    pdz_tools = [PDZTool(file_path) for file_path in gui.pdz_file_paths]
+    for pdz_tool in pdz_tools:
+        pdz_tool.parse()
+    gui.pdz_tools = pdz_tools
+    return gui
+
+
+def test_view_model_is_memoized(file_paths):
+    gui = open_gui(file_paths)
+    assert gui.pdz_file_paths == sorted(file_paths)
+    view_model = gui.view_model
+    assert gui.view_model is view_model
+    assert [folder.directory for folder in gui.pdz_folders] == [os.path.dirname(path) for path in sorted(file_paths)]
+    assert view_model["predicted_filenames"][0] == {"csv": ['s.pdz.csv'], "jpeg": ['s-0.jpeg', 's-1.jpeg', 's-2.jpeg']}
+    assert view_model["n_to_extract"] == {"csv": 2, "jpeg": 6}
+    assert view_model["n_exists"] == {"csv": 0, "jpeg": 0}
+
+    gui.pdz_tools = gui.pdz_tools[:1]
+    assert gui.view_model is not view_model
+    assert gui.view_model["n_to_extract"] == {"csv": 1, "jpeg": 3}
+
+
+def test_view_model_after_saving(file_paths):
+    gui = open_gui(file_paths)
+    assert not gui.view_model["all_exist"]["csv"]
+    for file_path in file_paths:
+        open(os.path.join(os.path.dirname(file_path), 's.pdz.csv'), 'w').close()
+    assert gui.view_model["n_exists"]["csv"] == 0  # Memoized until invalidated, as after saving
+
+    gui._directory_index.invalidate()
+    gui.invalidate_view_model()
+    assert gui.view_model["n_exists"] == {"csv": 2, "jpeg": 0}
+    assert gui.view_model["all_exist"] == {"csv": True, "jpeg": False}
+
+
+def test_open_file_decodes_images_only(file_paths):
+    gui = headless_gui([], [])
+    pdz_tool = gui.open_file(file_paths[0])
+    assert pdz_tool.parsed_data._parsed.keys() == {'Image Details'}  # The rest is decoded when first needed
+    assert 'image_offset' in pdz_tool.parsed_data['Image Details']['images'][0]
+    with PDZTool(file_paths[0]) as expected_tool:
+        expected_tool.parse()
+        assert pdz_tool.get_images_bytes() == expected_tool.get_images_bytes()
+
+
+def test_open_file_from_cache(tmp_path, file_paths):
+    gui = headless_gui([], [])
+    gui._parse_cache = ParseCache(str(tmp_path / 'cache'))
+    opened = gui.open_file(file_paths[0])
+    cached = gui.open_file(file_paths[0])
+    assert dict(cached.parsed_data) == dict(opened.parsed_data)
+    assert cached.get_images_bytes() == opened.get_images_bytes()
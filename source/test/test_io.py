@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from pdz_tool_extended import PDZTool
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+def open_example(io):
+    if io == "buffer":
+        with open(EXAMPLE_PDZ25, 'rb') as f:
+            return PDZTool.from_buffer(bytearray(f.read()), name=EXAMPLE_PDZ25, image_refs=True)
+    return PDZTool(EXAMPLE_PDZ25, io=io, image_refs=True)
+
+
+@pytest.fixture(scope='module')
+def expected():
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        return dict(pdz_tool.parse()), pdz_tool.get_images_bytes()
+
+
+@pytest.mark.parametrize('io', ["read", "mmap", "buffer"])
+def test_parsed_data_after_close(expected, io):
+    with open_example(io) as pdz_tool:
+        parsed_data = dict(pdz_tool.parse())
+    assert parsed_data.keys() == expected[0].keys()
+    assert parsed_data['XRF Spectrum'] == expected[0]['XRF Spectrum']
+
+
+def test_read_io_works_after_close(expected, tmp_path):
+    with open_example("read") as pdz_tool:
+        pdz_tool.parse(lazy=True)
+    assert dict(pdz_tool.parsed_data)['XRF Spectrum'] == expected[0]['XRF Spectrum']
+    assert pdz_tool.get_images_bytes() == expected[1]
+    pdz_tool.save_images(output_dir=str(tmp_path))
+    with open(tmp_path / 'pdz25_example_images_0.jpeg', 'rb') as f:
+        assert f.read() == expected[1][0]
+
+
+@pytest.mark.parametrize('io', ["mmap", "buffer"])
+def test_released_buffer_raises_after_close(io):
+    with open_example(io) as pdz_tool:
+        pdz_tool.parse(lazy=True)
+        pdz_tool.parsed_data['File Header']
+    assert 'file_type_id' in pdz_tool.parsed_data['File Header']  # Decoded before closing
+    with pytest.raises(ValueError, match="is closed"):
+        pdz_tool.parsed_data['Image Details']
+
+
+@pytest.mark.parametrize('io', ["mmap", "buffer"])
+def test_image_refs_raise_after_close(io):
+    with open_example(io) as pdz_tool:
+        pdz_tool.parse()
+    with pytest.raises(ValueError, match="is closed"):
+        pdz_tool.get_images_bytes()
+
+
+def test_handed_over_buffer_can_resize_after_close():
+    with open(EXAMPLE_PDZ25, 'rb') as f:
+        buffer = bytearray(f.read())
+    with PDZTool.from_buffer(buffer) as pdz_tool:
+        pdz_tool.parse()
+    buffer.clear()  # BufferError if a view were still exported
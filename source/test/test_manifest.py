@@ -0,0 +1,100 @@
+import os
+import shutil
+
+import pytest
+
+from pdz_tool_extended.cli import parse_pdz_files
+from pdz_tool_extended.manifest import BatchManifest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    file_path = str(tmp_path / 'x.pdz')
+    shutil.copy(EXAMPLE_PDZ25, file_path)
+    return file_path
+
+
+def run_incremental(file_path, output_dir, **options):
+    return parse_pdz_files([file_path], output_dir, 'all', manifest=True, **options)
+
+
+def recorded_outputs(output_dir):
+    with BatchManifest(output_dir) as manifest:
+        return {file_path: sorted(entry['outputs']) for file_path, entry in manifest.entries.items()}
+
+
+def test_incremental_skips_unchanged(tmp_path, file_path, capsys):
+    output_dir = str(tmp_path / 'out')
+    assert run_incremental(file_path, output_dir) == {}
+    assert recorded_outputs(output_dir) == {file_path: [os.path.join(output_dir, 'x.json'),
+                                                        os.path.join(output_dir, 'x_xrf_spectrum.csv')]}
+    capsys.readouterr()
+
+    assert run_incremental(file_path, output_dir) == {}
+    assert "Skipping 1 unchanged PDZ file" in capsys.readouterr().out
+
+    os.utime(file_path, ns=(0, 0))  # Touched, same content
+    assert run_incremental(file_path, output_dir) == {}
+    assert "Skipping 1 unchanged PDZ file" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('change', ['input', 'missing output', 'options'])
+def test_incremental_processes_changed(tmp_path, file_path, capsys, change):
+    output_dir = str(tmp_path / 'out')
+    assert run_incremental(file_path, output_dir) == {}
+    options = {}
+    if change == 'input':
+        with open(file_path, 'ab') as f:
+            f.write(b'\0')
+    elif change == 'missing output':
+        os.remove(os.path.join(output_dir, 'x_xrf_spectrum.csv'))
+    else:
+        options = {'json_options': {'indent': None}}
+    capsys.readouterr()
+
+    assert run_incremental(file_path, output_dir, **options) == {}
+    assert "Skipping" not in capsys.readouterr().out
+    assert os.path.exists(os.path.join(output_dir, 'x_xrf_spectrum.csv'))
+
+
+def test_incremental_verify_outputs(tmp_path, file_path, capsys):
+    output_dir = str(tmp_path / 'out')
+    assert run_incremental(file_path, output_dir) == {}
+    csv_path = os.path.join(output_dir, 'x_xrf_spectrum.csv')
+    with open(csv_path, 'r+b') as f:
+        f.write(b'X')  # Edited in place, same size
+    capsys.readouterr()
+
+    assert run_incremental(file_path, output_dir) == {}
+    assert "Skipping 1 unchanged PDZ file" in capsys.readouterr().out
+    assert run_incremental(file_path, output_dir, verify_outputs=True) == {}
+    assert "Skipping" not in capsys.readouterr().out
+    with open(csv_path, 'rb') as f:
+        assert f.read(1) != b'X'
+
+
+def test_failed_output_is_not_recorded(tmp_path, file_path):
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(os.path.join(output_dir, 'x.json'))  # The JSON cannot be written
+    failures = run_incremental(file_path, output_dir)
+    assert list(failures) == [file_path]
+    assert recorded_outputs(output_dir) == {}
+
+    os.rmdir(os.path.join(output_dir, 'x.json'))
+    assert run_incremental(file_path, output_dir) == {}
+    assert os.path.isfile(os.path.join(output_dir, 'x.json'))
+
+
+def test_incremental_restores_sidecar_images(tmp_path, file_path):
+    output_dir = str(tmp_path / 'out')
+    options = {'json_options': {'binary': 'sidecar'}}
+    assert run_incremental(file_path, output_dir, **options) == {}
+    image_path = os.path.join(output_dir, 'x_0.jpeg')
+    assert image_path in recorded_outputs(output_dir)[file_path]
+
+    os.remove(image_path)
+    assert run_incremental(file_path, output_dir, **options) == {}
+    assert os.path.exists(image_path)
@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+
+from pdz_tool_extended import PDZStreamReader, PDZTool
+from pdz_tool_extended.utils import copy_file_range_to
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+def reference_images(pdz_tool) -> list:
+    return json.loads(''.join(pdz_tool.iter_json(binary="reference")))['Image Details']['images']
+
+
+@pytest.mark.parametrize('parse_options', [{}, {'lazy': True}])
+def test_json_reference_without_image_refs(parse_options):
+    with PDZTool(EXAMPLE_PDZ25, image_refs=True) as pdz_tool:
+        pdz_tool.parse()
+        expected = reference_images(pdz_tool)
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        pdz_tool.parse(**parse_options)
+        assert reference_images(pdz_tool) == expected
+
+    with open(EXAMPLE_PDZ25, 'rb') as f:
+        pdz_bytes = f.read()
+    for image in expected:
+        image_bytes = pdz_bytes[image['image_offset']:image['image_offset'] + image['image_length']]
+        assert image_bytes[:2] == b'\xff\xd8' and image_bytes[-2:] == b'\xff\xd9'
+
+
+def test_json_reference_of_stream():
+    with PDZTool(EXAMPLE_PDZ25, image_refs=True) as pdz_tool:
+        pdz_tool.parse()
+        expected = reference_images(pdz_tool)
+    with open(EXAMPLE_PDZ25, 'rb') as f:
+        stream_reader = PDZStreamReader(f)
+        stream_reader.parse()
+    assert reference_images(stream_reader) == expected
+
+
+def test_save_json_raises(tmp_path):
+    os.makedirs(tmp_path / 'pdz25_example_images.json')  # The JSON cannot be written
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        pdz_tool.parse()
+        with pytest.raises(OSError):
+            pdz_tool.save_json(output_dir=str(tmp_path))
+
+
+def test_save_json_sidecar_files(tmp_path):
+    sidecar_files = []
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        pdz_tool.parse()
+        images_bytes = pdz_tool.get_images_bytes()
+        output_file = pdz_tool.save_json(output_dir=str(tmp_path), binary="sidecar", sidecar_files=sidecar_files)
+    with open(output_file) as f:
+        image_names = [image['image'] for image in json.load(f)['Image Details']['images']]
+    assert sidecar_files == [str(tmp_path / image_name) for image_name in image_names]
+    for sidecar_file, image_bytes in zip(sidecar_files, images_bytes):
+        with open(sidecar_file, 'rb') as f:
+            assert f.read() == bytes(image_bytes)
+
+
+@pytest.mark.parametrize('options', [{}, {'io': "mmap"}, {'records': ['Image Details']}])
+def test_save_images_from_offsets(tmp_path, options):
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        pdz_tool.parse()
+        images_bytes = pdz_tool.get_images_bytes()
+    with PDZTool(EXAMPLE_PDZ25, image_refs=True, **options) as pdz_tool:
+        pdz_tool.parse()
+        assert all('image' not in image for image in pdz_tool.parsed_data['Image Details']['images'])
+        assert pdz_tool.get_images_bytes() == images_bytes
+        pdz_tool.save_images(output_dir=str(tmp_path))
+    assert len(images_bytes) == 3
+    for i, image_bytes in enumerate(images_bytes):
+        with open(tmp_path / f'pdz25_example_images_{i}.jpeg', 'rb') as f:
+            assert f.read() == image_bytes
+
+
+def test_copy_file_range_to(tmp_path):
+    src_path = tmp_path / 'src'
+    src_path.write_bytes(bytes(range(256)) * 100)
+    copy_file_range_to(str(src_path), 1000, 5000, str(tmp_path / 'dst'), chunk_size=7)
+    assert (tmp_path / 'dst').read_bytes() == src_path.read_bytes()[1000:6000]
+    with pytest.raises(ValueError, match="Insufficient bytes"):
+        copy_file_range_to(str(src_path), 25000, 1000, str(tmp_path / 'dst'))
@@ -0,0 +1,48 @@
+import pytest
+
+from pdz_tool_extended import PDZTool
+from pdz_tool_extended.synthetic import generate_records
+from pdz_tool_extended.writer import encode_pdz, write_pdz
+
+numpy = pytest.importorskip('numpy')
+
+PACKET_RECORD = 'Raw XRF Spectrum Packet'
+
+
+@pytest.fixture
+def packets_pdz(tmp_path):
+    records = generate_records(seed=3, channels=256, phases=2, packets=4)
+    file_path = str(tmp_path / 'packets.pdz')
+    write_pdz(file_path, records)
+    return file_path, [record for record_type, record in records if record_type == 4]
+
+
+def test_stack_packets_matches_field_by_field(packets_pdz):
+    file_path, packets = packets_pdz
+    with PDZTool(file_path) as pdz_tool:
+        stacked = pdz_tool.stack_packets()
+        parsed = pdz_tool.parse_records(PACKET_RECORD)
+
+    assert len(parsed) == len(packets) == 8
+    for field_name, column in stacked.items():
+        if field_name == 'spectra':
+            continue
+        values = [record[field_name] for record in parsed]
+        if column.dtype.kind == 'V':
+            assert [bytes(value) for value in column] == values
+        else:
+            assert column.tolist() == values, field_name
+    assert set(stacked) - {'spectra'} == set(parsed[0]) - {'spectrum_data'}
+    assert stacked['spectra'].tolist() == [packet['spectrum_data'] for packet in packets]
+
+
+def test_parse_keeps_packet_spectra_empty(packets_pdz):
+    file_path, _ = packets_pdz
+    with PDZTool(file_path) as pdz_tool:
+        assert pdz_tool.parse()[PACKET_RECORD]['spectrum_data'] == []
+
+
+def test_stack_packets_without_packets():
+    records = generate_records(seed=3, channels=16)
+    with pytest.raises(ValueError, match="No Raw XRF Spectrum Packet"):
+        PDZTool.from_buffer(encode_pdz(records)).stack_packets()
@@ -0,0 +1,38 @@
+import os
+import shutil
+
+from pdz_tool_extended import PDZTool
+from pdz_tool_extended.parse_cache import ParseCache
+from test_parse_plan import make_pdz24
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+def test_cache_hit_matches_parse(tmp_path, capsys):
+    cache = ParseCache(str(tmp_path / 'cache'), verbose=True)
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        expected = dict(pdz_tool.parse())
+    assert dict(cache.parse(EXAMPLE_PDZ25).parse()) == expected
+    assert "Parsing (not cached)" in capsys.readouterr().out
+    assert dict(cache.parse(EXAMPLE_PDZ25).parse()) == expected
+    assert "Parsing (not cached)" not in capsys.readouterr().out
+
+
+def test_cache_keys_selected_records(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    assert list(cache.parse(EXAMPLE_PDZ25, records=['XRF Spectrum']).parse()) == ['XRF Spectrum']
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        assert list(cache.parse(EXAMPLE_PDZ25).parse()) == pdz_tool.record_names
+    assert list(cache.parse(EXAMPLE_PDZ25, records=['File Header']).parse()) == ['File Header']
+
+
+def test_cache_changed_file(tmp_path):
+    file_path = str(tmp_path / 'x.pdz')
+    shutil.copy(EXAMPLE_PDZ25, file_path)
+    cache = ParseCache(str(tmp_path / 'cache'))
+    assert cache.parse(file_path).pdz_version == "pdz25"
+
+    with open(file_path, 'wb') as f:
+        f.write(make_pdz24())
+    assert cache.parse(file_path).pdz_version == "pdz24"
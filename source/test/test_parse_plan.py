@@ -0,0 +1,102 @@
+"""
+Parsing with the compiled parse plans, compared to the results of the field-by-field parser they replaced,
+stored in `data/parse_expected.json` (bytes as their length and SHA-256).
+"""
+import hashlib
+import json
+import os
+import struct
+
+import pytest
+
+from pdz_tool_extended.parse_plan import InvalidStep, compile_record
+from pdz_tool_extended.pdz_tool import PDZTool
+from pdz_tool_extended.pdz25_tool import PDZ25Tool
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+EXPECTED_FILE = os.path.join(TEST_DIR, 'data', 'parse_expected.json')
+
+# {record name: block lengths} of the example records parsed truncated
+TRUNCATED_RECORDS = {
+    'XRF Instrument': [2, 7, 40, 150, 217],
+    'XRF Spectrum': [2, 7, 40, 61, 100, 8405],
+    'Calculated Results': [5, 29],
+    'Image Details': [3, 30, 20000, 64514],
+}
+
+
+def make_pdz24(num_channels: int = 16) -> bytes:
+    """A PDZ 24 file: the File Header, then the XRF Spectrum with signed counts."""
+    return (struct.pack('<Hi', 257, 1)
+            + struct.pack('<h', num_channels) + bytes(42) + struct.pack('<d', 20.0) + bytes(104)
+            + struct.pack('<ff', 40.0, 10.0) + bytes(184) + struct.pack('<f', 30.0)
+            + struct.pack(f'<{num_channels}i', *range(-num_channels // 2, num_channels - num_channels // 2)))
+
+
+def normalize(value):
+    """Make parsed data comparable to its JSON: tuples as lists and bytes as their length and hash."""
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"length": len(value), "sha256": hashlib.sha256(value).hexdigest()}
+    return value
+
+
+@pytest.fixture(scope='module')
+def expected():
+    with open(EXPECTED_FILE) as f:
+        return json.load(f)
+
+
+def test_parse_pdz25_example(expected):
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        assert pdz_tool.pdz_version == "pdz25"
+        assert normalize(dict(pdz_tool.parse())) == expected["pdz25_example_images"]
+
+
+def test_parse_pdz24(tmp_path, expected):
+    file_path = tmp_path / 'synthetic.pdz'
+    file_path.write_bytes(make_pdz24())
+    with PDZTool(str(file_path)) as pdz_tool:
+        assert pdz_tool.pdz_version == "pdz24"
+        assert normalize(dict(pdz_tool.parse())) == expected["pdz24_synthetic"]
+
+
+def test_parse_lazy_matches_eager(expected):
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        assert normalize(dict(pdz_tool.parse(lazy=True))) == expected["pdz25_example_images"]
+
+
+@pytest.mark.parametrize('record_name, length', [
+    (record_name, length) for record_name, lengths in TRUNCATED_RECORDS.items() for length in lengths])
+def test_parse_truncated_record(expected, record_name, length):
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        record = next(record for record in pdz_tool.record_types if record['record_name'] == record_name)
+        block = bytes(record['bytes'])[:length]
+        parsed = pdz_tool.parse_record_type(record['record_type'], block, record['offset'])
+    assert normalize(parsed) == expected["truncated"][f"{record_name}:{length}"]
+
+
+class InvalidFieldTool(PDZ25Tool):
+    RECORDS = {
+        **PDZ25Tool.RECORDS,
+        25: {
+            "name": 'File Header',
+            "fields": [
+                ('file_type_id', 'wchar_t[5]'),
+                ('unknown', 'Z'),  # Not a struct format
+                ('instrument_type', 'I'),
+            ]
+        },
+    }
+
+
+def test_invalid_field_stops_record():
+    assert isinstance(compile_record(InvalidFieldTool, 25)[-2], InvalidStep)
+    with InvalidFieldTool(EXAMPLE_PDZ25) as pdz_tool:
+        record = pdz_tool.record_types[0]
+        parsed = pdz_tool.parse_record_type(record['record_type'], record['bytes'], record['offset'])
+    assert parsed == {'file_type_id': 'pdz25'}
@@ -0,0 +1,44 @@
+import os
+import random
+
+import pytest
+
+from paths import SCANDIR_MIN_PATHS, DirectoryIndex, create_folders, sort_paths_by_folder
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """Files in nested directories, one with enough files to be scanned, in shuffled order with a directory and missing files."""
+    counts = {'b': 3, 'a': 2, os.path.join('a', 'c'): SCANDIR_MIN_PATHS + 1, 'd': 0}
+    paths = []
+    for directory, count in counts.items():
+        os.makedirs(tmp_path / directory, exist_ok=True)
+        for i in range(count):
+            (tmp_path / directory / f'f{i}.pdz').write_bytes(b'')
+            paths.append(str(tmp_path / directory / f'f{i}.pdz'))
+    paths += [str(tmp_path / 'd'), str(tmp_path / 'a' / 'missing.pdz'), str(tmp_path / 'a' / 'c' / 'missing.pdz')]
+    random.Random(0).shuffle(paths)
+    return paths
+
+
+def test_create_folders_order_matches_sort_paths_by_folder(paths):
+    folders = create_folders(paths)
+    assert [folder.directory for folder in folders] == sorted({os.path.dirname(path) for path in paths if os.path.isfile(path)}
+                                                             | {path for path in paths if os.path.isdir(path)})
+    files = [os.path.join(folder.directory, filename) for folder in folders for filename in folder.filenames]
+    assert files == sort_paths_by_folder([path for path in paths if os.path.isfile(path)])
+
+
+def test_create_folders_empty_directory(tmp_path, paths):
+    folders = {folder.directory: folder.filenames for folder in create_folders(paths)}
+    assert folders[str(tmp_path / 'd')] == []
+    assert 'missing.pdz' not in folders[str(tmp_path / 'a')]
+
+def test_directory_index(tmp_path):
+    index = DirectoryIndex()
+    assert not index.exists(str(tmp_path), 'x.csv')
+    (tmp_path / 'x.csv').write_bytes(b'')
+    assert not index.exists(str(tmp_path), 'x.csv')  # Listed before the file was written
+    index.invalidate(str(tmp_path) + os.sep)
+    assert index.exists(str(tmp_path), 'x.csv')
+    assert not index.exists(str(tmp_path / 'missing'), 'x.csv')
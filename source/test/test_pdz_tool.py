@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from pdz_tool_extended import PDZTool
+from test_parse_plan import make_pdz24
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+@pytest.fixture(scope='module')
+def expected():
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        return dict(pdz_tool.parse())
+
+
+@pytest.mark.parametrize('io', ["read", "mmap"])
+def test_factory_io(expected, io):
+    with PDZTool(EXAMPLE_PDZ25, io=io) as pdz_tool:
+        assert pdz_tool.pdz_version == "pdz25"
+        assert dict(pdz_tool.parse()) == expected
+
+
+def test_from_buffer(expected):
+    with open(EXAMPLE_PDZ25, 'rb') as f:
+        pdz_bytes = f.read()
+    with PDZTool.from_buffer(pdz_bytes, name='x/y.pdz') as pdz_tool:
+        assert pdz_tool.pdz_file_name == 'y'
+        assert dict(pdz_tool.parse()) == expected
+    with PDZTool.from_buffer(make_pdz24()) as pdz_tool:
+        assert pdz_tool.pdz_version == "pdz24"
+
+
+@pytest.mark.parametrize('io', ["read", "mmap"])
+def test_factory_rejects_unknown_version(tmp_path, io):
+    file_path = tmp_path / 'unknown.pdz'
+    file_path.write_bytes(b'\x07\x00' + bytes(16))
+    with pytest.raises(ValueError, match="Unknown PDZ version"):
+        PDZTool(str(file_path), io=io)
+    with pytest.raises(ValueError, match="Unknown PDZ version"):
+        PDZTool(str(file_path), records=['XRF Spectrum'])
+    with pytest.raises(ValueError, match="Unknown PDZ version"):
+        PDZTool.from_buffer(file_path.read_bytes())
+
+
+def test_spectrum_array(tmp_path, expected):
+    numpy = pytest.importorskip('numpy')
+    with PDZTool(EXAMPLE_PDZ25, spectrum_array=True) as pdz_tool:
+        spectrum = pdz_tool.parse()['XRF Spectrum']
+    assert isinstance(spectrum['spectrum_data'], numpy.ndarray) and spectrum['spectrum_data'].dtype == numpy.uint32
+    assert spectrum['spectrum_data'].tolist() == expected['XRF Spectrum']['spectrum_data']
+    assert {**spectrum, 'spectrum_data': None} == {**expected['XRF Spectrum'], 'spectrum_data': None}
+
+    file_path = tmp_path / 'pdz24.pdz'
+    file_path.write_bytes(make_pdz24())
+    with PDZTool(str(file_path), spectrum_array=True) as pdz_tool:
+        spectrum_data = pdz_tool.parse()['XRF Spectrum']['spectrum_data']
+    assert spectrum_data.dtype == numpy.int32 and spectrum_data.min() < 0
+
+
+def test_selective_records(expected):
+    with PDZTool(EXAMPLE_PDZ25, records=['XRF Spectrum']) as pdz_tool:
+        assert pdz_tool.record_names == list(expected)  # All record headers are read
+        assert [record['record_name'] for record in pdz_tool.record_types if record['bytes'] is not None] == ['XRF Spectrum']
+        assert pdz_tool.parse() == {'XRF Spectrum': expected['XRF Spectrum']}
+        # Other records are read from the file when asked for
+        assert pdz_tool.parse(['File Header', 'Image Details']) == {
+            record_name: expected[record_name] for record_name in ('File Header', 'Image Details')}
+
+
+@pytest.mark.parametrize('options', [{}, {'records': ['XRF Spectrum', 'Image Details']}])
+def test_lazy_parsed_data(expected, options):
+    with PDZTool(EXAMPLE_PDZ25, **options) as pdz_tool:
+        parsed_data = pdz_tool.parse(lazy=True)
+        record_names = options.get('records', list(expected))
+        assert list(parsed_data) == record_names and len(parsed_data) == len(record_names)
+        assert 'XRF Spectrum' in parsed_data and 'Unknown' not in parsed_data
+        assert parsed_data._parsed == {}  # Nothing decoded by listing or membership
+
+        spectrum = parsed_data['XRF Spectrum']
+        assert spectrum == expected['XRF Spectrum']
+        assert parsed_data['XRF Spectrum'] is spectrum  # Decoded once
+        assert list(parsed_data._parsed) == ['XRF Spectrum']
+        assert parsed_data.to_dict() == {record_name: expected[record_name] for record_name in record_names}
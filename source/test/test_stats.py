@@ -0,0 +1,61 @@
+import logging
+import os
+
+from pdz_tool_extended import PDZTool
+from pdz_tool_extended.stats import ParseStats
+from pdz_tool_extended.utils import print_verbose
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+class Unformattable:
+    """Value that fails the test if it is formatted into a message."""
+    def __str__(self):
+        raise AssertionError("Formatted without being printed or logged")
+
+    __repr__ = __str__
+
+
+def test_print_verbose_prints(capsys):
+    print_verbose(True, "Parsed %s of %d", 'x', 2)
+    print_verbose(True, "100%")  # Without args, the message is not formatted
+    assert capsys.readouterr().out == "Parsed x of 2\n100%\n"
+
+
+def test_print_verbose_formats_lazily(capsys, caplog):
+    print_verbose(False, "Parsed %s", Unformattable())
+    assert capsys.readouterr().out == ""
+
+    with caplog.at_level(logging.DEBUG, logger='pdz_tool_extended'):
+        print_verbose(False, "Parsed %s of %d", 'x', 2)
+    assert caplog.messages == ["Parsed x of 2"]
+
+
+def test_parse_stats():
+    stats = ParseStats()
+    with PDZTool(EXAMPLE_PDZ25, stats=stats) as pdz_tool:
+        pdz_tool.parse()
+        record_types = pdz_tool.record_types
+    assert stats.n_files == 1
+    assert set(stats.records) == {record['record_name'] for record in record_types}
+    assert sum(record_stats['count'] for record_stats in stats.records.values()) == len(record_types)
+    assert stats.records['XRF Spectrum']['bytes'] == 8406
+
+    merged = ParseStats()
+    merged.merge(stats.to_dict())
+    merged.merge(stats.to_dict())
+    assert merged.n_files == 2
+    assert merged.records['XRF Spectrum']['count'] == 2 * stats.records['XRF Spectrum']['count']
+
+
+def test_parse_stats_trace_memory():
+    stats = ParseStats(trace_memory=True)
+    stats.start()
+    try:
+        with PDZTool(EXAMPLE_PDZ25, stats=stats) as pdz_tool:
+            pdz_tool.parse()
+    finally:
+        stats.stop()
+    assert stats.records['Image Details']['allocated_bytes'] > 0
+    assert 'XRF Spectrum' in stats.report()
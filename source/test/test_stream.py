@@ -0,0 +1,69 @@
+import io
+import os
+
+import pytest
+
+from pdz_tool_extended import PDZStreamReader, PDZTool
+from test_parse_plan import make_pdz24
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+class Pipe(io.RawIOBase):
+    """Unseekable stream returning at most `chunk_size` bytes per read, like a pipe or socket."""
+    def __init__(self, data: bytes, chunk_size: int = 1000):
+        self._data = io.BytesIO(data)
+        self._chunk_size = chunk_size
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        return self._data.read(self._chunk_size if n is None or n < 0 else min(n, self._chunk_size))
+
+
+@pytest.fixture(scope='module')
+def example():
+    with open(EXAMPLE_PDZ25, 'rb') as f:
+        pdz_bytes = f.read()
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        return pdz_bytes, dict(pdz_tool.parse())
+
+
+@pytest.mark.parametrize('make_stream', [io.BytesIO, Pipe])
+def test_stream_matches_tool(example, make_stream):
+    pdz_bytes, expected = example
+    stream_reader = PDZStreamReader(make_stream(pdz_bytes))
+    assert stream_reader.parse() == expected
+    assert stream_reader.pdz_version == "pdz25"
+    assert stream_reader.record_names == list(expected)
+
+
+def test_stream_pdz24(tmp_path):
+    file_path = tmp_path / 'pdz24.pdz'
+    file_path.write_bytes(make_pdz24())
+    with PDZTool(str(file_path)) as pdz_tool:
+        expected = dict(pdz_tool.parse())
+    assert PDZStreamReader(Pipe(make_pdz24(), chunk_size=7)).parse() == expected
+
+
+def test_stream_records(example):
+    pdz_bytes, expected = example
+    stream_reader = PDZStreamReader(Pipe(pdz_bytes), records=['XRF Spectrum'])
+    assert stream_reader.parse() == {'XRF Spectrum': expected['XRF Spectrum']}
+    assert stream_reader.record_names == list(expected)  # Skipped blocks are still listed
+
+
+def test_stream_truncated(example):
+    pdz_bytes, expected = example
+    records = list(PDZStreamReader(io.BytesIO(pdz_bytes[:9000])))
+    assert [record_type for record_type, _ in records] == [25, 1, 2, 3, 5, 7]  # Up to the last complete block
+
+    stream_reader = PDZStreamReader(io.BytesIO(pdz_bytes), max_record_length=10000)
+    assert 'Image Details' not in stream_reader.parse()  # Stops at the first larger block
+
+
+def test_stream_unknown_version():
+    with pytest.raises(ValueError, match="Unknown PDZ version"):
+        PDZStreamReader(io.BytesIO(b'\x07\x00' + bytes(16))).parse()
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from pdz_tool_extended import PDZTool
+from pdz_tool_extended.synthetic import generate_pdz, generate_records
+from pdz_tool_extended.writer import encode_pdz, write_pdz
+from test_parse_plan import make_pdz24
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE_PDZ25 = os.path.join(TEST_DIR, 'pdz25_example_images.pdz')
+
+
+def parse_all(file_path: str) -> list:
+    """Parse every record of a PDZ in file order, as `[(record_type, record), ...]`."""
+    with PDZTool(file_path) as pdz_tool:
+        return [(record['record_type'], pdz_tool.parse_record_type(record['record_type'], record['bytes'], record['offset']))
+                for record in pdz_tool.record_types]
+
+
+def test_encode_pdz25_example_exactly():
+    with open(EXAMPLE_PDZ25, 'rb') as f:
+        pdz_bytes = f.read()
+    with PDZTool(EXAMPLE_PDZ25) as pdz_tool:
+        assert encode_pdz(dict(pdz_tool.parse()), pdz_version="pdz25") == pdz_bytes
+
+
+def test_encode_pdz24_exactly(tmp_path):
+    pdz_bytes = make_pdz24()
+    file_path = tmp_path / 'example.pdz'
+    file_path.write_bytes(pdz_bytes)
+    with PDZTool(str(file_path)) as pdz_tool:
+        assert encode_pdz(dict(pdz_tool.parse()), pdz_version="pdz24") == pdz_bytes
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'channels': 512, 'phases': 3, 'images': 2, 'image_size': 1000, 'trace_log_length': 300, 'results': 30, 'packets': 2},
+    {'pdz_version': "pdz24"},
+    {'pdz_version': "pdz24", 'channels': 4096},
+])
+def test_generated_records_round_trip(tmp_path, options):
+    records = generate_records(seed=7, **options)
+    file_path = str(tmp_path / 'synthetic.pdz')
+    write_pdz(file_path, records, pdz_version=options.get('pdz_version', "pdz25"))
+    # The spectra of packets are decoded by `stack_packets` only, see test_packets.py
+    assert parse_all(file_path) == [(record_type, {**record, 'spectrum_data': []} if record_type == 4 else record)
+                                    for record_type, record in records]
+
+    with open(file_path, 'rb') as f:
+        assert f.read() == generate_pdz(seed=7, **options)
+
+
+def test_generated_records_are_seeded():
+    assert generate_records(seed=1) == generate_records(seed=1)
+    assert generate_records(seed=1) != generate_records(seed=2)
+
+
+@pytest.mark.parametrize('pdz_version', ["pdz25", "pdz24"])
+def test_generate_rejects_no_channels(pdz_version):
+    with pytest.raises(ValueError, match="at least 1 channel"):
+        generate_records(channels=0, pdz_version=pdz_version)
+
+
+def test_encode_rejects_channel_mismatch():
+    records = generate_records(channels=16)
+    spectrum_type, spectrum = next((record_type, record) for record_type, record in records if record_type == 3)
+    with pytest.raises(ValueError, match="does not match"):
+        encode_pdz([(spectrum_type, {**spectrum, 'channels': 0})])